@@ -0,0 +1,132 @@
+"""
+Сравнение WSGI- и ASGI-приложения на заглушке upstream.
+
+Оба приложения вызываются в процессе, без HTTP-сервера перед ними: WSGI
+обслуживается пулом из WSGI_THREADS потоков (как waitress по умолчанию),
+ASGI — одним event loop. Сценариев два:
+
+- table: таблица курсов загружается из заглушки один раз, дальше запросы
+  к разным валютам считаются из неё без вызовов upstream;
+- upstream: каждый запрос идёт в заглушку с задержкой UPSTREAM_DELAY, как
+  при промахе мимо таблицы. WSGI ходит через requests.get с новым
+  соединением на вызов и держит поток на всё время ответа upstream, ASGI —
+  через общую keep-alive сессию aiohttp. Запросов здесь UPSTREAM_REQUESTS:
+  пул WSGI обрабатывает их по WSGI_THREADS за UPSTREAM_DELAY.
+"""
+
+import asyncio
+import itertools
+import json
+import statistics
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+import main
+
+REQUESTS = 2000
+UPSTREAM_REQUESTS = 400
+CURRENCIES = 160
+UPSTREAM_DELAY = 0.05
+WSGI_THREADS = 4
+
+
+def _start_stub_upstream(delay: float) -> tuple[str, threading.Thread]:
+    """Поднимает заглушку exchangerate-api в отдельном потоке и возвращает её URL."""
+
+    async def handle_latest(request: web.Request) -> web.Response:
+        await asyncio.sleep(delay)
+        currency = request.match_info["currency"]
+        rates = {code: index + 1 for index, code in enumerate(_currencies(CURRENCIES))}
+        return web.json_response({"base": currency, "rates": rates})
+
+    stub_app = web.Application()
+    stub_app.router.add_get("/v4/latest/{currency}", handle_latest)
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(stub_app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    host, port = runner.addresses[0][:2]
+
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    return f"http://{host}:{port}/v4/latest/{{currency}}", thread
+
+
+def _currencies(count: int) -> list[str]:
+    codes = itertools.product(string.ascii_uppercase, repeat=3)
+    return ["".join(code) for code in itertools.islice(codes, count)]
+
+
+def _run_wsgi(currencies: list[str], upstream: bool) -> tuple[float, list[float]]:
+    def call(currency: str, submitted_at: float) -> float:
+        if upstream:
+            main._fetch_external_api_data()
+        else:
+            environ = {"PATH_INFO": f"/{currency}", "REQUEST_METHOD": "GET"}
+            b"".join(main.app(environ, lambda status, headers: None))
+        return time.perf_counter() - submitted_at
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WSGI_THREADS) as executor:
+        futures = [
+            executor.submit(call, currency, time.perf_counter())
+            for currency in currencies
+        ]
+        latencies = [future.result() for future in futures]
+    return time.perf_counter() - started_at, latencies
+
+
+async def _run_asgi(currencies: list[str], upstream: bool) -> tuple[float, list[float]]:
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        pass
+
+    async def call(currency: str, submitted_at: float) -> float:
+        if upstream:
+            await main._fetch_external_api_data_async()
+        else:
+            scope = {"type": "http", "path": f"/{currency}", "method": "GET"}
+            await main.asgi_app(scope, receive, send)
+        return time.perf_counter() - submitted_at
+
+    started_at = time.perf_counter()
+    latencies = await asyncio.gather(
+        *(call(currency, time.perf_counter()) for currency in currencies)
+    )
+    elapsed = time.perf_counter() - started_at
+    await main._stop_refresh_task()
+    await main._close_upstream_session()
+    return elapsed, latencies
+
+
+def _summary(elapsed: float, latencies: list[float]) -> dict[str, float]:
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "latency_p50_ms": round(quantiles[49] * 1000, 1),
+        "latency_p99_ms": round(quantiles[98] * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    main.EXTERNAL_API_URL, _ = _start_stub_upstream(UPSTREAM_DELAY)
+    main.rate_table.update(main._fetch_external_api_data())
+
+    results = {}
+    for scenario, count in (("table", REQUESTS), ("upstream", UPSTREAM_REQUESTS)):
+        currencies = list(
+            itertools.islice(itertools.cycle(_currencies(CURRENCIES)), count)
+        )
+        upstream = scenario == "upstream"
+        results[scenario] = {
+            "wsgi": _summary(*_run_wsgi(currencies, upstream)),
+            "asgi": _summary(*asyncio.run(_run_asgi(currencies, upstream))),
+        }
+    print(json.dumps(results, indent=2))
@@ -1,10 +1,40 @@
+import asyncio
+import json
 import re
-from typing import Callable, Optional
+import threading
+from typing import Any, Awaitable, Callable, Optional
 
+import aiohttp
 import requests
 
+from rate_table import (
+    RateTable,
+    cross_rates,
+    refresh_periodically,
+    start_refresh_thread,
+)
+from representation import RenderedRates, etag_matches
+
 EXTERNAL_API_URL = "https://api.exchangerate-api.com/v4/latest/{currency}"
 REGEX_PATH_INFO = r"^/(?P<currency>[A-Z]+)$"
+BASE_CURRENCY = "USD"
+REFRESH_INTERVAL = 60.0
+MAX_STALENESS = 600.0
+FIRST_SNAPSHOT_TIMEOUT = 10.0
+FIRST_SNAPSHOT_POLL_INTERVAL = 0.05
+WSGI_STATUSES = {200: "200 OK", 304: "304 NOT MODIFIED"}
+UPSTREAM_POOL_SIZE = 1000
+UPSTREAM_KEEPALIVE_TIMEOUT = 30.0
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+rate_table = RateTable(max_staleness=MAX_STALENESS)
+_refresh_thread: Optional[threading.Thread] = None
+_refresh_thread_lock = threading.Lock()
+_refresh_task: Optional[asyncio.Task] = None
+_upstream_session: Optional[aiohttp.ClientSession] = None
 
 
 def app(
@@ -18,31 +48,196 @@ def app(
     if _validate_method(allowed_methods, environ):
         return _handle_not_allowed(start_response, allowed_methods)
 
-    return _process_request(start_response, path_info.group("currency"))
+    return _process_request(environ, start_response, path_info.group("currency"))
+
+
+async def asgi_app(scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] == "lifespan":
+        return await _handle_lifespan(receive, send)
+
+    environ = _scope_to_environ(scope)
+    path_info = _validate_path(environ)
+    if path_info is None:
+        return await _send_response(send, 404, [("Content-Length", "0")])
+    allowed_methods = ("GET",)
+    if _validate_method(allowed_methods, environ):
+        return await _send_response(
+            send,
+            405,
+            [("Content-Length", "0"), ("Allow", ", ".join(allowed_methods))],
+        )
+
+    _ensure_refresh_task()
+    status, rendered = _render_rates(path_info.group("currency"))
+    if status == 503:
+        return await _send_response(send, 503, _unavailable_headers())
+    if status == 404:
+        return await _send_response(send, 404, [("Content-Length", "0")])
+    await _send_response(send, *_select_response(rendered, environ))
 
 
 def _process_request(
-    start_response: Callable[[str, list[tuple[str, str]]], None], currency: str
+    environ: dict[str, str],
+    start_response: Callable[[str, list[tuple[str, str]]], None],
+    currency: str,
 ) -> list[bytes]:
-    response = _fetch_external_api_data(currency)
-    data = response.content
-    response_headers = _build_response_headers(data)
-    status = str(response.status_code)
-    start_response(status, response_headers)
+    _ensure_refresh_thread()
+    status, rendered = _render_rates(currency)
+    if status == 503:
+        start_response("503 SERVICE UNAVAILABLE", _unavailable_headers())
+        return []
+    if status == 404:
+        return _handle_not_found(start_response)
+    status, response_headers, data = _select_response(rendered, environ)
+    start_response(WSGI_STATUSES[status], response_headers)
     return [data]
 
 
-def _build_response_headers(data: bytes) -> list[tuple[str, str]]:
-    response_headers = [
-        ("Content-type", "application/json; charset=utf-8"),
-        ("Content-Length", str(len(data))),
-    ]
-    return response_headers
+def _render_rates(currency: str) -> tuple[int, Optional[RenderedRates]]:
+    """
+    Возвращает готовый ответ для currency из текущей таблицы.
+
+    Ответ строится один раз на снимок и валюту, без запросов к upstream.
+    Пока первого снимка нет, и WSGI, и ASGI сразу отвечают 503 с
+    Retry-After; первый снимок ждут один раз при старте сервера.
+    """
+    snapshot = rate_table.current()
+    if snapshot is None:
+        return 503, None
+    rendered = snapshot.rendered.get(currency)
+    if rendered is None:
+        payload = cross_rates(snapshot, currency)
+        if payload is None:
+            return 404, None
+        rendered = RenderedRates(json.dumps(payload).encode())
+        snapshot.rendered[currency] = rendered
+    return 200, rendered
+
+
+def _select_response(
+    rendered: RenderedRates, environ: dict[str, str]
+) -> tuple[int, list[tuple[str, str]], bytes]:
+    """Выбирает вариант по Accept-Encoding и отвечает 304 по If-None-Match."""
+    representation = rendered.select(environ.get("HTTP_ACCEPT_ENCODING", ""))
+    if etag_matches(environ.get("HTTP_IF_NONE_MATCH", ""), representation.etag):
+        return 304, representation.not_modified_headers, b""
+    return 200, representation.headers, representation.body
+
+
+def _unavailable_headers() -> list[tuple[str, str]]:
+    return [("Content-Length", "0"), ("Retry-After", str(int(REFRESH_INTERVAL)))]
+
+
+def _fetch_external_api_data() -> dict[str, Any]:
+    response = requests.get(EXTERNAL_API_URL.format(currency=BASE_CURRENCY))
+    response.raise_for_status()
+    return response.json()
+
+
+def _ensure_refresh_thread() -> None:
+    """Запускает обновление таблицы для WSGI при первом запросе."""
+    global _refresh_thread
+    with _refresh_thread_lock:
+        if _refresh_thread is None:
+            _refresh_thread = start_refresh_thread(
+                rate_table, _fetch_external_api_data, REFRESH_INTERVAL
+            )
+
+
+async def _handle_lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            _get_upstream_session()
+            _ensure_refresh_task()
+            await _wait_first_snapshot()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await _stop_refresh_task()
+            await _close_upstream_session()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _wait_first_snapshot() -> None:
+    """Даёт фоновому обновлению до FIRST_SNAPSHOT_TIMEOUT секунд на первый снимок."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + FIRST_SNAPSHOT_TIMEOUT
+    while rate_table.current() is None and loop.time() < deadline:
+        await asyncio.sleep(FIRST_SNAPSHOT_POLL_INTERVAL)
+
+
+async def _send_response(
+    send: Send, status: int, headers: list[tuple[str, str]], body: bytes = b""
+) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def _scope_to_environ(scope: Scope) -> dict[str, str]:
+    """Приводит ASGI scope к полям WSGI environ, которые нужны обработчикам."""
+    environ = {"PATH_INFO": scope["path"], "REQUEST_METHOD": scope["method"]}
+    for name, value in scope.get("headers", []):
+        key = "HTTP_" + name.decode("latin-1").upper().replace("-", "_")
+        environ[key] = value.decode("latin-1")
+    return environ
+
+
+def _get_upstream_session() -> aiohttp.ClientSession:
+    """Общая keep-alive сессия к upstream, создаётся в запущенном event loop."""
+    global _upstream_session
+    if _upstream_session is None or _upstream_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=UPSTREAM_POOL_SIZE,
+            keepalive_timeout=UPSTREAM_KEEPALIVE_TIMEOUT,
+        )
+        _upstream_session = aiohttp.ClientSession(connector=connector)
+    return _upstream_session
+
+
+async def _close_upstream_session() -> None:
+    global _upstream_session
+    if _upstream_session is not None:
+        await _upstream_session.close()
+        _upstream_session = None
+
+
+async def _fetch_external_api_data_async() -> dict[str, Any]:
+    session = _get_upstream_session()
+    url = EXTERNAL_API_URL.format(currency=BASE_CURRENCY)
+    async with session.get(url, raise_for_status=True) as response:
+        return await response.json()
+
+
+def _ensure_refresh_task() -> None:
+    """Запускает обновление таблицы в текущем event loop, если оно не запущено."""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(
+            refresh_periodically(
+                rate_table, _fetch_external_api_data_async, REFRESH_INTERVAL
+            )
+        )
 
 
-def _fetch_external_api_data(currency: str) -> requests.Response:
-    response = requests.get(EXTERNAL_API_URL.format(currency=currency))
-    return response
+async def _stop_refresh_task() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
 
 
 def _validate_method(allowed_methods: tuple[str, ...], environ) -> bool:
@@ -75,4 +270,6 @@ def _handle_not_found(
 if __name__ == "__main__":
     from waitress import serve
 
+    _ensure_refresh_thread()
+    rate_table.wait_ready(FIRST_SNAPSHOT_TIMEOUT)
     serve(app)
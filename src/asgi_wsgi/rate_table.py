@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateSnapshot:
+    """Ответ upstream для базовой валюты: курсы всех валют к ней."""
+
+    payload: dict[str, Any]
+    fetched_at: float = field(default_factory=time.monotonic)
+    rendered: dict[str, Any] = field(default_factory=dict, compare=False)
+
+    @property
+    def rates(self) -> dict[str, float]:
+        return self.payload["rates"]
+
+
+class RateTable:
+    """
+    Таблица курсов, из которой считаются кросс-курсы для любой валюты.
+
+    Таблицу обновляет фоновая задача одним запросом к upstream за базовой
+    валютой, запросы клиентов в upstream не ходят. Если обновления не
+    удаются дольше max_staleness секунд, таблица считается недоступной.
+    """
+
+    def __init__(self, max_staleness: float = 600.0):
+        self._max_staleness = max_staleness
+        self._snapshot: Optional[RateSnapshot] = None
+        self._ready = threading.Event()
+
+    def update(self, payload: dict[str, Any]) -> None:
+        self._snapshot = RateSnapshot(payload)
+        self._ready.set()
+
+    def wait_ready(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    def current(self) -> Optional[RateSnapshot]:
+        """Текущий снимок или None, если его нет или он слишком старый."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        if time.monotonic() - snapshot.fetched_at > self._max_staleness:
+            return None
+        return snapshot
+
+
+def cross_rates(snapshot: RateSnapshot, currency: str) -> Optional[dict[str, Any]]:
+    """
+    Пересчитывает снимок к базе currency в формате ответа upstream.
+
+    Возвращает None, если валюты нет в снимке.
+    """
+    base_rate = snapshot.rates.get(currency)
+    if not base_rate:
+        return None
+    rates = {
+        code: float(f"{rate / base_rate:.8g}") for code, rate in snapshot.rates.items()
+    }
+    rates[currency] = 1
+    return {**snapshot.payload, "base": currency, "rates": rates}
+
+
+def start_refresh_thread(
+    table: RateTable, fetch: Callable[[], dict[str, Any]], interval: float
+) -> threading.Thread:
+    """Запускает поток, который обновляет таблицу каждые interval секунд."""
+
+    def refresh_forever() -> None:
+        while True:
+            try:
+                table.update(fetch())
+            except Exception:
+                logger.exception("Не удалось обновить таблицу курсов")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=refresh_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+async def refresh_periodically(
+    table: RateTable, fetch: Callable[[], Awaitable[dict[str, Any]]], interval: float
+) -> None:
+    """Асинхронный аналог start_refresh_thread, запускается как задача."""
+    while True:
+        try:
+            table.update(await fetch())
+        except Exception:
+            logger.exception("Не удалось обновить таблицу курсов")
+        await asyncio.sleep(interval)
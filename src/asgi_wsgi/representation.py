@@ -0,0 +1,79 @@
+import gzip
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+
+CONTENT_TYPE = "application/json; charset=utf-8"
+
+
+@dataclass(frozen=True)
+class Representation:
+    """Готовый к отправке вариант ответа: тело, ETag и заголовки 200 и 304."""
+
+    body: bytes
+    etag: str
+    headers: list[tuple[str, str]]
+    not_modified_headers: list[tuple[str, str]]
+
+
+class RenderedRates:
+    """
+    Ответ для одной валюты одного снимка курсов.
+
+    Тело и ETag считаются один раз при создании, gzip-вариант — один раз при
+    первом запросе с Accept-Encoding: gzip.
+    """
+
+    def __init__(self, body: bytes):
+        self.identity = _build_representation(body, _etag(body))
+        self._gzip: Optional[Representation] = None
+
+    @property
+    def gzip(self) -> Representation:
+        if self._gzip is None:
+            body = gzip.compress(self.identity.body, mtime=0)
+            self._gzip = _build_representation(body, _etag(body), encoding="gzip")
+        return self._gzip
+
+    def select(self, accept_encoding: str) -> Representation:
+        return self.gzip if accepts_gzip(accept_encoding) else self.identity
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip().removeprefix("q=").strip()
+        try:
+            return not quality or float(quality) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение из If-None-Match, как требует RFC 9110."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _build_representation(
+    body: bytes, etag: str, encoding: Optional[str] = None
+) -> Representation:
+    common_headers = [("ETag", etag), ("Vary", "Accept-Encoding")]
+    headers = [
+        ("Content-type", CONTENT_TYPE),
+        ("Content-Length", str(len(body))),
+        *common_headers,
+    ]
+    if encoding is not None:
+        headers.append(("Content-Encoding", encoding))
+    return Representation(body, etag, headers, common_headers)
@@ -0,0 +1,133 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+import main
+from rate_table import RateSnapshot, RateTable, cross_rates
+from representation import accepts_gzip, etag_matches
+
+PAYLOAD = {"base": "USD", "date": "2024-01-01", "rates": {"USD": 1, "EUR": 0.5}}
+
+
+def _call_wsgi(path: str, headers: dict[str, str]) -> tuple[str, dict, bytes]:
+    environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET", **headers}
+    response = {}
+
+    def start_response(status, response_headers):
+        response["status"] = status
+        response["headers"] = dict(response_headers)
+
+    body = b"".join(main.app(environ, start_response))
+    return response["status"], response["headers"], body
+
+
+def _call_asgi(path: str, headers: dict[str, str]) -> tuple[int, dict, bytes]:
+    scope = {
+        "type": "http",
+        "path": path,
+        "method": "GET",
+        "headers": [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers.items()
+        ],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(main.asgi_app(scope, receive, send))
+    start, body = messages
+    response_headers = {
+        name.decode("latin-1"): value.decode("latin-1")
+        for name, value in start["headers"]
+    }
+    return start["status"], response_headers, body["body"]
+
+
+class TestCrossRates(unittest.TestCase):
+    def test_rebases_rates(self):
+        payload = cross_rates(RateSnapshot(PAYLOAD), "EUR")
+        self.assertEqual(payload["base"], "EUR")
+        self.assertEqual(payload["rates"], {"USD": 2, "EUR": 1})
+
+    def test_unknown_currency(self):
+        self.assertIsNone(cross_rates(RateSnapshot(PAYLOAD), "XXX"))
+
+    def test_zero_rate(self):
+        snapshot = RateSnapshot({**PAYLOAD, "rates": {"USD": 1, "ZWL": 0}})
+        self.assertIsNone(cross_rates(snapshot, "ZWL"))
+
+
+class TestRepresentation(unittest.TestCase):
+    def test_etag_matches(self):
+        etag = '"abc"'
+        self.assertTrue(etag_matches('"abc"', etag))
+        self.assertTrue(etag_matches('W/"abc"', etag))
+        self.assertTrue(etag_matches('"other", W/"abc"', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"other"', etag))
+        self.assertFalse(etag_matches("", etag))
+
+    def test_accepts_gzip(self):
+        self.assertTrue(accepts_gzip("gzip, deflate"))
+        self.assertTrue(accepts_gzip("*;q=0.5"))
+        self.assertFalse(accepts_gzip("gzip;q=0"))
+        self.assertFalse(accepts_gzip("gzip; q=0.0, br"))
+        self.assertFalse(accepts_gzip("identity"))
+
+
+class TestApps(unittest.TestCase):
+    def setUp(self):
+        self.table = RateTable(max_staleness=60)
+        for patcher in (
+            mock.patch.object(main, "rate_table", self.table),
+            mock.patch.object(main, "_ensure_refresh_thread"),
+            mock.patch.object(main, "_ensure_refresh_task"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_not_modified_round_trip(self):
+        self.table.update(PAYLOAD)
+        status, headers, body = _call_wsgi("/EUR", {})
+        self.assertEqual(status, "200 OK")
+        self.assertEqual(
+            body,
+            b'{"base": "EUR", "date": "2024-01-01", "rates": {"USD": 2.0, "EUR": 1}}',
+        )
+        etag = headers["ETag"]
+
+        status, headers, body = _call_wsgi("/EUR", {"HTTP_IF_NONE_MATCH": etag})
+        self.assertEqual(status, "304 NOT MODIFIED")
+        self.assertEqual(body, b"")
+
+        status, headers, body = _call_asgi("/EUR", {"if-none-match": f"W/{etag}"})
+        self.assertEqual(status, 304)
+        self.assertEqual(headers["etag"], etag)
+        self.assertEqual(body, b"")
+
+    def test_stale_table_is_unavailable(self):
+        self.table.update(PAYLOAD)
+        stale_at = time.monotonic() + 61
+        with mock.patch("rate_table.time.monotonic", return_value=stale_at):
+            status, headers, _ = _call_wsgi("/EUR", {})
+            self.assertEqual(status, "503 SERVICE UNAVAILABLE")
+            self.assertIn("Retry-After", headers)
+            status, headers, _ = _call_asgi("/EUR", {})
+            self.assertEqual(status, 503)
+            self.assertIn("retry-after", headers)
+
+    def test_no_snapshot_fails_fast(self):
+        started_at = time.monotonic()
+        status, _, _ = _call_wsgi("/EUR", {})
+        self.assertEqual(status, "503 SERVICE UNAVAILABLE")
+        self.assertLess(time.monotonic() - started_at, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
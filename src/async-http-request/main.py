@@ -1,10 +1,14 @@
 import asyncio
-import json
 import os
 from asyncio import Semaphore
+from http import HTTPStatus
+from pathlib import Path
+from typing import Optional
 
 import aiohttp
-from aiofile import async_open
+
+from v2.http_cache import HttpCache
+from v2.writer import ResultWriter
 
 urls = [
     "https://example.com",
@@ -13,40 +17,53 @@ urls = [
 ]
 
 
-async def fetch_urls(urls: list[str], file_path: str, max_concurrent: int = 5):
+async def fetch_urls(
+    urls: list[str],
+    file_path: str,
+    max_concurrent: int = 5,
+    cache_dir: Optional[str] = None,
+):
     if os.path.exists(file_path):
         os.remove(file_path)
-    async with aiohttp.ClientSession() as session:
+    cache = None
+    if cache_dir is not None:
+        cache = HttpCache(Path(cache_dir))
+        cache.load()
+    async with (
+        aiohttp.ClientSession() as session,
+        ResultWriter(Path(file_path)) as writer,
+    ):
         tasks = []
         for url in urls:
             tasks.append(
                 asyncio.create_task(
-                    process_url(file_path, max_concurrent, session, url)
+                    process_url(writer, max_concurrent, session, url, cache)
                 )
             )
         await asyncio.gather(*tasks)
 
 
-async def process_url(file_path, max_concurrent, session, url):
+async def process_url(writer, max_concurrent, session, url, cache=None):
     async with Semaphore(max_concurrent):
-        result_dict = await get_url(session, url)
-        await save_resp_to_file(file_path, result_dict)
+        result_dict = await get_url(session, url, cache)
+        await writer.write(result_dict)
 
 
-async def get_url(session, url):
+async def get_url(session, url, cache=None):
+    cached = await cache.lookup(url) if cache is not None else None
+    headers = cached.conditional_headers() if cached is not None else None
     try:
-        async with session.get(url) as resp:
+        async with session.get(url, headers=headers) as resp:
+            if resp.status == HTTPStatus.NOT_MODIFIED and cached is not None:
+                cache.touch(cached)
+                return {"url": url, "status_code": cached.status_code}
+            if cache is not None and resp.status == HTTPStatus.OK:
+                await cache.store(url, resp.status, resp.headers)
             result_dict = {"url": url, "status_code": resp.status}
     except aiohttp.ClientError:
         result_dict = {"url": url, "status_code": 0}
     return result_dict
 
 
-async def save_resp_to_file(file_path: str, result_dict: dict):
-    async with async_open(file_path, "a") as result_file:
-        await result_file.write(json.dumps(result_dict))
-        await result_file.write("\n")
-
-
 if __name__ == "__main__":
-    asyncio.run(fetch_urls(urls, "./results.jsonl"))
+    asyncio.run(fetch_urls(urls, "./results.jsonl", cache_dir="./http_cache"))
@@ -0,0 +1,122 @@
+"""
+Сравнение однопроцессного и шардированного обхода на заглушке сервера.
+
+Заглушка слушает на 0.0.0.0 в нескольких процессах с reuse_port, разные
+хосты имитируются адресами 127.0.0.k, поэтому URL делятся между шардами.
+Лимиты по хостам подняты, чтобы измерялась пропускная способность
+краулера, а не token bucket. Выигрыш от процессов ограничен числом ядер.
+"""
+
+import asyncio
+import os
+import shutil
+import socket
+import tempfile
+import time
+from multiprocessing import Event, Process
+from pathlib import Path
+
+from aiohttp import web
+
+from main import fetch_urls, fetch_urls_sharded
+from processing import OutputMode
+
+URLS = 20000
+HOSTS = 16
+MAX_CONCURRENT = 50
+STUB_PROCESSES = 2
+PROCESSES = (1, 2, 4)
+BODY = b'{"id": 1, "items": [1, 2, 3], "name": "stub"}'
+
+
+def _serve_stub(port: int, ready) -> None:
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=BODY, content_type="application/json")
+
+    async def serve() -> None:
+        stub_app = web.Application()
+        stub_app.router.add_get("/{tail:.*}", handle)
+        runner = web.AppRunner(stub_app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "0.0.0.0", port, reuse_port=True).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def _start_stub(processes: int) -> tuple[int, list[Process]]:
+    """Поднимает заглушку в processes процессах на общем порту."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    servers = []
+    for _ in range(processes):
+        ready = Event()
+        server = Process(target=_serve_stub, args=(port, ready), daemon=True)
+        server.start()
+        ready.wait()
+        servers.append(server)
+    return port, servers
+
+
+def _write_urls(file_path: Path, port: int) -> None:
+    with open(file_path, "w") as urls_file:
+        for i in range(URLS):
+            urls_file.write(f"http://127.0.0.{i % HOSTS + 1}:{port}/item/{i}\n")
+
+
+def _run(urls_file_path: Path, output_file_path: Path, processes: int) -> float:
+    limits = {"max_per_host": MAX_CONCURRENT, "host_rate": float(URLS)}
+    started_at = time.perf_counter()
+    if processes == 1:
+        asyncio.run(
+            fetch_urls(
+                urls_file_path,
+                output_file_path,
+                max_concurrent=MAX_CONCURRENT,
+                clear_output_file=True,
+                output_mode=OutputMode.RAW,
+                **limits,
+            )
+        )
+    else:
+        fetch_urls_sharded(
+            urls_file_path,
+            output_file_path,
+            processes,
+            max_concurrent=MAX_CONCURRENT,
+            clear_output_file=True,
+            output_mode=OutputMode.RAW,
+            **limits,
+        )
+    return time.perf_counter() - started_at
+
+
+def main() -> None:
+    port, servers = _start_stub(STUB_PROCESSES)
+    work_dir = Path(tempfile.mkdtemp())
+    try:
+        urls_file_path = work_dir / "urls.txt"
+        _write_urls(urls_file_path, port)
+        results = {}
+        for processes in PROCESSES:
+            output_file_path = work_dir / f"results.{processes}.jsonl"
+            elapsed = _run(urls_file_path, output_file_path, processes)
+            with open(output_file_path, "rb") as output_file:
+                records = sum(1 for _ in output_file)
+            results[processes] = elapsed
+            print(
+                f"processes={processes}: {URLS / elapsed:.0f} urls/s, "
+                f"{records} records, "
+                f"speedup x{results[PROCESSES[0]] / elapsed:.2f}"
+            )
+        print(f"cpu cores: {os.cpu_count()}")
+    finally:
+        for server in servers:
+            server.terminate()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import hashlib
+import os
+from array import array
+from pathlib import Path
+from typing import Iterable
+
+from aiofile import async_open
+
+HASH_SIZE = 8
+INITIAL_CAPACITY = 1024
+
+
+def url_hash(url: str) -> int:
+    """64-битный хеш URL. Ноль занят под пустой слот таблицы, поэтому не выдаётся."""
+    value = int.from_bytes(
+        hashlib.blake2b(url.encode(), digest_size=HASH_SIZE).digest(), "little"
+    )
+    return value or 1
+
+
+class HashSet:
+    """
+    Множество 64-битных хешей с открытой адресацией в array("Q").
+
+    Занимает 8 байт на слот при заполнении не больше половины, то есть
+    в несколько раз меньше памяти, чем set из int того же размера.
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        capacity = max(capacity, INITIAL_CAPACITY)
+        self._capacity = 1 << (capacity - 1).bit_length()
+        self._slots = array("Q", bytes(HASH_SIZE * self._capacity))
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, value: int) -> bool:
+        slots = self._slots
+        mask = self._capacity - 1
+        index = value & mask
+        while True:
+            slot = slots[index]
+            if slot == value:
+                return True
+            if slot == 0:
+                return False
+            index = (index + 1) & mask
+
+    def add(self, value: int) -> None:
+        if (self._size + 1) * 2 > self._capacity:
+            self._grow()
+        if self._insert(self._slots, self._capacity - 1, value):
+            self._size += 1
+
+    def _grow(self) -> None:
+        self._capacity *= 2
+        slots = array("Q", bytes(HASH_SIZE * self._capacity))
+        mask = self._capacity - 1
+        for value in self._slots:
+            if value:
+                self._insert(slots, mask, value)
+        self._slots = slots
+
+    @staticmethod
+    def _insert(slots: array, mask: int, value: int) -> bool:
+        index = value & mask
+        while True:
+            slot = slots[index]
+            if slot == value:
+                return False
+            if slot == 0:
+                slots[index] = value
+                return True
+            index = (index + 1) & mask
+
+
+class CompletedIndex:
+    """
+    Индекс успешно обработанных URL для продолжения прерванного запуска.
+
+    Хранится рядом с файлом результатов как последовательность 8-байтовых
+    хешей URL. При старте загружается в HashSet целиком, дальше хеши
+    дописываются в файл после того, как их записи сброшены в результаты.
+    """
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        self._hashes = HashSet()
+
+    @classmethod
+    def for_output(cls, output_file_path: Path) -> "CompletedIndex":
+        return cls(output_file_path.with_name(f"{output_file_path.name}.done"))
+
+    def load(self) -> None:
+        if not self.file_path.exists():
+            return
+        data = self.file_path.read_bytes()
+        if len(data) % HASH_SIZE:
+            data = data[: len(data) - len(data) % HASH_SIZE]
+            os.truncate(self.file_path, len(data))
+        hashes = array("Q")
+        hashes.frombytes(data)
+        self._hashes = HashSet(len(hashes) * 2)
+        for value in hashes:
+            self._hashes.add(value)
+
+    def clear(self) -> None:
+        self.file_path.unlink(missing_ok=True)
+        self._hashes = HashSet()
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __contains__(self, url: str) -> bool:
+        return url_hash(url) in self._hashes
+
+    async def add_many(self, urls: Iterable[str]) -> None:
+        hashes = array("Q", (url_hash(url) for url in urls))
+        if not hashes:
+            return
+        async with async_open(self.file_path, "ab") as file:
+            await file.write(hashes.tobytes())
+        for value in hashes:
+            self._hashes.add(value)
@@ -0,0 +1,183 @@
+import math
+import time
+
+from yarl import URL
+
+MAX_PER_HOST = 4
+HOST_RATE = 10.0
+HOST_BURST = 10
+MIN_HOST_RATE = 0.1
+RATE_INCREASE_STEP = 0.05
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
+
+
+class CircuitOpenError(Exception):
+    """Хост временно отключён: подряд было слишком много ошибок."""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"circuit open for {host}, retry in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+class TokenBucket:
+    """
+    Ограничение частоты запросов с адаптивной скоростью.
+
+    slow_down вдвое снижает скорость (например, после 429), speed_up
+    возвращает её обратно небольшими шагами после успешных ответов.
+    """
+
+    def __init__(self, rate: float, burst: int, min_rate: float = MIN_HOST_RATE):
+        self.rate = rate
+        self._max_rate = rate
+        self._min_rate = min_rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+
+    def try_acquire(self) -> float:
+        """Берёт токен и возвращает 0, без токена — через сколько секунд он будет."""
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._tokens = min(self._burst, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def slow_down(self) -> None:
+        self.rate = max(self._min_rate, self.rate / 2)
+
+    def speed_up(self) -> None:
+        self.rate = min(self._max_rate, self.rate + self._max_rate * RATE_INCREASE_STEP)
+
+
+class CircuitBreaker:
+    """
+    Отключает хост после failure_threshold ошибок подряд на reset_timeout секунд.
+
+    По истечении таймаута запросы снова пропускаются; первая же ошибка
+    отключает хост заново, первый успех сбрасывает счётчик.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+    ):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+
+    def retry_in(self) -> float:
+        if self._failures < self._failure_threshold:
+            return 0.0
+        return max(0.0, self._opened_at + self._reset_timeout - time.monotonic())
+
+    def record_success(self) -> None:
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+class HostLimits:
+    """Лимиты одного хоста: параллельность, частота и circuit breaker."""
+
+    def __init__(
+        self,
+        host: str,
+        max_concurrent: int,
+        rate: float,
+        burst: int,
+        failure_threshold: int,
+        reset_timeout: float,
+    ):
+        self.host = host
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+        self.bucket.speed_up()
+
+    def record_throttled(self) -> None:
+        self.bucket.slow_down()
+
+    def record_failure(self) -> None:
+        self.breaker.record_failure()
+
+
+class CrawlLimits:
+    """
+    Общий лимит параллельности и лимиты по хостам.
+
+    Слот не ждут: try_acquire занимает его сразу или сообщает, когда
+    спросить снова. Диспетчер из queue_management берёт слоты только у
+    готовых хостов, поэтому медленный или ограниченный хост не занимает ни
+    общих слотов, ни воркеров.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_per_host: int = MAX_PER_HOST,
+        host_rate: float = HOST_RATE,
+        host_burst: int = HOST_BURST,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+    ):
+        self._max_concurrent = max_concurrent
+        self._in_flight = 0
+        self._max_per_host = max_per_host
+        self._host_rate = host_rate
+        self._host_burst = host_burst
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._hosts: dict[str, HostLimits] = {}
+
+    def for_url(self, url: str) -> HostLimits:
+        host = URL(url).host or ""
+        limits = self._hosts.get(host)
+        if limits is None:
+            limits = HostLimits(
+                host,
+                self._max_per_host,
+                self._host_rate,
+                self._host_burst,
+                self._failure_threshold,
+                self._reset_timeout,
+            )
+            self._hosts[host] = limits
+        return limits
+
+    def try_acquire(self, host_limits: HostLimits) -> float:
+        """
+        Занимает общий слот, слот хоста и токен хоста, если они свободны.
+
+        Возвращает 0, если слот занят, иначе через сколько секунд стоит
+        проверить снова; math.inf — когда ждать нужно освобождения слота.
+        Circuit breaker не проверяется: это делает сама попытка.
+        """
+        if (
+            self._in_flight >= self._max_concurrent
+            or host_limits.in_flight >= host_limits.max_concurrent
+        ):
+            return math.inf
+        wait = host_limits.bucket.try_acquire()
+        if wait > 0:
+            return wait
+        self._in_flight += 1
+        host_limits.in_flight += 1
+        return 0.0
+
+    def release(self, host_limits: HostLimits) -> None:
+        self._in_flight -= 1
+        host_limits.in_flight -= 1
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Mapping, Optional
+
+from aiofile import async_open
+
+MAX_CACHE_BYTES = 1024 * 1024 * 1024
+MAX_ENTRY_BYTES = 10 * 1024 * 1024
+ENTRY_SUFFIX = ".entry"
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Валидаторы закешированного ответа и смещение его содержимого в файле."""
+
+    url: str
+    status_code: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    file_path: Path
+    content_offset: int
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    Дисковый кеш ответов для условных запросов при повторных обходах.
+
+    Каждая запись — отдельный файл: строка JSON с URL, статусом, ETag и
+    Last-Modified, за ней готовое содержимое поля content записи результата.
+    Общий размер ограничен max_bytes: при переполнении удаляются записи,
+    которые дольше всего не использовались (порядок хранится в mtime файлов).
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int = MAX_CACHE_BYTES,
+        max_entry_bytes: int = MAX_ENTRY_BYTES,
+    ):
+        self.cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._max_entry_bytes = max_entry_bytes
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+
+    def load(self) -> None:
+        """Строит индекс размеров по файлам каталога, от старых к новым."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        with os.scandir(self.cache_dir) as scan:
+            for dir_entry in scan:
+                if dir_entry.name.endswith(ENTRY_SUFFIX):
+                    stat = dir_entry.stat()
+                    entries.append((stat.st_mtime, dir_entry.name, stat.st_size))
+        self._sizes.clear()
+        for _, name, size in sorted(entries):
+            self._sizes[name] = size
+        self._total_bytes = sum(self._sizes.values())
+        self._evict()
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    async def lookup(self, url: str) -> Optional[CachedResponse]:
+        """Читает только заголовок записи; содержимое — через read_content."""
+        name = _entry_name(url)
+        if name not in self._sizes:
+            return None
+        file_path = self.cache_dir / name
+        try:
+            async with async_open(file_path, "rb") as file:
+                header_line = await file.readline()
+        except FileNotFoundError:
+            self._forget(name)
+            return None
+        header = json.loads(header_line)
+        if header["url"] != url:
+            return None
+        return CachedResponse(
+            url=url,
+            status_code=header["status_code"],
+            etag=header["etag"],
+            last_modified=header["last_modified"],
+            file_path=file_path,
+            content_offset=len(header_line),
+        )
+
+    async def read_content(self, cached: CachedResponse) -> Optional[bytes]:
+        """
+        Содержимое записи после ответа 304; отмечает запись как использованную.
+
+        None, если запись успели вытеснить после lookup.
+        """
+        try:
+            async with async_open(cached.file_path, "rb") as file:
+                file.seek(cached.content_offset)
+                content = await file.read()
+        except FileNotFoundError:
+            self._forget(cached.file_path.name)
+            return None
+        self.touch(cached)
+        return content
+
+    def touch(self, cached: CachedResponse) -> None:
+        """Отмечает запись как использованную, чтобы её вытеснили последней."""
+        name = cached.file_path.name
+        if name not in self._sizes:
+            return
+        try:
+            os.utime(cached.file_path)
+        except FileNotFoundError:
+            self._forget(name)
+            return
+        self._sizes.move_to_end(name)
+
+    async def store(
+        self,
+        url: str,
+        status_code: int,
+        headers: Mapping[str, str],
+        content: bytes = b"",
+    ) -> None:
+        """Сохраняет ответ, если у него есть валидаторы и он не слишком велик."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return
+        header = json.dumps(
+            {
+                "url": url,
+                "status_code": status_code,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+        ).encode()
+        data = header + b"\n" + content
+        if len(data) > self._max_entry_bytes:
+            return
+
+        name = _entry_name(url)
+        file_path = self.cache_dir / name
+        tmp_path = file_path.with_name(f"{name}.tmp")
+        async with async_open(tmp_path, "wb") as file:
+            await file.write(data)
+        tmp_path.replace(file_path)
+        self._forget(name)
+        self._sizes[name] = len(data)
+        self._total_bytes += len(data)
+        self._evict()
+
+    def _forget(self, name: str) -> None:
+        self._total_bytes -= self._sizes.pop(name, 0)
+
+    def _evict(self) -> None:
+        while self._total_bytes > self._max_bytes and self._sizes:
+            name, size = self._sizes.popitem(last=False)
+            self._total_bytes -= size
+            (self.cache_dir / name).unlink(missing_ok=True)
+
+
+def _entry_name(url: str) -> str:
+    return hashlib.blake2b(url.encode(), digest_size=16).hexdigest() + ENTRY_SUFFIX
@@ -0,0 +1,61 @@
+import json
+from typing import Any, AsyncIterator
+
+import ijson
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+_CONTAINER_START = {"start_map": "{", "start_array": "["}
+_CONTAINER_END = {"end_map": "}", "end_array": "]"}
+
+
+class JsonEventSerializer:
+    """Собирает JSON-текст обратно из событий ijson без построения объекта."""
+
+    def __init__(self):
+        self._has_items = [False]
+        self._after_key = False
+
+    def feed(self, event: str, value: Any) -> str:
+        if event in _CONTAINER_END:
+            self._has_items.pop()
+            return _CONTAINER_END[event]
+        separator = self._separator()
+        if event in _CONTAINER_START:
+            self._has_items.append(False)
+            return separator + _CONTAINER_START[event]
+        if event == "map_key":
+            self._after_key = True
+            return f"{separator}{json.dumps(value)}: "
+        return separator + json.dumps(value)
+
+    def _separator(self) -> str:
+        if self._after_key:
+            self._after_key = False
+            return ""
+        separator = ", " if self._has_items[-1] else ""
+        self._has_items[-1] = True
+        return separator
+
+
+async def iter_json_text(stream) -> AsyncIterator[str]:
+    """
+    Разбирает JSON из асинхронного потока и отдаёт его текст кусками.
+
+    Поток читается по мере прихода данных, в памяти держится не больше
+    WRITE_BUFFER_SIZE символов результата. Некорректный JSON приводит к
+    исключению ijson.JSONError.
+    """
+    serializer = JsonEventSerializer()
+    buffer = []
+    buffered = 0
+    async for _, event, value in ijson.parse_async(stream, use_float=True):
+        text = serializer.feed(event, value)
+        buffer.append(text)
+        buffered += len(text)
+        if buffered >= WRITE_BUFFER_SIZE:
+            yield "".join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield "".join(buffer)
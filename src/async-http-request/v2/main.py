@@ -1,12 +1,24 @@
 import asyncio
-from asyncio import Queue, Semaphore
+import shutil
+from asyncio import Queue
+from multiprocessing import Process
 from pathlib import Path
+from typing import Optional
 
 from aiohttp import ClientSession, ClientTimeout
 
+from checkpoint import CompletedIndex
+from host_limits import HOST_RATE, MAX_PER_HOST, CrawlLimits
+from http_cache import HttpCache
+from metrics import CrawlMetrics, export_periodically
+from processing import OutputMode
 from queue_management import add_url_to_queue, process_urls
+from sharding import merge_shards, split_urls_by_host
+from writer import ResultWriter
 
 TIMEOUT = ClientTimeout(total=3600)
+WORKERS_PER_SLOT = 4
+QUEUE_SIZE_PER_WORKER = 2
 
 
 async def fetch_urls(
@@ -14,19 +26,162 @@ async def fetch_urls(
     output_file_path: Path,
     max_concurrent: int = 5,
     clear_output_file: bool = False,
+    output_mode: OutputMode = OutputMode.PARSE,
+    metrics_file_path: Optional[Path] = None,
+    max_per_host: int = MAX_PER_HOST,
+    host_rate: float = HOST_RATE,
+    cache_dir: Optional[Path] = None,
 ):
-    """Запускает обработку URL с потоковой записью в файлы."""
-    if clear_output_file and output_file_path.exists():
+    """
+    Запускает обработку URL с потоковой записью в файлы.
+
+    Без clear_output_file запуск продолжает предыдущий: URL, уже успешно
+    записанные в output_file_path, пропускаются. URL, которые так и не
+    удалось получить, пишутся не в output_file_path, а в файл ошибок
+    errors_file_path(output_file_path); он перезаписывается каждым запуском,
+    потому что эти URL запрашиваются снова. Метрики периодически
+    выгружаются в metrics_file_path (по умолчанию metrics.json рядом с
+    результатами), сводка печатается в конце. С cache_dir ответы с ETag
+    или Last-Modified кешируются на диске, и повторный обход запрашивает
+    их условно.
+    """
+    if metrics_file_path is None:
+        metrics_file_path = output_file_path.with_name("metrics.json")
+    completed_index = CompletedIndex.for_output(output_file_path)
+    errors_file_path(output_file_path).unlink(missing_ok=True)
+    if clear_output_file:
         output_file_path.unlink(missing_ok=True)
+        completed_index.clear()
+    else:
+        completed_index.load()
+
+    workers_count = max_concurrent * WORKERS_PER_SLOT
+    queue = Queue(maxsize=workers_count * QUEUE_SIZE_PER_WORKER)
+    limits = CrawlLimits(max_concurrent, max_per_host=max_per_host, host_rate=host_rate)
+    metrics = CrawlMetrics()
+    cache = None
+    if cache_dir is not None:
+        cache = HttpCache(cache_dir)
+        cache.load()
+    exporter = asyncio.create_task(
+        export_periodically(metrics, metrics_file_path, queue)
+    )
+
+    try:
+        async with (
+            ClientSession(
+                timeout=TIMEOUT, trace_configs=[metrics.trace_config()]
+            ) as session,
+            ResultWriter(
+                output_file_path,
+                completed_index=completed_index,
+                metrics=metrics,
+                errors_file_path=errors_file_path(output_file_path),
+            ) as writer,
+        ):
+            await asyncio.gather(
+                add_url_to_queue(queue, urls_file_path, completed_index),
+                process_urls(
+                    queue,
+                    writer,
+                    session,
+                    limits,
+                    metrics,
+                    workers_count,
+                    output_mode,
+                    cache,
+                ),
+            )
+    finally:
+        exporter.cancel()
+        metrics.export(metrics_file_path)
+        print(metrics.summary())
 
-    queue = Queue()
-    semaphore = Semaphore(max_concurrent)
 
-    async with ClientSession(timeout=TIMEOUT) as session:
-        await asyncio.gather(
-            add_url_to_queue(queue, urls_file_path),
-            process_urls(queue, output_file_path, session, semaphore),
+def fetch_urls_sharded(
+    urls_file_path: Path,
+    output_file_path: Path,
+    processes: int,
+    max_concurrent: int = 5,
+    clear_output_file: bool = False,
+    output_mode: OutputMode = OutputMode.PARSE,
+    max_per_host: int = MAX_PER_HOST,
+    host_rate: float = HOST_RATE,
+    cache_dir: Optional[Path] = None,
+):
+    """
+    Запускает fetch_urls в processes процессах, каждый со своим event loop.
+
+    URL делятся между процессами по хосту, каждый процесс пишет свой шард
+    результатов в каталог <output>.shards, после чего шарды собираются в
+    output_file_path. max_concurrent задаётся на процесс. Повторный запуск
+    без clear_output_file продолжает шарды с места остановки. Кеш ответов
+    у каждого шарда свой, в подкаталоге cache_dir с номером шарда.
+    """
+    shards_dir = output_file_path.with_name(f"{output_file_path.stem}.shards")
+    if clear_output_file:
+        shutil.rmtree(shards_dir, ignore_errors=True)
+    shard_urls_paths = split_urls_by_host(urls_file_path, shards_dir, processes)
+    shard_output_paths = [shards_dir / f"results.{i}.jsonl" for i in range(processes)]
+
+    shard_processes = [
+        Process(
+            target=_run_shard,
+            args=(
+                shard_urls_path,
+                shard_output_path,
+                max_concurrent,
+                output_mode,
+                max_per_host,
+                host_rate,
+                cache_dir / str(i) if cache_dir is not None else None,
+            ),
+        )
+        for i, (shard_urls_path, shard_output_path) in enumerate(
+            zip(shard_urls_paths, shard_output_paths)
         )
+    ]
+    for process in shard_processes:
+        process.start()
+    for process in shard_processes:
+        process.join()
+    failed = [p.exitcode for p in shard_processes if p.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"{len(failed)} shard processes failed: {failed}")
+
+    merge_shards(shard_output_paths, output_file_path)
+    merge_shards(
+        [errors_file_path(path) for path in shard_output_paths],
+        errors_file_path(output_file_path),
+    )
+
+
+def errors_file_path(output_file_path: Path) -> Path:
+    """Файл ошибок рядом с файлом результатов: results.jsonl -> results.errors.jsonl."""
+    return output_file_path.with_suffix(f".errors{output_file_path.suffix}")
+
+
+def _run_shard(
+    urls_file_path: Path,
+    output_file_path: Path,
+    max_concurrent: int,
+    output_mode: OutputMode,
+    max_per_host: int,
+    host_rate: float,
+    cache_dir: Optional[Path],
+):
+    asyncio.run(
+        fetch_urls(
+            urls_file_path,
+            output_file_path,
+            max_concurrent=max_concurrent,
+            output_mode=output_mode,
+            metrics_file_path=output_file_path.with_suffix(".metrics.json"),
+            max_per_host=max_per_host,
+            host_rate=host_rate,
+            cache_dir=cache_dir,
+        )
+    )
 
 
 def start():
@@ -36,6 +191,7 @@ def start():
             output_file_path=Path(__file__).parent / "results.jsonl",
             max_concurrent=5,
             clear_output_file=True,
+            cache_dir=Path(__file__).parent / "http_cache",
         )
     )
 
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import time
+from asyncio import Queue
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterator, Optional
+
+from aiohttp import ClientSession, TraceConfig
+from aiohttp.tracing import (
+    TraceConnectionCreateEndParams,
+    TraceConnectionCreateStartParams,
+    TraceDnsResolveHostEndParams,
+    TraceDnsResolveHostStartParams,
+    TraceRequestEndParams,
+    TraceRequestExceptionParams,
+    TraceRequestStartParams,
+    TraceResponseChunkReceivedParams,
+)
+
+EXPORT_INTERVAL = 10.0
+BUCKET_BOUNDS = tuple(0.0005 * 2**i for i in range(18))
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """Гистограмма длительностей в секундах с экспоненциальными корзинами."""
+
+    def __init__(self, bounds: tuple[float, ...] = BUCKET_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает квантиль q."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class CrawlMetrics:
+    """
+    Метрики обхода: длительности фаз, счётчики и текущие значения.
+
+    Сетевые фазы (dns, connect, ttfb) и принятые байты собирает
+    trace_config(), остальные фазы замеряются через phase().
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self.gauges: dict[str, int] = {}
+
+    def observe(self, phase: str, seconds: float) -> None:
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started_at)
+
+    def inc(self, counter: str, value: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def set_gauge(self, gauge: str, value: int) -> None:
+        self.gauges[gauge] = value
+
+    def add_gauge(self, gauge: str, delta: int) -> None:
+        self.gauges[gauge] = self.gauges.get(gauge, 0) + delta
+
+    def trace_config(self) -> TraceConfig:
+        """TraceConfig для ClientSession, который замеряет сетевые фазы."""
+        trace_config = TraceConfig()
+
+        async def on_request_start(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            params: TraceRequestStartParams,
+        ) -> None:
+            ctx.request_started_at = time.perf_counter()
+
+        async def on_dns_start(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            params: TraceDnsResolveHostStartParams,
+        ) -> None:
+            ctx.dns_started_at = time.perf_counter()
+
+        async def on_dns_end(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            params: TraceDnsResolveHostEndParams,
+        ) -> None:
+            self.observe("dns", time.perf_counter() - ctx.dns_started_at)
+
+        async def on_connection_start(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            params: TraceConnectionCreateStartParams,
+        ) -> None:
+            ctx.connection_started_at = time.perf_counter()
+
+        async def on_connection_end(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            params: TraceConnectionCreateEndParams,
+        ) -> None:
+            self.observe("connect", time.perf_counter() - ctx.connection_started_at)
+
+        async def on_request_end(
+            session: ClientSession, ctx: SimpleNamespace, params: TraceRequestEndParams
+        ) -> None:
+            self.observe("ttfb", time.perf_counter() - ctx.request_started_at)
+
+        async def on_request_exception(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            params: TraceRequestExceptionParams,
+        ) -> None:
+            self.inc(f"request_errors.{type(params.exception).__name__}")
+
+        async def on_chunk_received(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            params: TraceResponseChunkReceivedParams,
+        ) -> None:
+            self.inc("bytes_received", len(params.chunk))
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_dns_resolvehost_start.append(on_dns_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_end)
+        trace_config.on_connection_create_start.append(on_connection_start)
+        trace_config.on_connection_create_end.append(on_connection_end)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_response_chunk_received.append(on_chunk_received)
+        return trace_config
+
+    def snapshot(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "elapsed": elapsed,
+            "bytes_per_sec": self.counters.get("bytes_received", 0) / elapsed,
+            "urls_per_sec": self.counters.get("urls_done", 0) / elapsed,
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "phases": {
+                name: {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    **{
+                        f"p{int(q * 100)}": histogram.quantile(q)
+                        for q in SUMMARY_QUANTILES
+                    },
+                    "buckets": dict(
+                        zip([*map(str, histogram.bounds), "+Inf"], histogram.counts)
+                    ),
+                }
+                for name, histogram in self.histograms.items()
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        lines = ["# TYPE crawl_phase_seconds histogram"]
+        for name, histogram in self.histograms.items():
+            cumulative = 0
+            for bound, count in zip(
+                [*map(str, histogram.bounds), "+Inf"], histogram.counts
+            ):
+                cumulative += count
+                labels = f'phase="{name}",le="{bound}"'
+                lines.append(f"crawl_phase_seconds_bucket{{{labels}}} {cumulative}")
+            lines.append(f'crawl_phase_seconds_sum{{phase="{name}"}} {histogram.sum}')
+            lines.append(
+                f'crawl_phase_seconds_count{{phase="{name}"}} {histogram.count}'
+            )
+        for name, value in self.counters.items():
+            metric = _prometheus_name(name)
+            lines += [
+                f"# TYPE crawl_{metric}_total counter",
+                f"crawl_{metric}_total {value}",
+            ]
+        for name, value in self.gauges.items():
+            metric = _prometheus_name(name)
+            lines += [f"# TYPE crawl_{metric} gauge", f"crawl_{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, file_path: Path) -> None:
+        """Пишет метрики в file_path: .prom — в формате Prometheus, иначе JSON."""
+        if file_path.suffix == ".prom":
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.snapshot(), indent=2)
+        tmp_path = file_path.with_name(f"{file_path.name}.tmp")
+        tmp_path.write_text(text)
+        tmp_path.replace(file_path)
+
+    def summary(self) -> str:
+        snapshot = self.snapshot()
+        lines = [
+            f"elapsed {snapshot['elapsed']:.1f}s, "
+            f"{snapshot['urls_per_sec']:.1f} urls/s, "
+            f"{snapshot['bytes_per_sec'] / 1024:.1f} KiB/s",
+        ]
+        for name, phase in sorted(snapshot["phases"].items()):
+            lines.append(
+                f"{name:>12}: n={phase['count']:<8} total={phase['sum']:.2f}s "
+                f"p50<={phase['p50']:.4f}s p90<={phase['p90']:.4f}s "
+                f"p99<={phase['p99']:.4f}s"
+            )
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"{name:>12}: {value}")
+        return "\n".join(lines)
+
+
+async def export_periodically(
+    metrics: CrawlMetrics,
+    file_path: Path,
+    queue: Optional[Queue] = None,
+    interval: float = EXPORT_INTERVAL,
+) -> None:
+    """Раз в interval секунд обновляет глубину очереди и выгружает метрики."""
+    while True:
+        await asyncio.sleep(interval)
+        if queue is not None:
+            metrics.set_gauge("queue_depth", queue.qsize())
+        metrics.export(file_path)
+
+
+def _prometheus_name(name: str) -> str:
+    return "".join(char if char.isalnum() else "_" for char in name)
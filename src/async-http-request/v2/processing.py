@@ -1,96 +1,364 @@
 import asyncio
-import hashlib
 import json
-from asyncio import Semaphore
-from pathlib import Path
+import random
+import time
+from collections import deque
 from concurrent.futures import ProcessPoolExecutor
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from http import HTTPStatus
+from typing import Optional
 
-from aiofile import async_open
-from aiohttp import ClientSession
+import ijson
+from aiohttp import ClientError, ClientResponse, ClientSession, StreamReader
+
+from host_limits import CircuitOpenError, HostLimits
+from http_cache import HttpCache
+from json_stream import iter_json_text
+from metrics import CrawlMetrics
+from writer import ResultWriter, WriterError
 
 MAX_RETRIES = 3
 RETRY_DELAY = 5
+RETRY_JITTER = 1.0
+MAX_RETRY_AFTER = 300.0
+RETRY_STATUSES = (429, 502, 503, 504)
 CHUNK_SIZE = 1024 * 1024 * 100
+RAW_CHUNK_SIZE = 1024 * 1024
 
 process_pool = ProcessPoolExecutor(max_workers=2)
 
 
-async def process_single_url_with_retry(
+class OutputMode(Enum):
+    """
+    Как тело ответа попадает в поле content записи.
+
+    PARSE разбирает JSON в process_pool и сериализует его заново. VALIDATE
+    только проверяет JSON в process_pool и вставляет исходные байты как есть.
+    RAW вставляет байты без проверки, но только для непустых ответов 2xx с
+    JSON в Content-Type; остальные ответы (страницы ошибок, 204) проходят
+    как в VALIDATE, чтобы в файл не попала некорректная строка.
+    """
+
+    PARSE = "parse"
+    VALIDATE = "validate"
+    RAW = "raw"
+
+
+class InvalidBodyError(ValueError):
+    """Тело ответа не удалось разобрать как JSON."""
+
+    def __init__(self, status: int, error: Exception):
+        super().__init__(f"HTTP {status}: invalid JSON body: {error}")
+        self.status = status
+
+
+class RetryableStatusError(Exception):
+    """Ответ со статусом, после которого запрос стоит повторить позже."""
+
+    def __init__(self, status: int, retry_after: Optional[float]):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+async def process_url_attempt(
     url: str,
-    output_file_path: Path,
+    attempt: int,
+    writer: ResultWriter,
     session: ClientSession,
-    semaphore: Semaphore,
-):
-    """Обрабатывает один URL с retry-логикой."""
-    for attempt in range(MAX_RETRIES):
+    host_limits: HostLimits,
+    metrics: CrawlMetrics,
+    output_mode: OutputMode = OutputMode.PARSE,
+    cache: Optional[HttpCache] = None,
+) -> Optional[float]:
+    """
+    Выполняет попытку номер attempt для url; слот хоста уже занят диспетчером.
+
+    Возвращает паузу перед следующей попыткой или None, если с URL всё
+    решено: записан результат или ошибка. Между попытками воркер не ждёт,
+    повтор по истечении паузы планирует диспетчер. Пауза учитывает
+    Retry-After и открытый circuit breaker хоста. В circuit breaker
+    засчитываются только сбои самого хоста: транспортные ошибки, таймауты
+    и ответы 5xx. Ответ 4xx или тело не в JSON говорят о конкретном URL, а
+    не о здоровье хоста; если такой ответ не 5xx, повтор вернёт то же
+    самое, и URL сразу записывается как ошибка.
+    """
+    retry_after = None
+    try:
+        retry_in = host_limits.breaker.retry_in()
+        if retry_in > 0:
+            raise CircuitOpenError(host_limits.host, retry_in)
+        metrics.add_gauge("in_flight", 1)
         try:
-            async with semaphore:
-                await stream_url_to_file(session, url, output_file_path)
-                return
-        except Exception as e:
-            if attempt == MAX_RETRIES - 1:
-                await save_error_file(url, output_file_path, str(e))
-                return
-            retry_delay = RETRY_DELAY * (2**attempt)
-            await asyncio.sleep(retry_delay)
-
-
-async def stream_url_to_file(session: ClientSession, url: str, output_file_path: Path):
-    """Определяет тип контента и записывает его в файл."""
-    async with session.get(url) as resp:
-        text = None
-        temp_file_path = (
-            output_file_path.parent
-            / f"temp_{hashlib.sha256(url.encode()).hexdigest()}.bin"
-        )
-        if int(resp.headers.get("content-length", 0)) > CHUNK_SIZE:
-            async with async_open(
-                temp_file_path,
-                "ab",
-            ) as file:
-                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
-                    await file.write(chunk)
+            with metrics.phase("attempt"):
+                status = await stream_url_to_file(
+                    session, url, writer, metrics, output_mode, cache
+                )
+        finally:
+            metrics.add_gauge("in_flight", -1)
+        if status >= HTTPStatus.INTERNAL_SERVER_ERROR:
+            host_limits.record_failure()
         else:
-            text = await resp.text()
-
-        loop = asyncio.get_running_loop()
-        if text is None:
-            parsed_content = await loop.run_in_executor(
-                process_pool, parse_large_json, temp_file_path
-            )
-            temp_file_path.unlink()
+            host_limits.record_success()
+        metrics.inc("urls_done")
+        return None
+    except CircuitOpenError as e:
+        error, retry_after = e, e.retry_in
+    except RetryableStatusError as e:
+        if e.status == 429:
+            host_limits.record_throttled()
         else:
-            parsed_content = await loop.run_in_executor(process_pool, json.loads, text)
-        async with async_open(output_file_path, "a") as file:
-            await file.write(
-                f"{
-                    json.dumps(
-                        {
-                            'url': url,
-                            'status_code': resp.status,
-                            'content': parsed_content,
-                        }
-                    )
-                }\n"
-            )
-
-
-def parse_large_json(file_path: Path) -> dict:
-    with open(file_path, "r") as f:
-        return json.loads(f.read())
-
-
-async def save_error_file(url: str, output_file_path: Path, error: str):
-    """Сохраняет ошибку в файл."""
-    async with async_open(output_file_path, "a") as f:
-        await f.write(
-            f"{
-                json.dumps(
-                    {
-                        'url': url,
-                        'status_code': 0,
-                        'error': error,
-                    }
-                )
-            }\n"
+            host_limits.record_failure()
+        error, retry_after = e, e.retry_after
+    except (ClientError, asyncio.TimeoutError) as e:
+        host_limits.record_failure()
+        error = e
+    except InvalidBodyError as e:
+        if e.status < HTTPStatus.INTERNAL_SERVER_ERROR:
+            metrics.inc("urls_failed")
+            await save_error_file(url, writer, str(e))
+            return None
+        host_limits.record_failure()
+        error = e
+    except WriterError:
+        # писать результаты некуда: повторы не помогут, обход прерывается
+        raise
+    except Exception as e:
+        error = e
+    if attempt >= MAX_RETRIES - 1:
+        metrics.inc("urls_failed")
+        await save_error_file(url, writer, str(error))
+        return None
+    metrics.inc("retries")
+    return retry_delay(attempt, retry_after)
+
+
+def retry_delay(attempt: int, retry_after: Optional[float]) -> float:
+    """
+    Пауза перед следующей попыткой.
+
+    Без Retry-After — экспоненциальная пауза со случайным джиттером в
+    пределах [0, RETRY_DELAY * 2**attempt]. С Retry-After — не раньше, чем
+    просил сервер, плюс джиттер до RETRY_JITTER секунд.
+    """
+    if retry_after is None:
+        return random.uniform(0, RETRY_DELAY * (2**attempt))
+    return min(retry_after, MAX_RETRY_AFTER) + random.uniform(0, RETRY_JITTER)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Разбирает Retry-After в секундах или в виде HTTP-даты."""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at - time.time())
+
+
+async def stream_url_to_file(
+    session: ClientSession,
+    url: str,
+    writer: ResultWriter,
+    metrics: CrawlMetrics,
+    output_mode: OutputMode = OutputMode.PARSE,
+    cache: Optional[HttpCache] = None,
+) -> int:
+    """
+    Определяет тип контента и записывает его в файл.
+
+    С cache запрос отправляется с If-None-Match/If-Modified-Since, и на 304
+    в запись попадает содержимое из кеша без скачивания тела. Возвращает
+    статус записанного ответа.
+    """
+    cached = await cache.lookup(url) if cache is not None else None
+    headers = cached.conditional_headers() if cached is not None else None
+    async with session.get(url, headers=headers) as resp:
+        if resp.status != HTTPStatus.NOT_MODIFIED or cached is None:
+            await write_response(url, resp, writer, metrics, output_mode, cache)
+            return resp.status
+        content = await cache.read_content(cached)
+    if content is None:
+        # запись вытеснили из кеша после lookup, запрашиваем тело заново
+        return await stream_url_to_file(session, url, writer, metrics, output_mode)
+    metrics.inc("cache_hits")
+    with metrics.phase("write_wait"):
+        await writer.write_raw_line(
+            _record_head(url, cached.status_code) + content + b"}", completed_url=url
         )
+    return cached.status_code
+
+
+async def write_response(
+    url: str,
+    resp: ClientResponse,
+    writer: ResultWriter,
+    metrics: CrawlMetrics,
+    output_mode: OutputMode = OutputMode.PARSE,
+    cache: Optional[HttpCache] = None,
+):
+    """
+    Читает тело ответа и передаёт запись писателю.
+
+    Тело читается кусками, пока не кончится или не превысит CHUNK_SIZE
+    байт; большее тело дочитывается потоком, так что память на один URL
+    ограничена независимо от Content-Length и chunked-кодирования. Время
+    чтения тела, разбора и ожидания очереди писателя попадает в фазы body,
+    parse и write_wait, дочитывание больших тел — в body_stream.
+    Содержимое ответов 200 сохраняется в cache, большие тела — нет.
+    """
+    if resp.status in RETRY_STATUSES:
+        raise RetryableStatusError(
+            resp.status, parse_retry_after(resp.headers.get("Retry-After"))
+        )
+    with metrics.phase("body"):
+        head, complete = await _read_head(resp.content, CHUNK_SIZE)
+    if not complete:
+        stream = _PrefixedStream(head, resp.content)
+        with metrics.phase("body_stream"):
+            if output_mode is OutputMode.RAW and _is_json_success(resp):
+                await stream_raw_body_to_file(url, resp, stream, writer)
+            else:
+                await stream_large_json_to_file(url, resp, stream, writer)
+        return
+
+    body = b"".join(head)
+    if output_mode is OutputMode.PARSE:
+        with metrics.phase("parse"):
+            parsed_content = await _decode(resp, json.loads, body)
+        content = json.dumps(parsed_content).encode()
+    else:
+        if (
+            output_mode is OutputMode.VALIDATE
+            or not _is_json_success(resp)
+            or not body.strip()
+        ):
+            with metrics.phase("parse"):
+                await _decode(resp, validate_json, body)
+        content = _to_single_line(body)
+
+    with metrics.phase("write_wait"):
+        await writer.write_raw_line(
+            _record_head(url, resp.status) + content + b"}", completed_url=url
+        )
+    if cache is not None and resp.status == HTTPStatus.OK:
+        await cache.store(url, resp.status, resp.headers, content)
+
+
+async def stream_large_json_to_file(
+    url: str, resp: ClientResponse, stream: "_PrefixedStream", writer: ResultWriter
+):
+    """
+    Разбирает большое тело прямо из stream и передаёт запись писателю по частям.
+
+    Чтение из сети и разбор идут в задаче воркера: write_stream собирает
+    запись во временном файле, и писателю достаётся только готовая запись.
+    Если разбор прервался, запись в файл не попадает. Тело не в JSON
+    приводит к InvalidBodyError, как и у небольших тел.
+    """
+
+    async def chunks():
+        yield _record_head(url, resp.status)
+        try:
+            async for text in iter_json_text(stream):
+                yield text
+        except ijson.JSONError as e:
+            raise InvalidBodyError(resp.status, e) from e
+        yield "}"
+
+    await writer.write_stream(chunks(), completed_url=url)
+
+
+async def stream_raw_body_to_file(
+    url: str, resp: ClientResponse, stream: "_PrefixedStream", writer: ResultWriter
+):
+    """Передаёт большое тело писателю по частям как есть, без разбора."""
+
+    async def chunks():
+        yield _record_head(url, resp.status)
+        while chunk := await stream.read(RAW_CHUNK_SIZE):
+            yield _to_single_line(chunk)
+        yield b"}"
+
+    await writer.write_stream(chunks(), completed_url=url)
+
+
+class _PrefixedStream:
+    """Поток тела: сначала уже прочитанные куски, затем остаток content."""
+
+    def __init__(self, head: list[bytes], content: StreamReader):
+        self._head = deque(head)
+        self._content = content
+
+    async def read(self, size: int = -1) -> bytes:
+        # ijson вызывает read(0), чтобы узнать тип данных потока
+        if self._head and size != 0:
+            return self._head.popleft()
+        return await self._content.read(size)
+
+
+async def _read_head(content: StreamReader, limit: int) -> tuple[list[bytes], bool]:
+    """
+    Читает тело кусками, пока оно не кончится или не превысит limit байт.
+
+    Возвращает прочитанные куски и признак того, что тело прочитано целиком.
+    Решение принимается по прочитанным байтам, а не по Content-Length: у
+    chunked-ответов его нет.
+    """
+    chunks = []
+    size = 0
+    while size <= limit:
+        chunk = await content.read(RAW_CHUNK_SIZE)
+        if not chunk:
+            return chunks, True
+        chunks.append(chunk)
+        size += len(chunk)
+    return chunks, False
+
+
+def validate_json(body: bytes) -> None:
+    """Проверяет JSON в процессе пула. Разобранный объект обратно не передаётся."""
+    json.loads(body)
+
+
+async def _decode(resp: ClientResponse, decode, body):
+    """Разбирает тело в process_pool; ошибку разбора помечает статусом ответа."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(process_pool, decode, body)
+    except ValueError as e:
+        raise InvalidBodyError(resp.status, e) from e
+
+
+def _is_json_success(resp: ClientResponse) -> bool:
+    """Ответ 2xx с JSON, тело которого RAW может вставить без проверки."""
+    return (
+        200 <= resp.status < 300
+        and resp.status != HTTPStatus.NO_CONTENT
+        and "json" in resp.content_type
+    )
+
+
+def _record_head(url: str, status_code: int) -> bytes:
+    """Начало записи результата, после которого идёт значение content."""
+    head = json.dumps({"url": url, "status_code": status_code})[:-1]
+    return f'{head}, "content": '.encode()
+
+
+def _to_single_line(body: bytes) -> bytes:
+    """
+    Заменяет переводы строк пробелами.
+
+    В корректном JSON они встречаются только как пробельные символы между
+    токенами, поэтому значение не меняется, а запись остаётся одной строкой.
+    """
+    return body.replace(b"\r", b" ").replace(b"\n", b" ")
+
+
+async def save_error_file(url: str, writer: ResultWriter, error: str):
+    """Сохраняет ошибку в файл ошибок писателя."""
+    await writer.write_error({"url": url, "status_code": 0, "error": error})
@@ -1,34 +1,212 @@
 import asyncio
-from asyncio import Queue, Semaphore
+import heapq
+import itertools
+import math
+import time
+from asyncio import Queue
+from collections import deque
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 
 from aiofile import async_open
 from aiohttp import ClientSession
 
-from processing import process_single_url_with_retry
+from checkpoint import CompletedIndex
+from host_limits import CrawlLimits, HostLimits
+from http_cache import HttpCache
+from metrics import CrawlMetrics
+from processing import OutputMode, process_url_attempt
+from writer import ResultWriter
 
+DISPATCH_BUFFER = 10_000
 
-async def add_url_to_queue(queue: Queue, urls_file_path: Path):
-    """Читает URL из файла и добавляет их в очередь."""
+
+async def add_url_to_queue(
+    queue: Queue,
+    urls_file_path: Path,
+    completed_index: Optional[CompletedIndex] = None,
+):
+    """
+    Читает URL из файла и добавляет их в очередь.
+
+    Очередь ограничена, поэтому чтение ждёт, пока диспетчер разберёт URL.
+    URL из completed_index пропускаются. В конце кладёт None.
+    """
     async with async_open(urls_file_path, "r") as file:
         async for line in file:
             url = line.strip()
-            if url:
+            if url and (completed_index is None or url not in completed_index):
                 await queue.put(url)
     await queue.put(None)
 
 
+@dataclass
+class _Job:
+    """Очередная попытка для URL; reserved — занят ли под неё слот хоста."""
+
+    url: str
+    host_limits: HostLimits
+    attempt: int = 0
+    ready_at: float = 0.0
+    reserved: bool = False
+
+
+class Dispatcher:
+    """
+    Выдаёт воркерам URL только тех хостов, которые готовы принять запрос.
+
+    URL из входной очереди раскладываются по очередям хостов. Воркер
+    получает URL вместе с уже занятым слотом (CrawlLimits.try_acquire),
+    поэтому ни один воркер не ждёт занятый или ограниченный по частоте
+    хост: пока такой хост не готов, воркеры обслуживают остальные. Повторы
+    лежат в куче по времени готовности и возвращаются в очередь хоста,
+    когда пауза истекла. URL хоста с открытым circuit breaker выдаются без
+    слота: попытка сразу завершается CircuitOpenError и откладывается.
+
+    Необработанных URL в диспетчере не больше buffer_size, поэтому память
+    не зависит от длины входного файла.
+    """
+
+    def __init__(
+        self,
+        queue: Queue,
+        limits: CrawlLimits,
+        metrics: CrawlMetrics,
+        buffer_size: int = DISPATCH_BUFFER,
+    ):
+        self._queue = queue
+        self._limits = limits
+        self._metrics = metrics
+        self._buffer_size = buffer_size
+        # порядок обхода хостов: хост, выдавший URL, уходит в конец
+        self._hosts: dict[HostLimits, deque[_Job]] = {}
+        self._delayed: list[tuple[float, int, _Job]] = []
+        self._sequence = itertools.count()
+        self._unfinished = 0
+        self._input_done = False
+        self._changed = asyncio.Event()
+
+    async def feed(self) -> None:
+        """Переносит URL из входной очереди, пока в буфере есть место."""
+        while True:
+            while self._unfinished >= self._buffer_size:
+                self._changed.clear()
+                await self._changed.wait()
+            url = await self._queue.get()
+            if url is None:
+                self._input_done = True
+                self._changed.set()
+                return
+            self._unfinished += 1
+            job = _Job(url, self._limits.for_url(url), ready_at=time.monotonic())
+            self._push(job)
+            self._changed.set()
+
+    async def next(self) -> Optional[_Job]:
+        """Следующая попытка с занятым слотом или None, когда все URL обработаны."""
+        while True:
+            self._changed.clear()
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, job = heapq.heappop(self._delayed)
+                self._push(job)
+            job, wait = self._take_ready()
+            if job is not None:
+                self._metrics.observe("slot_wait", now - job.ready_at)
+                return job
+            if self._input_done and self._unfinished == 0:
+                return None
+            if self._delayed:
+                wait = min(wait, self._delayed[0][0] - now)
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait(), None if wait == math.inf else wait
+                )
+            except TimeoutError:
+                pass
+
+    def done(self, job: _Job, retry_delay: Optional[float]) -> None:
+        """Освобождает слот попытки и откладывает повтор, если он нужен."""
+        if job.reserved:
+            self._limits.release(job.host_limits)
+            job.reserved = False
+        if retry_delay is None:
+            self._unfinished -= 1
+        else:
+            job.attempt += 1
+            job.ready_at = time.monotonic() + retry_delay
+            heapq.heappush(self._delayed, (job.ready_at, next(self._sequence), job))
+        self._changed.set()
+
+    def _push(self, job: _Job) -> None:
+        self._hosts.setdefault(job.host_limits, deque()).append(job)
+
+    def _take_ready(self) -> tuple[Optional[_Job], float]:
+        """Первый URL готового хоста, иначе — через сколько секунд проверить снова."""
+        wait = math.inf
+        for host_limits, jobs in self._hosts.items():
+            if host_limits.breaker.retry_in() == 0:
+                host_wait = self._limits.try_acquire(host_limits)
+                if host_wait > 0:
+                    wait = min(wait, host_wait)
+                    continue
+                jobs[0].reserved = True
+            job = jobs.popleft()
+            del self._hosts[host_limits]
+            if jobs:
+                self._hosts[host_limits] = jobs
+            return job, 0.0
+        return None, wait
+
+
 async def process_urls(
-    queue: Queue, output_file_path: Path, session: ClientSession, semaphore: Semaphore
+    queue: Queue,
+    writer: ResultWriter,
+    session: ClientSession,
+    limits: CrawlLimits,
+    metrics: CrawlMetrics,
+    workers_count: int,
+    output_mode: OutputMode = OutputMode.PARSE,
+    cache: Optional[HttpCache] = None,
+):
+    """Запускает диспетчер и фиксированный пул воркеров, разбирающих очередь URL-ов."""
+    dispatcher = Dispatcher(queue, limits, metrics)
+    await asyncio.gather(
+        dispatcher.feed(),
+        *(
+            process_urls_worker(
+                dispatcher, writer, session, metrics, output_mode, cache
+            )
+            for _ in range(workers_count)
+        ),
+    )
+
+
+async def process_urls_worker(
+    dispatcher: Dispatcher,
+    writer: ResultWriter,
+    session: ClientSession,
+    metrics: CrawlMetrics,
+    output_mode: OutputMode = OutputMode.PARSE,
+    cache: Optional[HttpCache] = None,
 ):
-    """Запускает обработку URL-ов."""
-    tasks = []
+    """Выполняет попытки, которые выдаёт диспетчер, пока он не вернёт None."""
     while True:
-        url = await queue.get()
-        if url is None:
-            break
-        task = asyncio.create_task(
-            process_single_url_with_retry(url, output_file_path, session, semaphore)
-        )
-        tasks.append(task)
-    await asyncio.gather(*tasks)
+        job = await dispatcher.next()
+        if job is None:
+            return
+        retry_delay = None
+        try:
+            retry_delay = await process_url_attempt(
+                job.url,
+                job.attempt,
+                writer,
+                session,
+                job.host_limits,
+                metrics,
+                output_mode,
+                cache,
+            )
+        finally:
+            dispatcher.done(job, retry_delay)
@@ -0,0 +1,43 @@
+import hashlib
+import shutil
+from contextlib import ExitStack
+from pathlib import Path
+
+from yarl import URL
+
+
+def shard_index(url: str, shards_count: int) -> int:
+    """Номер шарда по хосту URL. Одинаков между запусками, в отличие от hash()."""
+    host = (URL(url).host or "").encode()
+    digest = hashlib.blake2b(host, digest_size=8).digest()
+    return int.from_bytes(digest, "little") % shards_count
+
+
+def split_urls_by_host(
+    urls_file_path: Path, shards_dir: Path, shards_count: int
+) -> list[Path]:
+    """
+    Раскладывает URL из файла по shards_count файлам в shards_dir.
+
+    Все URL одного хоста попадают в один шард, чтобы процесс шарда
+    переиспользовал соединения с ним. Файл читается построчно.
+    """
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    shard_paths = [shards_dir / f"urls.{i}.txt" for i in range(shards_count)]
+    with ExitStack() as stack:
+        shard_files = [stack.enter_context(open(path, "w")) for path in shard_paths]
+        with open(urls_file_path) as urls_file:
+            for line in urls_file:
+                url = line.strip()
+                if url:
+                    shard_files[shard_index(url, shards_count)].write(f"{url}\n")
+    return shard_paths
+
+
+def merge_shards(shard_output_paths: list[Path], output_file_path: Path) -> None:
+    """Собирает результаты шардов в один файл, перезаписывая его."""
+    with open(output_file_path, "wb") as output_file:
+        for shard_output_path in shard_output_paths:
+            if shard_output_path.exists():
+                with open(shard_output_path, "rb") as shard_file:
+                    shutil.copyfileobj(shard_file, output_file)
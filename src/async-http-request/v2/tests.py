@@ -0,0 +1,635 @@
+import asyncio
+import contextlib
+import io
+import json
+import math
+import tempfile
+import tracemalloc
+import unittest
+from asyncio import Queue
+from pathlib import Path
+from typing import AsyncIterator
+from unittest import mock
+
+from aiohttp import ClientSession, web
+
+import main
+import processing
+import queue_management
+from checkpoint import CompletedIndex, HashSet
+from host_limits import CircuitBreaker, CrawlLimits
+from http_cache import HttpCache
+from json_stream import iter_json_text
+from metrics import CrawlMetrics
+from sharding import merge_shards, split_urls_by_host
+from writer import ResultWriter, WriterError
+
+
+async def _handle_json(request: web.Request) -> web.Response:
+    return web.Response(text='{"value":\n [1, 2]}', content_type="application/json")
+
+
+async def _handle_html(request: web.Request) -> web.Response:
+    return web.Response(status=404, text="<html>nope</html>", content_type="text/html")
+
+
+async def _handle_server_error(request: web.Request) -> web.Response:
+    return web.Response(status=500, text="<html>oops</html>", content_type="text/html")
+
+
+async def _handle_empty(request: web.Request) -> web.Response:
+    return web.Response(status=204)
+
+
+LARGE_DOCUMENT = {"items": list(range(200)), "name": "большой\nдокумент"}
+
+
+async def _send_chunked(request: web.Request, body: bytes, content_type: str):
+    """Отдаёт body кусками по 50 байт без Content-Length."""
+    response = web.StreamResponse(headers={"Content-Type": content_type})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    for start in range(0, len(body), 50):
+        await response.write(body[start : start + 50])
+    await response.write_eof()
+    return response
+
+
+async def _handle_large_json(request: web.Request) -> web.StreamResponse:
+    body = json.dumps(LARGE_DOCUMENT, indent=1).encode()
+    return await _send_chunked(request, body, "application/json")
+
+
+async def _handle_large_html(request: web.Request) -> web.StreamResponse:
+    return await _send_chunked(request, b"<p>nope</p>" * 100, "text/html")
+
+
+async def _crawl(
+    urls: list[str], writer: ResultWriter, session: ClientSession, limits: CrawlLimits
+) -> None:
+    """Обходит urls так же, как fetch_urls, но без файла со списком URL."""
+    queue = Queue()
+    for url in urls:
+        queue.put_nowait(url)
+    queue.put_nowait(None)
+    await queue_management.process_urls(
+        queue, writer, session, limits, CrawlMetrics(), workers_count=4
+    )
+
+
+@contextlib.asynccontextmanager
+async def _stub_server() -> AsyncIterator[str]:
+    """
+    Заглушка с ответами /json, /html (404), /server-error, /empty (204) и
+    большими chunked-телами /large-json и /large-html.
+    """
+    stub_app = web.Application()
+    stub_app.router.add_get("/large-json", _handle_large_json)
+    stub_app.router.add_get("/large-html", _handle_large_html)
+    stub_app.router.add_get("/json", _handle_json)
+    stub_app.router.add_get("/html", _handle_html)
+    stub_app.router.add_get("/server-error", _handle_server_error)
+    stub_app.router.add_get("/empty", _handle_empty)
+    runner = web.AppRunner(stub_app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        await runner.cleanup()
+
+
+class TestProcessUrls(unittest.TestCase):
+    workers_count = 10
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.tmp_path = Path(self.tmp_dir.name)
+
+    def _write_urls(self, count: int) -> Path:
+        urls_file_path = self.tmp_path / f"urls_{count}.txt"
+        with open(urls_file_path, "w") as file:
+            file.writelines(f"https://example.com/{i}\n" for i in range(count))
+        return urls_file_path
+
+    def _run(self, urls_file_path: Path) -> tuple[int, int]:
+        """Возвращает число обработанных URL и пик памяти за прогон."""
+        processed = 0
+
+        async def fake_process(url, *args):
+            nonlocal processed
+            processed += 1
+            await asyncio.sleep(0)
+
+        async def run():
+            queue = Queue(maxsize=self.workers_count * 2)
+            limits = CrawlLimits(
+                self.workers_count, max_per_host=self.workers_count, host_rate=1e9
+            )
+            await asyncio.gather(
+                queue_management.add_url_to_queue(queue, urls_file_path),
+                queue_management.process_urls(
+                    queue, None, None, limits, CrawlMetrics(), self.workers_count
+                ),
+            )
+
+        with mock.patch.object(queue_management, "process_url_attempt", fake_process):
+            tracemalloc.start()
+            try:
+                asyncio.run(run())
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        return processed, peak
+
+    def test_all_urls_processed(self):
+        processed, _ = self._run(self._write_urls(1000))
+        self.assertEqual(processed, 1000)
+
+    def test_memory_is_flat_for_large_input(self):
+        small_processed, small_peak = self._run(self._write_urls(10_000))
+        large_processed, large_peak = self._run(self._write_urls(1_000_000))
+
+        self.assertEqual(small_processed, 10_000)
+        self.assertEqual(large_processed, 1_000_000)
+        self.assertLess(large_peak, small_peak * 2)
+
+
+class TestCrawlLimits(unittest.TestCase):
+    def test_busy_host_does_not_block_other_hosts(self):
+        limits = CrawlLimits(max_concurrent=2, max_per_host=1)
+        slow = limits.for_url("https://slow.example/1")
+        fast = limits.for_url("https://fast.example/1")
+
+        self.assertEqual(limits.try_acquire(slow), 0)
+        self.assertEqual(limits.try_acquire(slow), math.inf)
+        self.assertEqual(limits.try_acquire(fast), 0)
+        limits.release(slow)
+        self.assertEqual(limits.try_acquire(slow), 0)
+
+    def test_rate_limit_reports_wait(self):
+        limits = CrawlLimits(max_concurrent=4, host_rate=2, host_burst=1)
+        host_limits = limits.for_url("https://rate.example/")
+        self.assertEqual(limits.try_acquire(host_limits), 0)
+        limits.release(host_limits)
+        self.assertAlmostEqual(limits.try_acquire(host_limits), 0.5, places=2)
+
+    def test_circuit_opens_after_failures(self):
+        limits = CrawlLimits(max_concurrent=1, failure_threshold=2, reset_timeout=60)
+        host_limits = limits.for_url("https://down.example/")
+        host_limits.record_failure()
+        host_limits.record_failure()
+
+        metrics = CrawlMetrics()
+        retry_delay = asyncio.run(
+            processing.process_url_attempt(
+                "https://down.example/", 0, None, None, host_limits, metrics
+            )
+        )
+        self.assertGreater(retry_delay, 59)
+        self.assertEqual(metrics.counters["retries"], 1)
+
+    def test_circuit_closes_after_success(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.retry_in(), 0)
+        breaker.record_failure()
+        self.assertGreater(breaker.retry_in(), 0)
+
+    def test_only_host_failures_open_circuit(self):
+        async def crawl(path: str, times: int) -> float:
+            limits = CrawlLimits(max_concurrent=1, failure_threshold=2)
+            output_file_path = Path(tmp_dir) / "results.jsonl"
+            async with (
+                _stub_server() as base_url,
+                ClientSession() as session,
+                ResultWriter(output_file_path) as writer,
+            ):
+                await _crawl([base_url + path] * times, writer, session, limits)
+                return limits.for_url(base_url).breaker.retry_in()
+
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            mock.patch.object(processing, "retry_delay", return_value=0),
+        ):
+            self.assertEqual(asyncio.run(crawl("/html", 3)), 0)
+            self.assertGreater(asyncio.run(crawl("/server-error", 1)), 0)
+
+    def test_throttled_host_does_not_stall_other_hosts(self):
+        """Повторы для хоста с 429 не занимают воркеров, пока идут другие хосты."""
+        fast_requests = 0
+
+        async def run():
+            fast_done = asyncio.Event()
+
+            async def handle_throttled(request: web.Request) -> web.Response:
+                return web.Response(status=429, headers={"Retry-After": "3"})
+
+            async def handle_fast(request: web.Request) -> web.Response:
+                nonlocal fast_requests
+                fast_requests += 1
+                if fast_requests == 40:
+                    fast_done.set()
+                return web.json_response({"value": 1})
+
+            stub_app = web.Application()
+            stub_app.router.add_get("/throttled", handle_throttled)
+            stub_app.router.add_get("/fast", handle_fast)
+            runner = web.AppRunner(stub_app)
+            await runner.setup()
+            await web.TCPSite(runner, "0.0.0.0", 0).start()
+            port = runner.addresses[0][1]
+            urls = [f"http://127.0.0.1:{port}/throttled"] * 40
+            urls += [f"http://127.0.0.2:{port}/fast"] * 40
+            output_file_path = Path(tmp_dir) / "results.jsonl"
+            try:
+                async with (
+                    ClientSession() as session,
+                    ResultWriter(output_file_path) as writer,
+                ):
+                    limits = CrawlLimits(max_concurrent=5, host_rate=100)
+                    crawl = asyncio.create_task(_crawl(urls, writer, session, limits))
+                    try:
+                        await asyncio.wait_for(fast_done.wait(), 5)
+                    finally:
+                        crawl.cancel()
+                        with contextlib.suppress(asyncio.CancelledError):
+                            await crawl
+            finally:
+                await runner.cleanup()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            asyncio.run(run())
+        self.assertEqual(fast_requests, 40)
+
+    def test_retry_delay_honours_retry_after(self):
+        self.assertEqual(processing.parse_retry_after("120"), 120)
+        for _ in range(100):
+            delay = processing.retry_delay(0, retry_after=30)
+            self.assertGreaterEqual(delay, 30)
+            self.assertLessEqual(delay, 30 + processing.RETRY_JITTER)
+            self.assertLessEqual(
+                processing.retry_delay(2, None), processing.RETRY_DELAY * 4
+            )
+
+
+class TestCompletedIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.output_file_path = Path(self.tmp_dir.name) / "results.jsonl"
+
+    def test_hash_set_grows(self):
+        hash_set = HashSet()
+        values = range(1, 10_000, 3)
+        for value in values:
+            hash_set.add(value)
+        hash_set.add(1)
+
+        self.assertEqual(len(hash_set), len(values))
+        self.assertTrue(all(value in hash_set for value in values))
+        self.assertNotIn(2, hash_set)
+
+    def test_restarted_run_skips_completed_urls(self):
+        urls_file_path = Path(self.tmp_dir.name) / "urls.txt"
+        urls_file_path.write_text("https://a.example\nhttps://b.example\n")
+        self.output_file_path.write_text('{"url": "https://a.example"}\n{"url": "ht')
+
+        errors_file_path = self.output_file_path.with_name("results.errors.jsonl")
+
+        async def first_run():
+            index = CompletedIndex.for_output(self.output_file_path)
+            async with ResultWriter(
+                self.output_file_path,
+                completed_index=index,
+                errors_file_path=errors_file_path,
+            ) as w:
+                await w.write(
+                    {"url": "https://a.example"}, completed_url="https://a.example"
+                )
+                await w.write_error({"url": "https://b.example", "error": "timeout"})
+
+        async def restarted_run() -> list[str]:
+            index = CompletedIndex.for_output(self.output_file_path)
+            index.load()
+            queue = Queue()
+            await queue_management.add_url_to_queue(queue, urls_file_path, index)
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        asyncio.run(first_run())
+        self.assertEqual(asyncio.run(restarted_run()), ["https://b.example", None])
+        with open(self.output_file_path) as file:
+            self.assertEqual(len([json.loads(line) for line in file]), 2)
+        with open(errors_file_path) as file:
+            self.assertEqual(json.loads(file.read())["url"], "https://b.example")
+
+    def test_resumed_run_leaves_one_record_per_url(self):
+        urls_file_path = Path(self.tmp_dir.name) / "urls.txt"
+        urls_file_path.write_text("http://127.0.0.1:1/down\n")
+
+        def crawl():
+            with mock.patch.object(processing, "retry_delay", return_value=0):
+                asyncio.run(main.fetch_urls(urls_file_path, self.output_file_path))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            crawl()
+            crawl()
+        self.assertEqual(self.output_file_path.read_text(), "")
+        errors = main.errors_file_path(self.output_file_path).read_text()
+        self.assertEqual(len(errors.splitlines()), 1)
+
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.tmp_path = Path(self.tmp_dir.name)
+
+    def test_not_modified_response_reuses_cached_content(self):
+        bodies_sent = 0
+
+        async def handle(request: web.Request) -> web.Response:
+            nonlocal bodies_sent
+            if request.headers.get("If-None-Match") == '"v1"':
+                return web.Response(status=304)
+            bodies_sent += 1
+            return web.json_response({"value": [1, 2]}, headers={"ETag": '"v1"'})
+
+        async def crawl(url: str, output_file_path: Path) -> CrawlMetrics:
+            cache = HttpCache(self.tmp_path / "cache")
+            cache.load()
+            metrics = CrawlMetrics()
+            async with (
+                ClientSession() as session,
+                ResultWriter(output_file_path) as writer,
+            ):
+                await processing.stream_url_to_file(
+                    session, url, writer, metrics, cache=cache
+                )
+            return metrics
+
+        async def run() -> list[CrawlMetrics]:
+            stub_app = web.Application()
+            stub_app.router.add_get("/data", handle)
+            runner = web.AppRunner(stub_app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            host, port = runner.addresses[0][:2]
+            try:
+                url = f"http://{host}:{port}/data"
+                return [
+                    await crawl(url, self.tmp_path / "first.jsonl"),
+                    await crawl(url, self.tmp_path / "second.jsonl"),
+                ]
+            finally:
+                await runner.cleanup()
+
+        first, second = asyncio.run(run())
+
+        self.assertEqual(bodies_sent, 1)
+        self.assertNotIn("cache_hits", first.counters)
+        self.assertEqual(second.counters["cache_hits"], 1)
+        first_record = json.loads((self.tmp_path / "first.jsonl").read_text())
+        second_record = json.loads((self.tmp_path / "second.jsonl").read_text())
+        self.assertEqual(first_record["content"], {"value": [1, 2]})
+        self.assertEqual(second_record, first_record)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        async def run() -> HttpCache:
+            cache = HttpCache(self.tmp_path / "cache", max_bytes=600)
+            cache.load()
+            headers = {"ETag": '"1"'}
+            for name in ("a", "b", "c"):
+                await cache.store(f"https://{name}.example", 200, headers, b"x" * 100)
+            cache.touch(await cache.lookup("https://a.example"))
+            await cache.store("https://d.example", 200, headers, b"x" * 100)
+            return cache
+
+        cache = asyncio.run(run())
+        reloaded = HttpCache(self.tmp_path / "cache", max_bytes=600)
+        reloaded.load()
+
+        self.assertLessEqual(cache.total_bytes, 600)
+        self.assertEqual(reloaded.total_bytes, cache.total_bytes)
+        for name, cached in (("a", True), ("b", False), ("c", True), ("d", True)):
+            url = f"https://{name}.example"
+            self.assertEqual(asyncio.run(reloaded.lookup(url)) is not None, cached)
+
+
+class TestOutputModes(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.output_file_path = Path(self.tmp_dir.name) / "results.jsonl"
+
+    def _crawl(self, path: str, output_mode: processing.OutputMode) -> list[dict]:
+        """Запрашивает path у заглушки и возвращает записи файла результатов."""
+
+        async def run():
+            async with (
+                _stub_server() as base_url,
+                ClientSession() as session,
+                ResultWriter(self.output_file_path) as writer,
+            ):
+                await processing.stream_url_to_file(
+                    session, base_url + path, writer, CrawlMetrics(), output_mode
+                )
+
+        asyncio.run(run())
+        with open(self.output_file_path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_json_body_is_spliced(self):
+        for mode in (processing.OutputMode.VALIDATE, processing.OutputMode.RAW):
+            with self.subTest(mode=mode):
+                self.output_file_path.unlink(missing_ok=True)
+                records = self._crawl("/json", mode)
+                self.assertEqual(records[0]["content"], {"value": [1, 2]})
+                self.assertEqual(records[0]["status_code"], 200)
+
+    def test_non_json_body_is_rejected(self):
+        for mode in (processing.OutputMode.VALIDATE, processing.OutputMode.RAW):
+            for path in ("/html", "/empty"):
+                with self.subTest(mode=mode, path=path):
+                    self.output_file_path.unlink(missing_ok=True)
+                    with self.assertRaises(processing.InvalidBodyError):
+                        self._crawl(path, mode)
+                    self.assertEqual(self.output_file_path.read_text(), "")
+
+    def test_large_chunked_body_is_streamed(self):
+        with (
+            mock.patch.object(processing, "CHUNK_SIZE", 100),
+            mock.patch.object(processing, "RAW_CHUNK_SIZE", 30),
+        ):
+            for mode in processing.OutputMode:
+                with self.subTest(mode=mode):
+                    self.output_file_path.unlink(missing_ok=True)
+                    records = self._crawl("/large-json", mode)
+                    self.assertEqual(records[0]["content"], LARGE_DOCUMENT)
+
+                    self.output_file_path.unlink(missing_ok=True)
+                    with self.assertRaises(processing.InvalidBodyError):
+                        self._crawl("/large-html", mode)
+                    self.assertEqual(self.output_file_path.read_text(), "")
+
+    def test_invalid_body_is_not_retried(self):
+        async def run():
+            async with (
+                _stub_server() as base_url,
+                ClientSession() as session,
+                ResultWriter(self.output_file_path) as writer,
+            ):
+                url = base_url + "/large-html"
+                host_limits = CrawlLimits(1).for_url(url)
+                self.assertIsNone(
+                    await processing.process_url_attempt(
+                        url, 0, writer, session, host_limits, CrawlMetrics()
+                    )
+                )
+
+        with (
+            mock.patch.object(processing, "CHUNK_SIZE", 100),
+            mock.patch.object(processing, "retry_delay") as retry_delay,
+        ):
+            asyncio.run(run())
+        retry_delay.assert_not_called()
+        record = json.loads(self.output_file_path.read_text())
+        self.assertIn("invalid JSON body", record["error"])
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.tmp_path = Path(self.tmp_dir.name)
+
+    def test_urls_of_one_host_go_to_one_shard(self):
+        urls = [f"https://host{i % 7}.example/{i}" for i in range(100)]
+        urls_file_path = self.tmp_path / "urls.txt"
+        urls_file_path.write_text("\n".join(urls) + "\n\n")
+
+        shard_paths = split_urls_by_host(urls_file_path, self.tmp_path / "shards", 3)
+
+        shards = [path.read_text().split() for path in shard_paths]
+        self.assertCountEqual([url for shard in shards for url in shard], urls)
+        hosts = [{url.split("/")[2] for url in shard} for shard in shards]
+        for i, shard_hosts in enumerate(hosts):
+            for other_hosts in hosts[i + 1 :]:
+                self.assertFalse(shard_hosts & other_hosts)
+
+    def test_merge_overwrites_output(self):
+        shard_paths = [self.tmp_path / f"results.{i}.jsonl" for i in range(3)]
+        shard_paths[0].write_text('{"url": "a"}\n')
+        shard_paths[2].write_text('{"url": "b"}\n')
+        output_file_path = self.tmp_path / "results.jsonl"
+        output_file_path.write_text("stale\n")
+
+        merge_shards(shard_paths, output_file_path)
+
+        self.assertEqual(output_file_path.read_text(), '{"url": "a"}\n{"url": "b"}\n')
+
+
+class TestResultWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.output_file_path = Path(self.tmp_dir.name) / "results.jsonl"
+
+    def test_records_written_in_order(self):
+        async def failing_chunks():
+            yield '{"url": "broken", '
+            raise ValueError("обрыв")
+
+        async def chunks():
+            yield '{"url": "stream", '
+            yield '"content": [1, 2]}'
+
+        async def run():
+            async with ResultWriter(self.output_file_path, flush_records=3) as writer:
+                for i in range(5):
+                    await writer.write({"url": str(i)})
+                with self.assertRaises(ValueError):
+                    await writer.write_stream(failing_chunks())
+                await writer.write_stream(chunks())
+                await writer.write({"url": "last"})
+
+        asyncio.run(run())
+        with open(self.output_file_path) as file:
+            urls = [json.loads(line)["url"] for line in file]
+        self.assertEqual(urls, ["0", "1", "2", "3", "4", "stream", "last"])
+
+    def test_slow_stream_does_not_block_other_records(self):
+        async def run():
+            release = asyncio.Event()
+
+            async def slow_chunks():
+                yield '{"url": "slow", '
+                await release.wait()
+                yield '"content": 1}'
+
+            async with ResultWriter(self.output_file_path, queue_size=1) as writer:
+                slow = asyncio.create_task(writer.write_stream(slow_chunks()))
+                await asyncio.sleep(0)
+                try:
+                    for i in range(5):
+                        await asyncio.wait_for(writer.write({"url": str(i)}), 1)
+                finally:
+                    release.set()
+                    await slow
+
+        asyncio.run(run())
+        with open(self.output_file_path) as file:
+            urls = [json.loads(line)["url"] for line in file]
+        self.assertEqual(urls, ["0", "1", "2", "3", "4", "slow"])
+
+    def test_write_failure_is_reported_to_callers(self):
+        async def chunks():
+            yield '{"url": "stream"}'
+
+        async def run():
+            writer = ResultWriter(self.output_file_path, queue_size=1)
+            with self.assertRaises(OSError):
+                async with writer:
+                    failing_write = mock.AsyncMock(
+                        side_effect=OSError(28, "No space left on device")
+                    )
+                    with mock.patch.object(writer._file, "write", failing_write):
+                        await writer.write({"url": "0"})
+                        with self.assertRaises(WriterError):
+                            await asyncio.wait_for(writer.write_stream(chunks()), 1)
+                        with self.assertRaises(WriterError):
+                            await asyncio.wait_for(writer.write({"url": "1"}), 1)
+
+        asyncio.run(run())
+
+
+class TestJsonStream(unittest.TestCase):
+    def test_round_trip(self):
+        document = {
+            "a": [1, 2.5, {"b": None, "c": [True, False, []]}],
+            "d": {},
+            "e": 'строка "в кавычках"',
+        }
+
+        class AsyncReader:
+            def __init__(self, data: bytes):
+                self._buffer = io.BytesIO(data)
+
+            async def read(self, size: int = -1) -> bytes:
+                return self._buffer.read(min(size, 7))
+
+        async def collect() -> str:
+            reader = AsyncReader(json.dumps(document).encode())
+            return "".join([text async for text in iter_json_text(reader)])
+
+        self.assertEqual(json.loads(asyncio.run(collect())), document)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,311 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from asyncio import Future, Queue, Task
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Optional, Union
+
+from aiofile import async_open
+
+if TYPE_CHECKING:
+    from checkpoint import CompletedIndex
+    from metrics import CrawlMetrics
+
+FLUSH_RECORDS = 1000
+FLUSH_BYTES = 1024 * 1024
+FLUSH_INTERVAL = 1.0
+QUEUE_SIZE = 10000
+PARTIAL_LINE_SCAN_SIZE = 64 * 1024
+SPOOL_COPY_SIZE = 1024 * 1024
+
+
+class WriterError(Exception):
+    """Задача писателя завершилась с ошибкой, записи больше не принимаются."""
+
+
+class FsyncPolicy(Enum):
+    NEVER = "never"
+    ON_FLUSH = "on_flush"
+    ON_CLOSE = "on_close"
+
+
+class _SpooledRecord:
+    """Готовая запись во временном файле и future её копирования в результаты."""
+
+    def __init__(self, spool_path: Path, completed_url: Optional[str]):
+        self.spool_path = spool_path
+        self.completed_url = completed_url
+        self.done: Future = asyncio.get_running_loop().create_future()
+
+
+class ResultWriter:
+    """
+    Единственная задача, которая пишет записи в файл результатов.
+
+    Записи приходят через ограниченную очередь и копятся в буфере, который
+    сбрасывается в файл одной записью, когда набирается flush_records строк,
+    flush_bytes байт или проходит flush_interval секунд. Строки попадают в
+    файл в порядке вызовов write и не перемешиваются.
+
+    Если передан completed_index, URL из completed_url попадают в него
+    только после того, как их записи сброшены в файл.
+
+    С errors_file_path записи write_error идут во вложенный писатель этого
+    файла, а не в файл результатов: URL с ошибкой в completed_index не
+    попадает и при продолжении обхода запрашивается снова, так что в файле
+    результатов остаётся одна запись на URL.
+
+    Если задача писателя упала (например, на ошибке записи в файл), ждущие
+    write_stream и все последующие вызовы write* получают WriterError, а
+    выход из контекста — исходное исключение.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        flush_records: int = FLUSH_RECORDS,
+        flush_bytes: int = FLUSH_BYTES,
+        flush_interval: float = FLUSH_INTERVAL,
+        fsync: FsyncPolicy = FsyncPolicy.NEVER,
+        queue_size: int = QUEUE_SIZE,
+        completed_index: Optional["CompletedIndex"] = None,
+        metrics: Optional["CrawlMetrics"] = None,
+        errors_file_path: Optional[Path] = None,
+    ):
+        self.file_path = file_path
+        self._errors = None
+        if errors_file_path is not None:
+            self._errors = ResultWriter(
+                errors_file_path,
+                flush_records=flush_records,
+                flush_bytes=flush_bytes,
+                flush_interval=flush_interval,
+                fsync=fsync,
+                metrics=metrics,
+            )
+        self._completed_index = completed_index
+        self._metrics = metrics
+        self._flush_records = flush_records
+        self._flush_bytes = flush_bytes
+        self._flush_interval = flush_interval
+        self._fsync = fsync
+        self._queue: Queue = Queue(maxsize=queue_size)
+        self._buffer: list[bytes] = []
+        self._buffer_completed_urls: list[str] = []
+        self._buffered_bytes = 0
+        self._file = None
+        self._task: Optional[Task] = None
+        self._pending_records: set[_SpooledRecord] = set()
+
+    async def __aenter__(self) -> "ResultWriter":
+        _truncate_partial_line(self.file_path)
+        self._file = async_open(self.file_path, "ab")
+        await self._file.file.open()
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._fail_pending_records)
+        if self._errors is not None:
+            await self._errors.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        try:
+            if not self._task.done():
+                await self._put(None)
+            await self._task
+            if self._fsync is not FsyncPolicy.NEVER:
+                await self._file.file.fsync()
+        finally:
+            await self._file.close()
+            if self._errors is not None:
+                await self._errors.__aexit__(*exc_info)
+
+    async def write(self, record: dict, completed_url: Optional[str] = None) -> None:
+        await self.write_line(json.dumps(record), completed_url)
+
+    async def write_error(self, record: dict) -> None:
+        """Пишет запись об ошибке в файл ошибок, если он задан."""
+        if self._errors is None:
+            await self.write(record)
+        else:
+            await self._errors.write(record)
+
+    async def write_line(self, line: str, completed_url: Optional[str] = None) -> None:
+        """Ставит в очередь готовую строку JSONL без перевода строки."""
+        await self._put((f"{line}\n".encode(), completed_url))
+
+    async def write_raw_line(
+        self, line: bytes, completed_url: Optional[str] = None
+    ) -> None:
+        """То же, что write_line, для уже закодированной строки."""
+        await self._put((line + b"\n", completed_url))
+
+    async def write_stream(
+        self,
+        chunks: AsyncIterator[Union[str, bytes]],
+        completed_url: Optional[str] = None,
+    ) -> None:
+        """
+        Пишет одну запись, текст которой приходит частями, и ждёт её записи.
+
+        Части собираются во временный файл в задаче вызывающего, и задача
+        писателя только копирует готовую запись в файл результатов: медленный
+        источник частей, например тело ответа из сети, не задерживает другие
+        записи. Если итератор падает, запись в файл не попадает, а
+        исключение передаётся вызывающему.
+        """
+        self._raise_if_stopped()
+        spool_path = await _spool(chunks)
+        record = _SpooledRecord(spool_path, completed_url)
+        self._pending_records.add(record)
+        try:
+            await self._put(record)
+            await record.done
+        finally:
+            self._pending_records.discard(record)
+            spool_path.unlink(missing_ok=True)
+
+    async def _put(self, item) -> None:
+        """
+        Кладёт элемент в очередь, пока задача писателя жива.
+
+        Если очередь полна, ожидание прерывается падением задачи: иначе
+        вызывающий ждал бы места в очереди, которую никто не разбирает.
+        """
+        self._raise_if_stopped()
+        if not self._queue.full():
+            self._queue.put_nowait(item)
+            return
+        put = asyncio.ensure_future(self._queue.put(item))
+        try:
+            await asyncio.wait({put, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not put.done():
+                put.cancel()
+        self._raise_if_stopped()
+
+    def _raise_if_stopped(self) -> None:
+        if self._task.done():
+            raise WriterError("result writer has stopped") from self._task_error()
+
+    def _task_error(self) -> Optional[BaseException]:
+        if self._task.cancelled():
+            return asyncio.CancelledError()
+        return self._task.exception()
+
+    def _fail_pending_records(self, task: Task) -> None:
+        error = self._task_error()
+        if error is None:
+            return
+        for record in self._pending_records:
+            if not record.done.done():
+                writer_error = WriterError("result writer has stopped")
+                writer_error.__cause__ = error
+                record.done.set_exception(writer_error)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        flush_at = loop.time() + self._flush_interval
+        while True:
+            timeout = max(flush_at - loop.time(), 0)
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except TimeoutError:
+                item = ()  # истёк flush_interval, ниже сработает сброс
+            if item is None:
+                await self._flush()
+                return
+            if isinstance(item, _SpooledRecord):
+                await self._flush()
+                await self._copy_spooled_record(item)
+            elif item:
+                line, completed_url = item
+                self._buffer.append(line)
+                self._buffered_bytes += len(line)
+                if completed_url is not None:
+                    self._buffer_completed_urls.append(completed_url)
+            if (
+                len(self._buffer) >= self._flush_records
+                or self._buffered_bytes >= self._flush_bytes
+                or loop.time() >= flush_at
+            ):
+                await self._flush()
+                flush_at = loop.time() + self._flush_interval
+
+    async def _flush(self) -> None:
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_bytes = 0
+        started_at = time.perf_counter()
+        await self._file.write(data)
+        if self._fsync is FsyncPolicy.ON_FLUSH:
+            await self._file.file.fsync()
+        if self._metrics is not None:
+            self._metrics.observe("write", time.perf_counter() - started_at)
+            self._metrics.inc("bytes_written", len(data))
+        await self._mark_completed(self._buffer_completed_urls)
+        self._buffer_completed_urls = []
+
+    async def _mark_completed(self, urls: list[str]) -> None:
+        if self._completed_index is not None and urls:
+            await self._completed_index.add_many(urls)
+
+    async def _copy_spooled_record(self, record: _SpooledRecord) -> None:
+        start_offset = self._file.tell()
+        try:
+            async with async_open(record.spool_path, "rb") as spool:
+                while chunk := await spool.read(SPOOL_COPY_SIZE):
+                    await self._file.write(chunk)
+            await self._file.write(b"\n")
+        except BaseException as e:
+            await self._file.file.truncate(start_offset)
+            self._file.seek(start_offset)
+            if not record.done.done():
+                record.done.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        if record.completed_url is not None:
+            await self._mark_completed([record.completed_url])
+        if not record.done.done():
+            record.done.set_result(None)
+
+
+async def _spool(chunks: AsyncIterator[Union[str, bytes]]) -> Path:
+    """Записывает части во временный файл; при ошибке файл удаляется."""
+    fd, name = tempfile.mkstemp(prefix="record-", suffix=".part")
+    os.close(fd)
+    spool_path = Path(name)
+    try:
+        async with async_open(spool_path, "wb") as spool:
+            async for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                await spool.write(chunk)
+    except BaseException:
+        spool_path.unlink(missing_ok=True)
+        raise
+    return spool_path
+
+
+def _truncate_partial_line(file_path: Path) -> None:
+    """Обрезает недописанную последнюю строку, оставшуюся после аварийной остановки."""
+    if not file_path.exists():
+        return
+    with open(file_path, "rb+") as file:
+        size = file.seek(0, os.SEEK_END)
+        position = size
+        while position > 0:
+            step = min(position, PARTIAL_LINE_SCAN_SIZE)
+            file.seek(position - step)
+            newline = file.read(step).rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position != size:
+            file.truncate(position)
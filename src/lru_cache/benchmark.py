@@ -0,0 +1,79 @@
+"""
+Сравнение накладных расходов lru_cache и functools.lru_cache.
+
+Замеряются путь попадания (одинаковый аргумент), промах с вытеснением
+(аргументы по кругу больше maxsize) и попадания из нескольких потоков.
+functools.lru_cache реализован на C, поэтому это нижняя граница.
+"""
+
+import functools
+import threading
+import time
+import timeit
+
+from main import lru_cache
+
+NUMBER = 200_000
+REPEAT = 5
+MAXSIZE = 128
+THREADS = 4
+
+
+def _identity(x):
+    return x
+
+
+def _best(stmt) -> float:
+    return min(timeit.repeat(stmt, number=NUMBER, repeat=REPEAT)) / NUMBER
+
+
+def _hit(cached):
+    cached(1)
+    return lambda: cached(1)
+
+
+def _hit_kwargs(cached):
+    cached(1, b=2)
+    return lambda: cached(1, b=2)
+
+
+def _miss(cached):
+    keys = iter(range(10**9))
+    return lambda: cached(next(keys) % (MAXSIZE * 2))
+
+
+def _threaded_hit(cached) -> float:
+    cached(1)
+    per_thread = NUMBER // THREADS
+
+    def worker():
+        for _ in range(per_thread):
+            cached(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - started_at) / (per_thread * THREADS)
+
+
+def main() -> None:
+    implementations = {
+        "lru_cache": lambda func: lru_cache(maxsize=MAXSIZE)(func),
+        "functools": lambda func: functools.lru_cache(maxsize=MAXSIZE)(func),
+    }
+    print(f"{'case':<12} {'impl':<10} {'ns/call':>8}")
+    for case, prepare in (("hit", _hit), ("hit_kwargs", _hit_kwargs), ("miss", _miss)):
+        for name, decorate in implementations.items():
+            func = _identity if case != "hit_kwargs" else (lambda a, b: a + b)
+            seconds = _best(prepare(decorate(func)))
+            print(f"{case:<12} {name:<10} {seconds * 1e9:>8.0f}")
+    for name, decorate in implementations.items():
+        seconds = min(_threaded_hit(decorate(_identity)) for _ in range(REPEAT))
+        print(f"{'threads':<12} {name:<10} {seconds * 1e9:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Общий кеш SharedMemoryCache против отдельного lru_cache в каждом процессе.
+
+WORKERS процессов пула считают дорогую функцию для ключей из распределения
+Ципфа. С отдельными кешами каждый процесс заново заполняет свою таблицу,
+с общим значение, посчитанное одним процессом, видят остальные.
+"""
+
+import itertools
+import random
+import time
+from multiprocessing import Pool
+
+from main import lru_cache
+from shared_cache import SharedMemoryCache
+
+WORKERS = 4
+CALLS = 40_000
+KEYS = 5_000
+CAPACITY = 2048
+BATCH_SIZE = 500
+WORK_SIZE = 20_000
+
+_cached = None
+
+
+def _expensive(key: int) -> int:
+    return sum(i * i for i in range(WORK_SIZE + key % 100))
+
+
+def _init_worker(mode: str, storage) -> None:
+    global _cached
+    if mode == "none":
+        _cached = _expensive
+    elif mode == "per-process":
+        _cached = lru_cache(maxsize=CAPACITY)(_expensive)
+    else:
+        _cached = lru_cache(storage=storage)(_expensive)
+
+
+def _run_batch(keys: list[int]) -> tuple[int, int]:
+    """Считает пачку ключей и возвращает прирост попаданий и промахов."""
+    before = _cached.cache_info() if hasattr(_cached, "cache_info") else None
+    for key in keys:
+        _cached(key)
+    if before is None:
+        return 0, len(keys)
+    after = _cached.cache_info()
+    return after.hits - before.hits, after.misses - before.misses
+
+
+def _trace() -> list[int]:
+    rng = random.Random(0)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, KEYS + 1)))
+    return rng.choices(range(KEYS), cum_weights=cum_weights, k=CALLS)
+
+
+def _run(mode: str, trace: list[int]) -> tuple[float, float]:
+    storage = SharedMemoryCache(CAPACITY) if mode == "shared" else None
+    batches = [trace[i : i + BATCH_SIZE] for i in range(0, len(trace), BATCH_SIZE)]
+    try:
+        started_at = time.perf_counter()
+        with Pool(WORKERS, initializer=_init_worker, initargs=(mode, storage)) as pool:
+            stats = pool.map(_run_batch, batches, chunksize=1)
+        elapsed = time.perf_counter() - started_at
+    finally:
+        if storage is not None:
+            storage.close()
+            storage.unlink()
+    hits = sum(batch_hits for batch_hits, _ in stats)
+    return elapsed, hits / len(trace)
+
+
+def main() -> None:
+    trace = _trace()
+    print(f"{WORKERS} workers, {CALLS} calls, {KEYS} keys, capacity {CAPACITY}")
+    baseline = None
+    for mode in ("none", "per-process", "shared"):
+        elapsed, hit_ratio = _run(mode, trace)
+        baseline = baseline or elapsed
+        print(
+            f"{mode:<12} {elapsed:>7.2f}s  hit ratio {hit_ratio:>6.1%}  "
+            f"speedup x{baseline / elapsed:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,237 @@
+import asyncio
+import inspect
+import sys
+import threading
 import unittest.mock
-from collections import OrderedDict
+from collections import namedtuple
+from functools import partial, update_wrapper
+from time import monotonic
 
+from policies import POLICIES, LRUPolicy
 
-def lru_cache(maxsize=3):
-    cached_results = OrderedDict()
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+_MISSING = object()
+_FAST_TYPES = {int, str}
+
+
+def lru_cache(
+    maxsize=3, typed=False, policy="lru", ttl=None, max_bytes=None, storage=None
+):
+    """
+    Кеширует результаты функции, вытесняя давно не использованные.
+
+    У каждой декорированной функции своё хранилище. policy выбирает
+    политику вытеснения из policies.POLICIES ("lru", "lfu", "arc",
+    "w-tinylfu") или принимает класс EvictionPolicy; у "lru" все операции
+    O(1). maxsize=None снимает ограничение размера, typed=True различает
+    аргументы разных типов (1 и 1.0). Сама функция вызывается вне
+    блокировки, поэтому при гонке её могут вызвать дважды для одного ключа.
+
+    ttl — срок жизни записи в секундах, после которого она считается
+    промахом. max_bytes — бюджет памяти на ключи и значения, оцениваемый
+    приблизительно через sys.getsizeof; при превышении записи вытесняются
+    той же политикой. Для async def кешируется результат, а не корутина,
+    и одновременные вызовы с одним ключом ждут одно общее вычисление.
+
+    storage — готовое хранилище EvictionPolicy вместо создаваемого по
+    policy, например SharedMemoryCache, общий для процессов пула; maxsize
+    тогда берётся из его capacity. Вместе с max_bytes storage не
+    принимается (ValueError): такое хранилище вытесняет записи само, и
+    его объём задаётся при создании, а не бюджетом декоратора.
+    """
+    if storage is not None and max_bytes is not None:
+        raise ValueError(
+            "max_bytes cannot be combined with storage: size the storage itself instead"
+        )
+
+    def lru_cache_wrapper(func, maxsize, typed, policy):
+        if isinstance(policy, str):
+            policy = POLICIES[policy]
+        if storage is not None:
+            cached_results = storage
+            maxsize = storage.capacity
+        elif maxsize is None:
+            # без ограничения размера вытеснять нечего, политика не важна
+            cached_results = LRUPolicy(None)
+        else:
+            cached_results = policy(maxsize)
+        lock = threading.Lock()
+        hits = misses = 0
+        total_bytes = 0
+        in_flight = {}
+        plain = ttl is None and max_bytes is None
+
+        cache_get = cached_results.get
+        cache_put = cached_results.put
+        cache_pop = cached_results.pop
+
+        def make_key(args, kwargs):
+            if kwargs or typed:
+                return _make_key(args, kwargs, typed)
+            if len(args) == 1 and type(args[0]) in _FAST_TYPES:
+                return args[0]
+            return args
+
+        def lookup(cache_key):
+            nonlocal hits, misses, total_bytes
+            with lock:
+                result = cache_get(cache_key, _MISSING)
+                if result is not _MISSING:
+                    if plain:
+                        hits += 1
+                        return result
+                    if result.expires_at is None or result.expires_at > monotonic():
+                        hits += 1
+                        return result.value
+                    # истёкшая запись не должна ни занимать место, ни
+                    # подниматься политикой как недавно использованная
+                    cache_pop(cache_key, None)
+                    total_bytes -= result.size
+                misses += 1
+                return _MISSING
+
+        def save(cache_key, result):
+            nonlocal total_bytes
+            if maxsize == 0:
+                return
+            if plain:
+                with lock:
+                    cache_put(cache_key, result)
+                return
+            size = _approximate_size(cache_key) + _approximate_size(result)
+            if max_bytes is not None and size > max_bytes:
+                return
+            expires_at = None if ttl is None else monotonic() + ttl
+            with lock:
+                removed = cache_put(cache_key, _Entry(result, expires_at, size))
+                total_bytes += size
+                if removed is not None:
+                    total_bytes -= removed[1].size
+                while max_bytes is not None and total_bytes > max_bytes:
+                    total_bytes -= cached_results.popitem()[1].size
 
-    def lru_cache_wrapper(func, maxsize):
         def wrapper(*args, **kwargs):
-            nonlocal cached_results
-            kwargs_tuple = tuple(kwargs.items())
-            cache_key = (args, kwargs_tuple)
-            result = cached_results.get(cache_key)
-            if result is not None:
-                return result
-            result = func(*args, **kwargs)
-            if len(cached_results) >= maxsize:
-                cached_results.popitem(last=False)
-            cached_results[cache_key] = result
+            cache_key = make_key(args, kwargs)
+            result = lookup(cache_key)
+            if result is _MISSING:
+                result = func(*args, **kwargs)
+                save(cache_key, result)
             return result
 
-        return wrapper
+        async def async_wrapper(*args, **kwargs):
+            cache_key = make_key(args, kwargs)
+            result = lookup(cache_key)
+            if result is not _MISSING:
+                return result
+            task = in_flight.get(cache_key)
+            if task is None:
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                in_flight[cache_key] = task
+                task.add_done_callback(partial(finish, cache_key))
+            # shield: отмена одного из ждущих не отменяет общее вычисление
+            return await asyncio.shield(task)
+
+        def finish(cache_key, task):
+            in_flight.pop(cache_key, None)
+            if not task.cancelled() and task.exception() is None:
+                save(cache_key, task.result())
+
+        def cache_info():
+            with lock:
+                return CacheInfo(hits, misses, maxsize, len(cached_results))
+
+        def cache_clear():
+            nonlocal hits, misses, total_bytes
+            with lock:
+                cached_results.clear()
+                hits = misses = total_bytes = 0
+
+        if inspect.iscoroutinefunction(func):
+            wrapper = async_wrapper
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return update_wrapper(wrapper, func)
 
     if callable(maxsize):
         user_func = maxsize
         maxsize = 3
-        return lru_cache_wrapper(user_func, maxsize)
+        return lru_cache_wrapper(user_func, maxsize, typed, policy)
+
+    if maxsize is not None and maxsize < 0:
+        maxsize = 0
 
     def dec(func):
-        return lru_cache_wrapper(func, maxsize)
+        return lru_cache_wrapper(func, maxsize, typed, policy)
 
     return dec
 
 
+class _KwargsMark:
+    """
+    Разделитель позиционных и именованных аргументов в ключе.
+
+    Сериализуется ссылкой на модуль, поэтому ключи с именованными
+    аргументами совпадают и после pickle в другом процессе.
+    """
+
+    def __reduce__(self):
+        return "_KWARGS_MARK"
+
+
+_KWARGS_MARK = _KwargsMark()
+
+
+class _Entry:
+    """Значение с моментом истечения и приблизительным размером."""
+
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value, expires_at, size):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+def _approximate_size(value, seen=None):
+    """Размер объекта вместе с элементами вложенных коллекций, в байтах."""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(
+            _approximate_size(k, seen) + _approximate_size(v, seen)
+            for k, v in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_approximate_size(item, seen) for item in value)
+    return size
+
+
+def _make_key(args, kwargs, typed):
+    """
+    Плоский хешируемый ключ из аргументов вызова.
+
+    Один аргумент int или str без typed служит ключом сам по себе, что
+    экономит создание кортежа на самом частом пути.
+    """
+    key = args
+    if kwargs:
+        key += (_KWARGS_MARK,)
+        for item in kwargs.items():
+            key += item
+    if typed:
+        key += tuple(type(value) for value in args)
+        if kwargs:
+            key += tuple(type(value) for value in kwargs.values())
+    elif len(key) == 1 and type(key[0]) in _FAST_TYPES:
+        return key[0]
+    return key
+
+
 @lru_cache
 def sum_two_number(a: int, b: int) -> int:
     return a + b
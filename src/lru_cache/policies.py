@@ -0,0 +1,401 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+WINDOW_RATIO = 0.01
+PROTECTED_RATIO = 0.8
+SKETCH_MAX_COUNT = 15
+SKETCH_SAMPLE_FACTOR = 10
+SKETCH_SEEDS = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F)
+SKETCH_DEPTH = len(SKETCH_SEEDS)
+
+
+class EvictionPolicy(ABC):
+    """
+    Хранилище ограниченного размера с политикой вытеснения.
+
+    get отмечает обращение к ключу, put добавляет ключ после промаха и
+    сам вытесняет лишнее, popitem вытесняет одну запись по требованию
+    (например, при превышении бюджета памяти), pop удаляет заданный ключ
+    (например, с истёкшим сроком жизни). put возвращает пару, которая
+    покинула хранилище: вытесненную или прежнее значение того же ключа.
+    Потокобезопасность обеспечивает вызывающий.
+    """
+
+    def __init__(self, capacity: Optional[int]):
+        self.capacity = capacity
+
+    @abstractmethod
+    def get(self, key: Hashable, default: Any = None) -> Any: ...
+
+    @abstractmethod
+    def put(self, key: Hashable, value: Any) -> Optional[tuple[Hashable, Any]]: ...
+
+    @abstractmethod
+    def popitem(self) -> tuple[Hashable, Any]: ...
+
+    @abstractmethod
+    def pop(self, key: Hashable, default: Any = None) -> Any: ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+
+class LRUPolicy(EvictionPolicy):
+    """Вытесняет ключ, к которому дольше всего не обращались; None — без лимита."""
+
+    def __init__(self, capacity: Optional[int]):
+        super().__init__(capacity)
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+            return data[key]
+        return default
+
+    def put(self, key: Hashable, value: Any) -> Optional[tuple[Hashable, Any]]:
+        data = self._data
+        removed = None
+        if key in data:
+            data.move_to_end(key)
+            removed = (key, data[key])
+        elif self.capacity is not None and len(data) >= self.capacity:
+            removed = data.popitem(last=False)
+        data[key] = value
+        return removed
+
+    def popitem(self) -> tuple[Hashable, Any]:
+        return self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        return self._data.pop(key, default)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class LFUPolicy(EvictionPolicy):
+    """
+    Вытесняет ключ с наименьшим числом обращений, при равенстве — самый давний.
+
+    Ключи разложены по корзинам частот, поэтому все операции O(1).
+    """
+
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        self._values: dict = {}
+        self._counts: dict = {}
+        self._buckets: dict[int, OrderedDict] = {}
+        self._min_count = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._values:
+            return default
+        self._touch(key)
+        return self._values[key]
+
+    def put(self, key: Hashable, value: Any) -> Optional[tuple[Hashable, Any]]:
+        if key in self._values:
+            removed = (key, self._values[key])
+            self._values[key] = value
+            self._touch(key)
+            return removed
+        removed = None
+        if len(self._values) >= self.capacity:
+            removed = self._evict()
+        self._values[key] = value
+        self._counts[key] = 1
+        self._buckets.setdefault(1, OrderedDict())[key] = None
+        self._min_count = 1
+        return removed
+
+    def popitem(self) -> tuple[Hashable, Any]:
+        if not self._values:
+            raise KeyError("popitem(): cache is empty")
+        removed = self._evict()
+        if self._min_count not in self._buckets:
+            self._min_count = min(self._buckets, default=0)
+        return removed
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._values:
+            return default
+        count = self._counts.pop(key)
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = min(self._buckets, default=0)
+        return self._values.pop(key)
+
+    def _evict(self) -> tuple[Hashable, Any]:
+        bucket = self._buckets[self._min_count]
+        key, _ = bucket.popitem(last=False)
+        if not bucket:
+            del self._buckets[self._min_count]
+        del self._counts[key]
+        return key, self._values.pop(key)
+
+    def _touch(self, key: Hashable) -> None:
+        count = self._counts[key]
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+        self._counts[key] = count + 1
+        self._buckets.setdefault(count + 1, OrderedDict())[key] = None
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def clear(self) -> None:
+        self._values.clear()
+        self._counts.clear()
+        self._buckets.clear()
+        self._min_count = 0
+
+
+class ARCPolicy(EvictionPolicy):
+    """
+    Adaptive Replacement Cache (Megiddo, Modha).
+
+    t1 хранит ключи, к которым обращались один раз, t2 — повторно. b1 и b2
+    помнят ключи, недавно вытесненные из t1 и t2, и по попаданиям в них
+    сдвигают целевой размер t1. Однократный проход по большому набору
+    ключей вытесняет только t1 и не трогает часто используемые ключи в t2.
+    """
+
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        self._t1: OrderedDict = OrderedDict()
+        self._t2: OrderedDict = OrderedDict()
+        self._b1: OrderedDict = OrderedDict()
+        self._b2: OrderedDict = OrderedDict()
+        self._target_t1 = 0.0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key in self._t1:
+            value = self._t2[key] = self._t1.pop(key)
+            return value
+        if key in self._t2:
+            self._t2.move_to_end(key)
+            return self._t2[key]
+        return default
+
+    def put(self, key: Hashable, value: Any) -> Optional[tuple[Hashable, Any]]:
+        capacity = self.capacity
+        t1, t2, b1, b2 = self._t1, self._t2, self._b1, self._b2
+        if key in t1 or key in t2:
+            removed = (key, self.get(key))
+            t2[key] = value
+            return removed
+        if key in b1:
+            self._target_t1 = min(capacity, self._target_t1 + max(len(b2) / len(b1), 1))
+            removed = self._replace(key)
+            del b1[key]
+            t2[key] = value
+            return removed
+        if key in b2:
+            self._target_t1 = max(0.0, self._target_t1 - max(len(b1) / len(b2), 1))
+            removed = self._replace(key)
+            del b2[key]
+            t2[key] = value
+            return removed
+        removed = None
+        if len(t1) + len(b1) >= capacity:
+            if len(t1) < capacity:
+                b1.popitem(last=False)
+                removed = self._replace(key)
+            else:
+                removed = t1.popitem(last=False)
+        elif len(t1) + len(t2) + len(b1) + len(b2) >= capacity:
+            if len(t1) + len(t2) + len(b1) + len(b2) >= 2 * capacity:
+                b2.popitem(last=False)
+            removed = self._replace(key)
+        t1[key] = value
+        return removed
+
+    def popitem(self) -> tuple[Hashable, Any]:
+        if not self._t1 and not self._t2:
+            raise KeyError("popitem(): cache is empty")
+        return self._replace(None, force=True)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Удаляет ключ, не записывая его в b1 и b2: он не был вытеснен."""
+        if key in self._t1:
+            return self._t1.pop(key)
+        return self._t2.pop(key, default)
+
+    def _replace(
+        self, key: Hashable, force: bool = False
+    ) -> Optional[tuple[Hashable, Any]]:
+        """Освобождает место в кеше, перенося вытесненный ключ в b1 или b2."""
+        t1, t2 = self._t1, self._t2
+        if not force and len(t1) + len(t2) < self.capacity:
+            return None
+        if t1 and (
+            not t2
+            or len(t1) > self._target_t1
+            or (key in self._b2 and len(t1) == self._target_t1)
+        ):
+            evicted = t1.popitem(last=False)
+            self._b1[evicted[0]] = None
+        else:
+            evicted = t2.popitem(last=False)
+            self._b2[evicted[0]] = None
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self._t1) + len(self._t2)
+
+    def clear(self) -> None:
+        for part in (self._t1, self._t2, self._b1, self._b2):
+            part.clear()
+        self._target_t1 = 0.0
+
+
+class FrequencySketch:
+    """
+    Count-Min Sketch с 4-битными по смыслу счётчиками для оценки частот.
+
+    После sample_size увеличений все счётчики делятся пополам, поэтому
+    оценка отражает недавнюю популярность ключа, а не всю историю.
+    """
+
+    def __init__(self, capacity: int):
+        width = 1 << max(capacity, 16).bit_length()
+        self._mask = width - 1
+        self._table = bytearray(width * SKETCH_DEPTH)
+        self._rows = [(row * width, seed) for row, seed in enumerate(SKETCH_SEEDS)]
+        self._sample_size = SKETCH_SAMPLE_FACTOR * max(capacity, 1)
+        self._additions = 0
+
+    def increment(self, key: Hashable) -> None:
+        key_hash = hash(key)
+        mask, table = self._mask, self._table
+        for offset, seed in self._rows:
+            index = offset + (((key_hash ^ seed) * seed >> 8) & mask)
+            if table[index] < SKETCH_MAX_COUNT:
+                table[index] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+
+    def frequency(self, key: Hashable) -> int:
+        key_hash = hash(key)
+        mask, table = self._mask, self._table
+        return min(
+            table[offset + (((key_hash ^ seed) * seed >> 8) & mask)]
+            for offset, seed in self._rows
+        )
+
+    def _age(self) -> None:
+        self._table = self._table.translate(_HALVE)
+        self._additions //= 2
+
+    def clear(self) -> None:
+        self._table = bytearray(len(self._table))
+        self._additions = 0
+
+
+_HALVE = bytes(count >> 1 for count in range(256))
+
+
+class WTinyLFUPolicy(EvictionPolicy):
+    """
+    W-TinyLFU (Einziger, Friedman, Manes).
+
+    Новые ключи попадают в маленькое LRU-окно. Вытесненный из окна ключ
+    допускается в основную сегментированную LRU-область, только если по
+    FrequencySketch он встречался чаще, чем её кандидат на вытеснение.
+    Поэтому сканирование редкими ключами не вытесняет популярные.
+    """
+
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        self._window_capacity = max(1, int(capacity * WINDOW_RATIO))
+        main_capacity = capacity - self._window_capacity
+        self._main_capacity = main_capacity
+        self._protected_capacity = int(main_capacity * PROTECTED_RATIO)
+        self._window: OrderedDict = OrderedDict()
+        self._probation: OrderedDict = OrderedDict()
+        self._protected: OrderedDict = OrderedDict()
+        self._sketch = FrequencySketch(capacity)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self._sketch.increment(key)
+        if key in self._window:
+            self._window.move_to_end(key)
+            return self._window[key]
+        if key in self._protected:
+            self._protected.move_to_end(key)
+            return self._protected[key]
+        if key in self._probation:
+            value = self._protected[key] = self._probation.pop(key)
+            if len(self._protected) > self._protected_capacity:
+                demoted, demoted_value = self._protected.popitem(last=False)
+                self._probation[demoted] = demoted_value
+            return value
+        return default
+
+    def put(self, key: Hashable, value: Any) -> Optional[tuple[Hashable, Any]]:
+        for segment in (self._window, self._protected, self._probation):
+            if key in segment:
+                removed = (key, segment[key])
+                segment[key] = value
+                return removed
+        self._window[key] = value
+        if len(self._window) <= self._window_capacity:
+            return None
+        candidate = self._window.popitem(last=False)
+        if len(self._probation) + len(self._protected) < self._main_capacity:
+            self._probation[candidate[0]] = candidate[1]
+            return None
+        victims = self._probation or self._protected
+        if not victims:
+            return candidate
+        victim = next(iter(victims))
+        if self._sketch.frequency(candidate[0]) <= self._sketch.frequency(victim):
+            return candidate
+        self._probation[candidate[0]] = candidate[1]
+        return victim, victims.pop(victim)
+
+    def popitem(self) -> tuple[Hashable, Any]:
+        for segment in (self._probation, self._window, self._protected):
+            if segment:
+                return segment.popitem(last=False)
+        raise KeyError("popitem(): cache is empty")
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        for segment in (self._window, self._probation, self._protected):
+            if key in segment:
+                return segment.pop(key)
+        return default
+
+    def __len__(self) -> int:
+        return len(self._window) + len(self._probation) + len(self._protected)
+
+    def clear(self) -> None:
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+        self._sketch.clear()
+
+
+POLICIES: dict[str, type[EvictionPolicy]] = {
+    "lru": LRUPolicy,
+    "lfu": LFUPolicy,
+    "arc": ARCPolicy,
+    "w-tinylfu": WTinyLFUPolicy,
+}
@@ -0,0 +1,176 @@
+import hashlib
+import pickle
+import struct
+import time
+from multiprocessing import Lock, shared_memory
+from typing import Any, Hashable, Optional
+
+from policies import EvictionPolicy
+
+SLOT_SIZE = 256
+WAYS = 8
+LOCK_STRIPES = 64
+_HEADER = struct.Struct("<QQI")
+
+
+class SharedMemoryCache(EvictionPolicy):
+    """
+    Хранилище для lru_cache в multiprocessing.shared_memory, общее для процессов.
+
+    Таблица фиксированного размера разбита на наборы по WAYS слотов; ключ
+    попадает в набор по хешу своего pickle. В слоте лежат хеш ключа, время
+    последнего обращения и pickle пары (ключ, значение) не длиннее
+    slot_size. При вставке в полный набор вытесняется слот с самым давним
+    обращением, то есть LRU в пределах набора. Наборы защищены полосами
+    блокировок multiprocessing.Lock, общими для всех процессов.
+
+    Экземпляр передаётся в процессы пула через initargs: при распаковке он
+    подключается к тому же сегменту памяти. Создатель вызывает unlink.
+    """
+
+    def __init__(self, capacity: int, slot_size: int = SLOT_SIZE):
+        super().__init__(capacity)
+        self._sets = max(1, -(-capacity // WAYS))
+        self._slot_size = slot_size
+        self._stride = _HEADER.size + slot_size
+        self._locks = [Lock() for _ in range(LOCK_STRIPES)]
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=self._sets * WAYS * self._stride
+        )
+        self._buf = self._shm.buf
+        self._buf[:] = bytes(len(self._buf))
+
+    def __getstate__(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "sets": self._sets,
+            "slot_size": self._slot_size,
+            "locks": self._locks,
+            "name": self._shm.name,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        super().__init__(state["capacity"])
+        self._sets = state["sets"]
+        self._slot_size = state["slot_size"]
+        self._stride = _HEADER.size + self._slot_size
+        self._locks = state["locks"]
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._buf = self._shm.buf
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        key_hash = _key_hash(key)
+        set_index = key_hash % self._sets
+        with self._locks[set_index % LOCK_STRIPES]:
+            offset = self._find(set_index, key_hash)
+            if offset is None:
+                return default
+            _, _, length = _HEADER.unpack_from(self._buf, offset)
+            _HEADER.pack_into(self._buf, offset, key_hash, time.monotonic_ns(), length)
+            start = offset + _HEADER.size
+            payload = bytes(self._buf[start : start + length])
+        stored_key, value = pickle.loads(payload)
+        return value if stored_key == key else default
+
+    def put(self, key: Hashable, value: Any) -> Optional[tuple[Hashable, Any]]:
+        """Сохраняет значение; слишком большие значения не кешируются."""
+        payload = pickle.dumps((key, value), pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self._slot_size:
+            return None
+        key_hash = _key_hash(key)
+        set_index = key_hash % self._sets
+        with self._locks[set_index % LOCK_STRIPES]:
+            offset = self._find(set_index, key_hash)
+            if offset is None:
+                offset = self._victim(set_index)
+            _HEADER.pack_into(
+                self._buf, offset, key_hash, time.monotonic_ns(), len(payload)
+            )
+            start = offset + _HEADER.size
+            self._buf[start : start + len(payload)] = payload
+        # вытесненное значение не распаковывается: бюджет памяти здесь задан
+        # размером сегмента, а не max_bytes декоратора
+        return None
+
+    def popitem(self) -> tuple[Hashable, Any]:
+        """Вытесняет самый давний слот всей таблицы; O(capacity)."""
+        oldest = None
+        for set_index in range(self._sets):
+            with self._locks[set_index % LOCK_STRIPES]:
+                for offset in self._set_offsets(set_index):
+                    key_hash, last_used, _ = _HEADER.unpack_from(self._buf, offset)
+                    if key_hash and (oldest is None or last_used < oldest[0]):
+                        oldest = (last_used, set_index, offset)
+        if oldest is None:
+            raise KeyError("popitem(): cache is empty")
+        _, set_index, offset = oldest
+        with self._locks[set_index % LOCK_STRIPES]:
+            _, _, length = _HEADER.unpack_from(self._buf, offset)
+            start = offset + _HEADER.size
+            payload = bytes(self._buf[start : start + length])
+            _HEADER.pack_into(self._buf, offset, 0, 0, 0)
+        return pickle.loads(payload)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        key_hash = _key_hash(key)
+        set_index = key_hash % self._sets
+        with self._locks[set_index % LOCK_STRIPES]:
+            offset = self._find(set_index, key_hash)
+            if offset is None:
+                return default
+            _, _, length = _HEADER.unpack_from(self._buf, offset)
+            start = offset + _HEADER.size
+            stored_key, value = pickle.loads(bytes(self._buf[start : start + length]))
+            if stored_key != key:
+                return default
+            _HEADER.pack_into(self._buf, offset, 0, 0, 0)
+        return value
+
+    def __len__(self) -> int:
+        return sum(
+            1
+            for set_index in range(self._sets)
+            for offset in self._set_offsets(set_index)
+            if _HEADER.unpack_from(self._buf, offset)[0]
+        )
+
+    def clear(self) -> None:
+        for set_index in range(self._sets):
+            with self._locks[set_index % LOCK_STRIPES]:
+                for offset in self._set_offsets(set_index):
+                    _HEADER.pack_into(self._buf, offset, 0, 0, 0)
+
+    def close(self) -> None:
+        self._buf.release()
+        self._shm.close()
+
+    def unlink(self) -> None:
+        self._shm.unlink()
+
+    def _set_offsets(self, set_index: int) -> range:
+        start = set_index * WAYS * self._stride
+        return range(start, start + WAYS * self._stride, self._stride)
+
+    def _find(self, set_index: int, key_hash: int) -> Optional[int]:
+        for offset in self._set_offsets(set_index):
+            if _HEADER.unpack_from(self._buf, offset)[0] == key_hash:
+                return offset
+        return None
+
+    def _victim(self, set_index: int) -> int:
+        """Пустой слот набора или слот с самым давним обращением."""
+        victim, victim_used = None, None
+        for offset in self._set_offsets(set_index):
+            key_hash, last_used, _ = _HEADER.unpack_from(self._buf, offset)
+            if not key_hash:
+                return offset
+            if victim is None or last_used < victim_used:
+                victim, victim_used = offset, last_used
+        return victim
+
+
+def _key_hash(key: Hashable) -> int:
+    """64-битный хеш ключа, одинаковый во всех процессах. Ноль — пустой слот."""
+    data = pickle.dumps(key, pickle.HIGHEST_PROTOCOL)
+    value = int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+    return value or 1
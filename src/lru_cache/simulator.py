@@ -0,0 +1,116 @@
+"""
+Воспроизведение трассы ключей на политиках вытеснения.
+
+Трасса — файл, в котором каждая строка — ключ одного обращения. Без файла
+строится синтетическая трасса: обращения по закону Ципфа вперемешку с
+однократными сканированиями новых ключей. Для каждой политики и размера
+кеша печатается доля попаданий и скорость воспроизведения.
+
+    python simulator.py trace.txt --sizes 100,1000 --policies lru,arc
+"""
+
+import argparse
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Hashable, Sequence
+
+from policies import POLICIES
+
+SYNTHETIC_LENGTH = 200_000
+SYNTHETIC_KEYS = 10_000
+ZIPF_EXPONENT = 1.0
+SCAN_EVERY = 20_000
+SCAN_LENGTH = 5_000
+DEFAULT_SIZES = (100, 1000)
+
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    policy: str
+    capacity: int
+    hits: int
+    misses: int
+    seconds: float
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / max(self.hits + self.misses, 1)
+
+    @property
+    def ops_per_sec(self) -> float:
+        return (self.hits + self.misses) / self.seconds if self.seconds else 0.0
+
+
+def read_trace(file_path: Path) -> list[str]:
+    with open(file_path) as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def synthetic_trace(
+    length: int = SYNTHETIC_LENGTH,
+    keys: int = SYNTHETIC_KEYS,
+    scan_every: int = SCAN_EVERY,
+    scan_length: int = SCAN_LENGTH,
+    seed: int = 0,
+) -> list[int]:
+    """Ципфовские обращения к keys ключам и сканирования ключей за их пределами."""
+    rng = random.Random(seed)
+    cum_weights = list(
+        itertools.accumulate(1 / rank**ZIPF_EXPONENT for rank in range(1, keys + 1))
+    )
+    trace = []
+    next_scan_key = keys
+    while len(trace) < length:
+        trace += rng.choices(range(keys), cum_weights=cum_weights, k=scan_every)
+        trace += range(next_scan_key, next_scan_key + scan_length)
+        next_scan_key += scan_length
+    return trace[:length]
+
+
+def simulate(policy: str, capacity: int, trace: Sequence[Hashable]) -> SimulationResult:
+    """Проигрывает трассу так же, как декоратор: get, а при промахе put."""
+    cache = POLICIES[policy](capacity)
+    get, put = cache.get, cache.put
+    hits = 0
+    started_at = time.perf_counter()
+    for key in trace:
+        if get(key, _MISSING) is _MISSING:
+            put(key, key)
+        else:
+            hits += 1
+    seconds = time.perf_counter() - started_at
+    return SimulationResult(policy, capacity, hits, len(trace) - hits, seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("trace", nargs="?", type=Path, help="файл с ключами")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="размеры кеша через запятую",
+    )
+    parser.add_argument(
+        "--policies", default=",".join(POLICIES), help="политики через запятую"
+    )
+    args = parser.parse_args()
+
+    trace = read_trace(args.trace) if args.trace else synthetic_trace()
+    print(f"{len(trace)} requests, {len(set(trace))} distinct keys")
+    print(f"{'policy':<10} {'size':>8} {'hit ratio':>10} {'ops/sec':>12}")
+    for size in map(int, args.sizes.split(",")):
+        for name in args.policies.split(","):
+            result = simulate(name, size, trace)
+            print(
+                f"{result.policy:<10} {result.capacity:>8} "
+                f"{result.hit_ratio:>10.2%} {result.ops_per_sec:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
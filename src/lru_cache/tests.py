@@ -0,0 +1,288 @@
+import asyncio
+import random
+import threading
+import unittest
+from multiprocessing import Pool
+from unittest import mock
+
+import main
+from main import lru_cache
+from policies import POLICIES
+from shared_cache import SharedMemoryCache
+from simulator import simulate, synthetic_trace
+
+
+class TestLruCache(unittest.TestCase):
+    def test_hit_promotes_key(self):
+        func = mock.Mock(side_effect=lambda x: x * 10)
+        cached = lru_cache(maxsize=2)(func)
+
+        cached(1)
+        cached(2)
+        cached(1)
+        cached(3)
+        cached(1)
+
+        self.assertEqual(func.call_count, 3)
+        cached(2)
+        self.assertEqual(func.call_count, 4)
+
+    def test_none_result_is_cached(self):
+        func = mock.Mock(return_value=None)
+        cached = lru_cache(maxsize=2)(func)
+
+        self.assertIsNone(cached(1))
+        self.assertIsNone(cached(1))
+        self.assertEqual(func.call_count, 1)
+
+    def test_functions_have_separate_storage(self):
+        decorator = lru_cache(maxsize=2)
+        double = decorator(lambda x: x * 2)
+        triple = decorator(lambda x: x * 3)
+
+        self.assertEqual(double(5), 10)
+        self.assertEqual(triple(5), 15)
+        self.assertEqual(double.cache_info().currsize, 1)
+
+    def test_cache_info_and_clear(self):
+        cached = lru_cache(maxsize=2)(lambda a, *, b: a + b)
+
+        cached(1, b=2)
+        cached(1, b=2)
+        cached(2, b=2)
+        cached(3, b=2)
+        self.assertEqual(tuple(cached.cache_info()), (1, 3, 2, 2))
+
+        cached.cache_clear()
+        self.assertEqual(tuple(cached.cache_info()), (0, 0, 2, 0))
+
+    def test_typed(self):
+        func = mock.Mock(side_effect=lambda a, b: a + b)
+        untyped = lru_cache(maxsize=4)(func)
+        untyped(1, 2)
+        untyped(1.0, 2)
+        self.assertEqual(func.call_count, 1)
+
+        typed = lru_cache(maxsize=4, typed=True)(func)
+        typed(1, 2)
+        typed(1.0, 2)
+        self.assertEqual(func.call_count, 3)
+
+    def test_unbounded_and_disabled(self):
+        unbounded = lru_cache(maxsize=None)(lambda x: x)
+        for i in range(100):
+            unbounded(i)
+        self.assertEqual(unbounded.cache_info().currsize, 100)
+
+        disabled = lru_cache(maxsize=0)(lambda x: x)
+        disabled(1)
+        disabled(1)
+        self.assertEqual(tuple(disabled.cache_info()), (0, 2, 0, 0))
+
+    def test_concurrent_calls_keep_size_bound(self):
+        cached = lru_cache(maxsize=8)(lambda x: x * 2)
+
+        def worker(offset):
+            for i in range(2000):
+                self.assertEqual(cached((i + offset) % 16), (i + offset) % 16 * 2)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        info = cached.cache_info()
+        self.assertEqual(info.hits + info.misses, 16000)
+        self.assertEqual(info.currsize, 8)
+
+    def test_policy_choice(self):
+        func = mock.Mock(side_effect=lambda x: x)
+        cached = lru_cache(maxsize=2, policy="lfu")(func)
+
+        for key in (1, 1, 2, 3, 1):
+            cached(key)
+
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(cached.cache_info().currsize, 2)
+
+
+class TestLruCacheVariants(unittest.TestCase):
+    def test_ttl_expires_entries(self):
+        func = mock.Mock(side_effect=lambda x: x)
+        with mock.patch.object(main, "monotonic", return_value=100.0) as clock:
+            cached = lru_cache(maxsize=4, ttl=10)(func)
+            cached(1)
+            clock.return_value = 109.0
+            cached(1)
+            self.assertEqual(func.call_count, 1)
+            clock.return_value = 111.0
+            cached(1)
+            self.assertEqual(func.call_count, 2)
+
+    def test_expired_entries_are_removed(self):
+        func = mock.Mock(side_effect=["a" * 1000, ValueError("boom"), "b"])
+        with mock.patch.object(main, "monotonic", return_value=100.0) as clock:
+            cached = lru_cache(maxsize=None, ttl=10, max_bytes=1500)(func)
+            cached(1)
+            clock.return_value = 111.0
+            # пересчёт упал: истёкшая запись всё равно удалена, а её байты
+            # больше не занимают бюджет
+            with self.assertRaises(ValueError):
+                cached(1)
+            self.assertEqual(cached.cache_info().currsize, 0)
+            cached(2)
+            cached(2)
+            self.assertEqual(cached.cache_info().hits, 1)
+
+    def test_max_bytes_evicts_entries(self):
+        cached = lru_cache(maxsize=None, max_bytes=5000)(lambda n: "x" * n)
+
+        for i in range(100):
+            cached(i + 200)
+        self.assertLess(cached.cache_info().currsize, 100)
+        self.assertGreater(cached.cache_info().currsize, 0)
+
+        cached(10_000)
+        cached(10_000)
+        self.assertEqual(cached.cache_info().hits, 0)
+
+    def test_async_calls_share_computation(self):
+        calls = 0
+
+        @lru_cache(maxsize=4)
+        async def fetch(key):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return key * 2
+
+        async def run():
+            results = await asyncio.gather(*(fetch(3) for _ in range(10)))
+            return results + [await fetch(3)]
+
+        self.assertEqual(asyncio.run(run()), [6] * 11)
+        self.assertEqual(calls, 1)
+
+    def test_async_errors_are_not_cached(self):
+        fail = mock.AsyncMock(side_effect=[ValueError("boom"), 5])
+        cached = lru_cache(maxsize=4)(fail)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(cached(1))
+        self.assertEqual(asyncio.run(cached(1)), 5)
+        self.assertEqual(asyncio.run(cached(1)), 5)
+        self.assertEqual(fail.await_count, 2)
+
+
+class TestPolicies(unittest.TestCase):
+    def test_capacity_and_values(self):
+        rng = random.Random(1)
+        trace = [rng.randrange(50) for _ in range(5000)]
+        for name, policy in POLICIES.items():
+            with self.subTest(policy=name):
+                cache = policy(10)
+                for key in trace:
+                    value = cache.get(key)
+                    if value is None:
+                        cache.put(key, key * 2)
+                    else:
+                        self.assertEqual(value, key * 2)
+                    self.assertLessEqual(len(cache), 10)
+                cache.clear()
+                self.assertEqual(len(cache), 0)
+
+    def test_pop(self):
+        for name, policy in POLICIES.items():
+            with self.subTest(policy=name):
+                cache = policy(10)
+                for key in range(5):
+                    cache.put(key, key * 2)
+                    cache.get(key)
+                self.assertEqual(cache.pop(3), 6)
+                self.assertIsNone(cache.pop(3))
+                self.assertEqual(cache.pop(3, "missing"), "missing")
+                self.assertEqual(len(cache), 4)
+                self.assertIsNone(cache.get(3))
+                for key in range(10, 20):
+                    cache.put(key, key)
+                self.assertLessEqual(len(cache), 10)
+
+    def test_scan_resistance(self):
+        trace = synthetic_trace(length=50_000, keys=1000, scan_length=2000)
+        lru = simulate("lru", 100, trace)
+        for name in ("lfu", "arc", "w-tinylfu"):
+            with self.subTest(policy=name):
+                self.assertGreater(simulate(name, 100, trace).hit_ratio, lru.hit_ratio)
+
+
+_shared_square = None
+
+
+def _init_shared_square(storage):
+    global _shared_square
+    _shared_square = lru_cache(storage=storage)(lambda n, *, power=2: n**power)
+
+
+def _call_shared_square(n):
+    return _shared_square(n, power=2)
+
+
+class TestSharedMemoryCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SharedMemoryCache(64)
+        self.addCleanup(self.cache.unlink)
+        self.addCleanup(self.cache.close)
+
+    def test_workers_share_entries(self):
+        with Pool(2, initializer=_init_shared_square, initargs=(self.cache,)) as pool:
+            self.assertEqual(
+                pool.map(_call_shared_square, range(20)), [n**2 for n in range(20)]
+            )
+
+        _init_shared_square(self.cache)
+        for n in range(20):
+            _call_shared_square(n)
+        self.assertEqual(_shared_square.cache_info().hits, 20)
+
+    def test_size_limits_with_shared_storage(self):
+        with self.assertRaises(ValueError):
+            lru_cache(storage=self.cache, max_bytes=1000)
+        # число записей ограничивает само хранилище, maxsize не действует
+        cached = lru_cache(maxsize=2, storage=self.cache)(lambda n: n)
+        for n in range(100):
+            cached(n)
+        self.assertEqual(cached.cache_info().maxsize, 64)
+        self.assertLessEqual(cached.cache_info().currsize, 64)
+        self.assertGreater(cached.cache_info().currsize, 2)
+
+    def test_expired_entries_leave_shared_storage(self):
+        func = mock.Mock(side_effect=[1, ValueError("boom")])
+        with mock.patch.object(main, "monotonic", return_value=100.0) as clock:
+            cached = lru_cache(storage=self.cache, ttl=10)(func)
+            cached("key")
+            self.assertEqual(len(self.cache), 1)
+            clock.return_value = 111.0
+            with self.assertRaises(ValueError):
+                cached("key")
+        self.assertEqual(len(self.cache), 0)
+
+    def test_eviction_and_oversized_values(self):
+        for key in range(200):
+            self.cache.put(key, str(key))
+        self.assertLessEqual(len(self.cache), 64)
+        self.assertEqual(self.cache.get(199), "199")
+
+        self.assertEqual(self.cache.pop(199), "199")
+        self.assertIsNone(self.cache.get(199))
+        self.assertIsNone(self.cache.pop(199))
+
+        self.cache.put("big", "x" * 1000)
+        self.assertIsNone(self.cache.get("big"))
+
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,392 @@
+"""
+Замеры стратегий из main.py с прогревом, повторами и статистикой.
+
+Каждая пара (стратегия, n) измеряется в отдельном свежем процессе: так пик
+RSS относится к одной стратегии, а пулы и кеши не переживают замер.
+Сначала выполняются warmup прогонов без учёта, затем repeat замеренных.
+Память снимается двумя полями: peak_rss_parent — пик самого процесса
+стратегии, peak_rss_tree — пик суммы RSS процесса и всех его потомков,
+который опрашивается по /proc во время прогрева, чтобы опрос не влиял
+на замеренное время. Страницы, общие после fork, входят в RSS каждого
+процесса, поэтому peak_rss_tree — оценка сверху.
+Для времени считаются медиана, межквартильный размах и бутстрэп-интервал
+для медианы, для процессора — доля загрузки всех ядер. Выигрыш алгоритма
+(process_d против process_d_fast) и выигрыш параллельности (ускорение и
+эффективность относительно process_d с тем же движком) считаются отдельно.
+Стратегии из main.DIGEST_PROCESS_NAMES возвращают остатки, а не
+факториалы: у их замеров digest_output=True, и в лучший выигрыш
+параллельности они не попадают, потому что не передают большие числа
+между процессами.
+Прогон сохраняется в --output и дописывается в историю (history.py).
+
+    python benchmark.py --strategies b,b_fast,d,d_fast --n 1000,100000
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import NamedTuple
+
+import cost_model
+import history
+import main
+
+WARMUP = 1
+REPEAT = 5
+BOOTSTRAP_SAMPLES = 2000
+CONFIDENCE = 0.95
+RSS_SAMPLE_INTERVAL = 0.005
+DEFAULT_OUTPUT = Path(__file__).parent / "results" / "benchmark_results.json"
+
+# Имя стратегии -> (буква process_*, суффикс движка из main.ENGINES)
+STRATEGIES = {
+    f"{letter}{suffix}": (letter, suffix)
+    for letter in main.PROCESS_NAMES
+    for suffix in main.ENGINES
+}
+
+# Сколько исполнителей стратегии считают одновременно. Потоки process_a
+# под GIL исполняют Python по одному, в process_c один процесс — producer.
+# Для process_auto число процессов выбирается при вызове.
+STRATEGY_WORKERS = {
+    "a": 1,
+    "b": 4,
+    "c": 3,
+    "d": 1,
+    "b_batched": main.WORKERS,
+    "c_batched": main.WORKERS,
+    "e": main.WORKERS,
+}
+
+
+@dataclass(frozen=True)
+class Measurement:
+    strategy: str
+    n: int
+    times: list[float]
+    cpu_times: list[float]
+    median: float
+    iqr: float
+    ci_low: float
+    ci_high: float
+    cpu_utilisation: float
+    peak_rss_parent: int
+    peak_rss_tree: int
+    workers: int = 1
+    digest_output: bool = False
+    speedup: float = 1.0
+    efficiency: float = 1.0
+
+
+class _RawMeasurement(NamedTuple):
+    """Что возвращает замер из отдельного процесса, до подсчёта статистики."""
+
+    times: list[float]
+    cpu_times: list[float]
+    peak_rss_parent: int
+    peak_rss_tree: int
+    workers: int
+
+
+def generate_log_scale_range(start: int = 10, stop: int = 10**6) -> list[int]:
+    n_values = []
+    current_n = start
+    while current_n <= stop:
+        n_values.append(current_n)
+        current_n *= 10
+    return n_values
+
+
+def measure(
+    strategy: str, n: int, warmup: int = WARMUP, repeat: int = REPEAT
+) -> Measurement:
+    """Замеряет стратегию в отдельном процессе и возвращает Measurement."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        raw = pool.submit(_measure_in_process, strategy, n, warmup, repeat).result()
+    return summarize(strategy, n, raw)
+
+
+def summarize(strategy: str, n: int, raw: _RawMeasurement) -> Measurement:
+    """Медиана, межквартильный размах и интервал для медианы по замерам."""
+    times = raw.times
+    ci_low, ci_high = median_confidence_interval(times)
+    quartiles = statistics.quantiles(times, n=4) if len(times) > 1 else times * 3
+    return Measurement(
+        strategy=strategy,
+        n=n,
+        times=times,
+        cpu_times=raw.cpu_times,
+        median=statistics.median(times),
+        iqr=quartiles[2] - quartiles[0],
+        ci_low=ci_low,
+        ci_high=ci_high,
+        cpu_utilisation=statistics.median(
+            cpu / (wall * os.cpu_count()) for cpu, wall in zip(raw.cpu_times, times)
+        ),
+        peak_rss_parent=raw.peak_rss_parent,
+        peak_rss_tree=raw.peak_rss_tree,
+        workers=raw.workers,
+        digest_output=STRATEGIES[strategy][0] in main.DIGEST_PROCESS_NAMES,
+    )
+
+
+def median_confidence_interval(
+    values: list[float], confidence: float = CONFIDENCE
+) -> tuple[float, float]:
+    """Бутстрэп-интервал для медианы с фиксированным зерном."""
+    rng = random.Random(0)
+    medians = sorted(
+        statistics.median(rng.choices(values, k=len(values)))
+        for _ in range(BOOTSTRAP_SAMPLES)
+    )
+    tail = (1 - confidence) / 2
+    return (
+        medians[int(tail * (BOOTSTRAP_SAMPLES - 1))],
+        medians[int((1 - tail) * (BOOTSTRAP_SAMPLES - 1))],
+    )
+
+
+def with_speedups(measurements: list[Measurement]) -> list[Measurement]:
+    """Добавляет ускорение и эффективность относительно process_d того же движка."""
+    baselines = {
+        (STRATEGIES[m.strategy][1], m.n): m.median
+        for m in measurements
+        if STRATEGIES[m.strategy][0] == "d"
+    }
+    result = []
+    for m in measurements:
+        letter, suffix = STRATEGIES[m.strategy]
+        baseline = baselines.get((suffix, m.n))
+        if baseline is None:
+            result.append(m)
+            continue
+        speedup = baseline / m.median
+        result.append(
+            Measurement(
+                **{**asdict(m), "speedup": speedup, "efficiency": speedup / m.workers}
+            )
+        )
+    return result
+
+
+def algorithmic_speedups(measurements: list[Measurement]) -> dict[int, float]:
+    """Выигрыш алгоритма по n: время process_d, делённое на время process_d_fast."""
+    medians = {(m.strategy, m.n): m.median for m in measurements}
+    return {
+        n: medians[("d", n)] / medians[("d_fast", n)]
+        for strategy, n in medians
+        if strategy == "d" and ("d_fast", n) in medians
+    }
+
+
+def print_summary(measurements: list[Measurement]) -> None:
+    """Выигрыш алгоритма и лучший выигрыш параллельности для каждого n."""
+    algorithmic = algorithmic_speedups(measurements)
+    for n in sorted({m.n for m in measurements}):
+        line = [f"n={n:<8}"]
+        if n in algorithmic:
+            line.append(f"algorithm x{algorithmic[n]:.2f}")
+        for suffix in main.ENGINES:
+            parallel = [
+                m
+                for m in measurements
+                if m.n == n
+                and STRATEGIES[m.strategy][1] == suffix
+                and STRATEGIES[m.strategy][0] != "d"
+                and not m.digest_output
+            ]
+            if parallel:
+                best = max(parallel, key=lambda m: m.speedup)
+                line.append(
+                    f"parallel{suffix or '_loop'} x{best.speedup:.2f} "
+                    f"({best.strategy}, {best.workers} workers, "
+                    f"efficiency {best.efficiency:.0%})"
+                )
+        print(" ".join(line))
+
+
+def run(
+    strategies: list[str],
+    n_values: list[int],
+    warmup: int = WARMUP,
+    repeat: int = REPEAT,
+) -> list[Measurement]:
+    measurements = []
+    for n in n_values:
+        for strategy in strategies:
+            measurement = measure(strategy, n, warmup, repeat)
+            print(
+                f"{strategy:<16} n={n:<8} median {measurement.median:.4f}s "
+                f"[{measurement.ci_low:.4f}, {measurement.ci_high:.4f}] "
+                f"iqr {measurement.iqr:.4f}s cpu {measurement.cpu_utilisation:.0%} "
+                f"rss {measurement.peak_rss_parent / 2**20:.0f}MiB "
+                f"tree {measurement.peak_rss_tree / 2**20:.0f}MiB"
+                + (" digests" if measurement.digest_output else "")
+            )
+            measurements.append(measurement)
+    return with_speedups(measurements)
+
+
+def run_metadata() -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": history.git_commit(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def save_json(measurements: list[Measurement], meta: dict, file_path: Path) -> None:
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "meta": meta,
+        "results": [asdict(m) for m in measurements],
+        "algorithmic_speedups": [
+            {"n": n, "speedup": speedup}
+            for n, speedup in algorithmic_speedups(measurements).items()
+        ],
+    }
+    file_path.write_text(json.dumps(data, indent=2))
+
+
+def _measure_in_process(
+    strategy: str, n: int, warmup: int, repeat: int
+) -> _RawMeasurement:
+    letter, suffix = STRATEGIES[strategy]
+    process = getattr(main, f"process_{letter}")
+    compute = main.ENGINES[suffix]
+    random.seed(n)
+    data = main.generate_data(n)
+    sampler = _TreeRssSampler()
+    sampler.start()
+    # без прогрева память снимается на одном дополнительном незамеренном прогоне
+    for _ in range(max(warmup, 1)):
+        process(data, compute)
+    peak_rss_tree = sampler.stop()
+
+    times, cpu_times = [], []
+    for _ in range(repeat):
+        cpu_before = _cpu_seconds()
+        started_at = time.perf_counter()
+        process(data, compute)
+        times.append(time.perf_counter() - started_at)
+        cpu_times.append(_cpu_seconds() - cpu_before)
+    peak_rss_parent = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return _RawMeasurement(
+        times,
+        cpu_times,
+        peak_rss_parent,
+        peak_rss_tree,
+        _workers(letter, data, compute),
+    )
+
+
+def _workers(letter: str, data: list[int], compute) -> int:
+    if letter == "auto":
+        plan = cost_model.get_model(compute).plan(data, compute, main._chunk_size)
+        return plan.workers
+    return STRATEGY_WORKERS[letter]
+
+
+class _TreeRssSampler(threading.Thread):
+    """Поток, который запоминает пик суммарного RSS процесса и его потомков."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self._interval = interval
+        self._stopped = threading.Event()
+        self.peak = 0
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            self.peak = max(self.peak, _tree_rss(os.getpid()))
+            self._stopped.wait(self._interval)
+
+    def stop(self) -> int:
+        self._stopped.set()
+        self.join()
+        return self.peak
+
+
+def _tree_rss(pid: int) -> int:
+    """RSS процесса pid и всех его потомков по /proc, в байтах."""
+    try:
+        with open(f"/proc/{pid}/statm") as file:
+            total = int(file.read().split()[1]) * _PAGE_SIZE
+        children = []
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as file:
+                children += map(int, file.read().split())
+    except (FileNotFoundError, ProcessLookupError):
+        # процесс завершился между чтениями
+        return 0
+    return total + sum(_tree_rss(child) for child in children)
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _cpu_seconds() -> float:
+    """Процессорное время этого процесса и его завершившихся дочерних."""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def _parse_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--strategies",
+        type=_parse_list,
+        default=list(STRATEGIES),
+        help=f"через запятую из: {', '.join(STRATEGIES)}",
+    )
+    parser.add_argument(
+        "--n",
+        type=lambda value: [int(item) for item in _parse_list(value)],
+        help="размеры входа через запятую (по умолчанию 10..10^6 по степеням 10)",
+    )
+    parser.add_argument("--n-min", type=int, default=10)
+    parser.add_argument("--n-max", type=int, default=10**6)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument(
+        "--history",
+        type=Path,
+        default=history.DEFAULT_HISTORY,
+        help="файл истории, в который дописывается прогон",
+    )
+    args = parser.parse_args()
+
+    unknown = set(args.strategies) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(sorted(unknown))}")
+    n_values = args.n or generate_log_scale_range(args.n_min, args.n_max)
+
+    measurements = run(args.strategies, n_values, args.warmup, args.repeat)
+    meta = run_metadata()
+    save_json(measurements, meta, args.output)
+    history.append_run(meta, [asdict(m) for m in measurements], args.history)
+    print_summary(measurements)
+
+
+if __name__ == "__main__":
+    main_cli()
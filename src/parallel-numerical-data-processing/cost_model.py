@@ -0,0 +1,243 @@
+"""
+Модель стоимости стратегий для process_auto, откалиброванная на этой машине.
+
+Калибровка измеряет стоимость вычисления одного числа в зависимости от его
+значения, запуск пула процессов и передачу результатов между процессами,
+и сохраняет их в results/cost_model.json (файл не хранится в git; путь
+можно заменить переменной окружения COST_MODEL_PATH). По модели для
+каждого вызова оценивается время однопроцессного варианта, process_d, и
+пула process_b_batched из разного числа процессов, и выбирается самый
+быстрый; другие стратегии модель не описывает.
+
+Если файла нет, get_model калибрует модель при первом вызове, что
+занимает несколько секунд. Заранее это делает
+
+    python cost_model.py  # (пере)калибровать
+"""
+
+import bisect
+import json
+import math
+import os
+import platform
+import time
+from dataclasses import asdict, dataclass, field
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Callable, Optional
+
+DEFAULT_MODEL = Path(
+    os.environ.get(
+        "COST_MODEL_PATH", Path(__file__).parent / "results" / "cost_model.json"
+    )
+)
+CALIBRATION_VALUES = (1, 10, 50, 100, 250, 500, 1000)
+CALIBRATION_SECONDS = 0.005
+CALIBRATION_ROUNDS = 3
+IPC_SMALL_ITEMS = 20_000
+IPC_BIG_ITEMS = 2_000
+IPC_BIG_BITS = 8_000
+SAMPLE_SIZE = 256
+# Размер пачки pool.map при калибровке передачи
+IPC_CHUNK_SIZE = 500
+
+_model = None
+
+
+@dataclass(frozen=True)
+class Plan:
+    """
+    Выбранная стратегия: workers=1 — однопроцессный вариант.
+
+    predicted_seconds равно 0.0, если оценка не строилась (см. CostModel.plan).
+    """
+
+    workers: int
+    chunk_size: int
+    predicted_seconds: float
+
+
+@dataclass
+class CostModel:
+    cpu_count: int
+    python: str
+    pool_fixed: float
+    pool_per_worker: float
+    ipc_per_item: float
+    ipc_per_byte: float
+    # Имя функции -> пары (значение, секунды на одно вычисление)
+    compute_costs: dict[str, list[list[float]]] = field(default_factory=dict)
+
+    def item_cost(self, compute: Callable[[int], int], value: int) -> float:
+        """Стоимость одного вычисления, линейно интерполированная по калибровке."""
+        points = self.compute_costs[_compute_name(compute)]
+        index = bisect.bisect_left(points, [value])
+        index = min(max(index, 1), len(points) - 1)
+        (x0, y0), (x1, y1) = points[index - 1], points[index]
+        return max(y0 + (y1 - y0) * (value - x0) / (x1 - x0), 0.0)
+
+    def pool_seconds(
+        self, n: int, serial_seconds: float, result_bytes: float, workers: int
+    ) -> float:
+        """Запуск пула, передача результатов и вычисление на доступных ядрах."""
+        startup = self.pool_fixed + self.pool_per_worker * workers
+        transfer = n * self.ipc_per_item + result_bytes * self.ipc_per_byte
+        return startup + transfer + serial_seconds / min(workers, self.cpu_count)
+
+    def plan(
+        self,
+        data: list[int],
+        compute: Callable[[int], int],
+        chunk_size: Callable[[int, int], int],
+    ) -> Plan:
+        """
+        Самый быстрый по модели вариант для data: workers=1 означает
+        process_d, иначе process_b_batched с workers процессами.
+
+        Стоимость вычислений и объём результатов оцениваются по выборке
+        значений из data. Если даже по самой дорогой калибровочной точке
+        вычисления дешевле запуска двух процессов, выборка не строится.
+        """
+        n = len(data)
+        if (
+            n * self.compute_costs[_compute_name(compute)][-1][1]
+            <= (self.pool_fixed + 2 * self.pool_per_worker)
+            or self.cpu_count < 2
+        ):
+            return Plan(1, n, 0.0)
+
+        sample = data[:: max(1, n // SAMPLE_SIZE)]
+        serial = n * sum(self.item_cost(compute, v) for v in sample) / len(sample)
+        result_bytes = n * sum(_result_bytes(v) for v in sample) / len(sample)
+
+        best = Plan(1, n, serial)
+        for workers in range(2, self.cpu_count + 1):
+            seconds = self.pool_seconds(n, serial, result_bytes, workers)
+            if seconds < best.predicted_seconds:
+                best = Plan(workers, chunk_size(n, workers), seconds)
+        return best
+
+
+def calibrate(
+    computes: tuple[Callable[[int], int], ...] = (),
+) -> CostModel:
+    """Измеряет все параметры модели; computes калибруются сразу."""
+    pool_1, pool_2 = _pool_startup_seconds(1), _pool_startup_seconds(2)
+    pool_per_worker = max(pool_2 - pool_1, 0.0)
+
+    with Pool(processes=1) as pool:
+        small = _best_of(
+            lambda: pool.map(_echo, [1] * IPC_SMALL_ITEMS, chunksize=IPC_CHUNK_SIZE)
+        )
+        big_value = 1 << IPC_BIG_BITS
+        big = _best_of(
+            lambda: pool.map(
+                _echo, [big_value] * IPC_BIG_ITEMS, chunksize=IPC_CHUNK_SIZE
+            )
+        )
+    ipc_per_item = small / IPC_SMALL_ITEMS
+    ipc_per_byte = max(big / IPC_BIG_ITEMS - ipc_per_item, 0.0) / (IPC_BIG_BITS / 8)
+
+    model = CostModel(
+        cpu_count=os.cpu_count() or 1,
+        python=platform.python_version(),
+        pool_fixed=max(pool_1 - pool_per_worker, 0.0),
+        pool_per_worker=pool_per_worker,
+        ipc_per_item=ipc_per_item,
+        ipc_per_byte=ipc_per_byte,
+    )
+    for compute in computes:
+        calibrate_compute(model, compute)
+    return model
+
+
+def calibrate_compute(model: CostModel, compute: Callable[[int], int]) -> None:
+    """Добавляет в модель стоимость compute по точкам CALIBRATION_VALUES."""
+    points = []
+    for value in CALIBRATION_VALUES:
+        calls = 1
+        while True:
+            started_at = time.perf_counter()
+            for _ in range(calls):
+                compute(value)
+            elapsed = time.perf_counter() - started_at
+            if elapsed >= CALIBRATION_SECONDS:
+                break
+            calls *= 2
+        seconds = _best_of(lambda: [compute(value) for _ in range(calls)])
+        points.append([value, seconds / calls])
+    model.compute_costs[_compute_name(compute)] = points
+
+
+def load_model(file_path: Path = DEFAULT_MODEL) -> Optional[CostModel]:
+    """Сохранённая модель, если она снята на этой машине и этой версии Python."""
+    if not file_path.exists():
+        return None
+    model = CostModel(**json.loads(file_path.read_text()))
+    if model.cpu_count != os.cpu_count() or model.python != platform.python_version():
+        return None
+    return model
+
+
+def save_model(model: CostModel, file_path: Path = DEFAULT_MODEL) -> None:
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_text(json.dumps(asdict(model), indent=2))
+
+
+def get_model(
+    compute: Callable[[int], int], file_path: Path = DEFAULT_MODEL
+) -> CostModel:
+    """
+    Модель этого процесса: из file_path или после калибровки.
+
+    Калибровка выполняется один раз на машину и занимает несколько секунд,
+    а для новой функции compute дополняется; в обоих случаях модель
+    сохраняется в file_path.
+    """
+    global _model
+    if _model is None:
+        _model = load_model(file_path) or calibrate()
+        save_model(_model, file_path)
+    if _compute_name(compute) not in _model.compute_costs:
+        calibrate_compute(_model, compute)
+        save_model(_model, file_path)
+    return _model
+
+
+def _pool_startup_seconds(workers: int) -> float:
+    def start_pool():
+        with Pool(processes=workers) as pool:
+            pool.map(_echo, range(workers))
+
+    return _best_of(start_pool)
+
+
+def _best_of(func: Callable[[], object]) -> float:
+    """Минимальное время из CALIBRATION_ROUNDS вызовов: меньше всего шума."""
+    timings = []
+    for _ in range(CALIBRATION_ROUNDS):
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def _result_bytes(value: int) -> float:
+    """Размер value! в байтах: log2(value!) = lgamma(value + 1) / ln 2."""
+    return math.lgamma(max(value, 1) + 1) / math.log(2) / 8
+
+
+def _compute_name(compute: Callable[[int], int]) -> str:
+    return f"{compute.__module__}.{compute.__qualname__}"
+
+
+def _echo(value: int) -> int:
+    return value
+
+
+if __name__ == "__main__":
+    from main import ENGINES
+
+    model = calibrate(tuple(ENGINES.values()))
+    save_model(model)
+    print(json.dumps(asdict(model), indent=2))
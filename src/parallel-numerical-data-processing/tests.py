@@ -0,0 +1,217 @@
+import math
+import os
+import random
+import statistics
+import unittest
+
+import history
+from benchmark import _RawMeasurement, measure, summarize
+from cost_model import CostModel, Plan, _compute_name
+from factorial import fast_factorial
+from main import (
+    DIGEST_MODULUS,
+    _chunk_size,
+    process_b_batched,
+    process_c_batched,
+    process_d,
+    process_e,
+)
+
+
+def _compute(number: int) -> int:
+    return number
+
+
+def _model(cpu_count: int = 4) -> CostModel:
+    """Синтетическая модель: вычисление стоит 1 мкс для 1 и 1 мс для 1000."""
+    return CostModel(
+        cpu_count=cpu_count,
+        python="test",
+        pool_fixed=0.05,
+        pool_per_worker=0.01,
+        ipc_per_item=1e-6,
+        ipc_per_byte=1e-9,
+        compute_costs={_compute_name(_compute): [[1, 1e-6], [1000, 1e-3]]},
+    )
+
+
+class TestCostModelPlan(unittest.TestCase):
+    def test_small_input_skips_estimate(self):
+        self.assertEqual(
+            _model().plan([1000] * 10, _compute, _chunk_size), Plan(1, 10, 0.0)
+        )
+
+    def test_single_cpu_is_serial(self):
+        plan = _model(cpu_count=1).plan([1000] * 100_000, _compute, _chunk_size)
+        self.assertEqual(plan, Plan(1, 100_000, 0.0))
+
+    def test_cheap_items_stay_serial(self):
+        # Оценка строится, но передача результатов дороже самих вычислений
+        plan = _model().plan([1] * 100_000, _compute, _chunk_size)
+        self.assertEqual(plan.workers, 1)
+        self.assertAlmostEqual(plan.predicted_seconds, 0.1)
+
+    def test_serial_to_pool_crossover(self):
+        model = _model()
+        plans = [model.plan([1000] * n, _compute, _chunk_size) for n in range(1, 400)]
+        workers = [plan.workers for plan in plans]
+        crossover = workers.index(model.cpu_count)
+
+        self.assertGreater(crossover, 0)
+        self.assertEqual(set(workers[:crossover]), {1})
+        self.assertEqual(set(workers[crossover:]), {model.cpu_count})
+        # n = crossover + 1: пул впервые быстрее однопроцессной оценки
+        self.assertAlmostEqual(plans[crossover - 1].predicted_seconds, crossover * 1e-3)
+        self.assertLess(plans[crossover].predicted_seconds, (crossover + 1) * 1e-3)
+
+    def test_pool_chunk_size(self):
+        n = 200_000
+        plan = _model().plan([1000] * n, _compute, _chunk_size)
+        self.assertEqual(plan.workers, 4)
+        self.assertEqual(plan.chunk_size, _chunk_size(n, 4))
+        self.assertGreater(plan.predicted_seconds, n * 1e-3 / 4)
+        self.assertLess(plan.predicted_seconds, n * 1e-3)
+
+
+class TestProcessE(unittest.TestCase):
+    def test_returns_digests(self):
+        self.assertEqual(
+            process_e([5, 25]), [120, 15511210043330985984000000 % DIGEST_MODULUS]
+        )
+
+    def test_rejects_numbers_outside_uint16(self):
+        for data in ([1, 2**16], [-1]):
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                process_e(data)
+
+
+class TestBatchedStrategies(unittest.TestCase):
+    # 10 чисел пачками по 3: последняя пачка из одного числа
+    data = [7, 0, 1, 30, 12, 5, 1, 9, 25, 3]
+
+    def test_match_process_d(self):
+        expected = process_d(self.data)
+        for name, strategy in (
+            ("b_batched", process_b_batched),
+            ("c_batched", process_c_batched),
+        ):
+            for chunk_size in (None, 3, len(self.data) + 1):
+                with self.subTest(strategy=name, chunk_size=chunk_size):
+                    self.assertEqual(
+                        strategy(self.data, chunk_size=chunk_size), expected
+                    )
+
+    def test_process_e_matches_process_d(self):
+        expected = [result % DIGEST_MODULUS for result in process_d(self.data)]
+        self.assertEqual(process_e(self.data), expected)
+
+    def test_empty_input(self):
+        self.assertEqual(process_b_batched([]), [])
+        self.assertEqual(process_c_batched([]), [])
+
+
+class TestFastFactorial(unittest.TestCase):
+    def test_matches_math_factorial(self):
+        # 0 и 1 — края таблицы, после 1000 — бинарное разбиение диапазона
+        for number in range(3001):
+            with self.subTest(number=number):
+                self.assertEqual(fast_factorial(number), math.factorial(number))
+
+
+def _run(times_by_strategy: dict[str, list[float]]) -> dict:
+    """Прогон в формате history.jsonl с одним n для каждой стратегии."""
+    return {
+        "meta": {},
+        "results": [
+            {
+                "strategy": strategy,
+                "n": 1000,
+                "times": times,
+                "median": statistics.median(times),
+            }
+            for strategy, times in times_by_strategy.items()
+        ],
+    }
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(1)
+        # 7 + 7 замеров: все 3432 разбиения перебираются точно
+        self.small = [1 + rng.gauss(0, 0.02) for _ in range(7)]
+        # 30 + 30 замеров: случайные перестановки с фиксированным зерном
+        self.large = [1 + rng.gauss(0, 0.02) for _ in range(30)]
+
+    def test_identical_samples_have_high_p_value(self):
+        for sample in (self.small, self.large):
+            with self.subTest(size=len(sample)):
+                self.assertGreater(
+                    history.permutation_p_value(sample, list(sample)), 0.5
+                )
+
+    def test_shifted_samples_have_low_p_value(self):
+        for sample in (self.small, self.large):
+            slower = [time * 1.3 for time in sample]
+            with self.subTest(size=len(sample)):
+                self.assertLess(history.permutation_p_value(sample, slower), 0.01)
+
+    def test_random_permutations_are_deterministic(self):
+        slower = [time * 1.01 for time in self.large]
+        self.assertEqual(
+            history.permutation_p_value(self.large, slower),
+            history.permutation_p_value(self.large, slower),
+        )
+
+    def test_compare_runs(self):
+        baseline = _run({"d": self.small, "b": self.small, "c": self.small})
+        candidate = _run(
+            {
+                "d": list(self.small),
+                "b": [time * 1.3 for time in self.small],
+                # значимо, но меньше MIN_SLOWDOWN
+                "c": [time * 1.01 for time in self.small],
+            }
+        )
+        regressions = history.compare_runs(baseline, candidate)
+
+        self.assertEqual([r.strategy for r in regressions], ["b"])
+        self.assertAlmostEqual(regressions[0].slowdown, 0.3)
+        self.assertLess(regressions[0].p_value, history.ALPHA)
+        self.assertEqual(history.compare_runs(baseline, baseline), [])
+
+
+class TestBenchmarkSummary(unittest.TestCase):
+    def _summarize(self, times: list[float]):
+        # процессорное время всех ядер на весь замер: загрузка ровно 1.0
+        cpu_times = [time * os.cpu_count() for time in times]
+        return summarize("d", 10, _RawMeasurement(times, cpu_times, 1, 2, 1))
+
+    def test_median_and_spread(self):
+        measurement = self._summarize([1.0, 2.0, 3.0, 4.0, 100.0])
+        self.assertEqual(measurement.median, 3.0)
+        # квартили statistics.quantiles (method="exclusive"): 1.5 и 52.0
+        self.assertEqual(measurement.iqr, 50.5)
+        self.assertLessEqual(measurement.ci_low, measurement.median)
+        self.assertGreaterEqual(measurement.ci_high, measurement.median)
+        self.assertGreaterEqual(measurement.ci_low, 1.0)
+        self.assertLessEqual(measurement.ci_high, 100.0)
+        self.assertAlmostEqual(measurement.cpu_utilisation, 1.0)
+        self.assertEqual(
+            (measurement.peak_rss_parent, measurement.peak_rss_tree), (1, 2)
+        )
+
+    def test_single_time_has_no_spread(self):
+        measurement = self._summarize([2.0])
+        self.assertEqual(measurement.median, 2.0)
+        self.assertEqual(measurement.iqr, 0.0)
+        self.assertEqual((measurement.ci_low, measurement.ci_high), (2.0, 2.0))
+
+    def test_measure_in_separate_process(self):
+        measurement = measure("d", 10, warmup=0, repeat=3)
+        self.assertEqual(len(measurement.times), 3)
+        self.assertEqual(measurement.median, statistics.median(measurement.times))
+        self.assertEqual(measurement.workers, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+Сравнение search по одному числу с пакетными search_many и lower_bound,
+а также с SortedIndex отдельно для попаданий и промахов.
+
+Списки — размер large_list из тестов и в 100 раз больше. Для скалярного
+поиска большой список заменён на range: search требует только индексации
+и len, а список из 10^8 объектов int не поместился бы в память. Половина
+запросов — промахи. Для пакетного поиска массив готовится заранее через
+as_sorted_array, как при многократных запросах к одному списку.
+SortedIndex строится только для размера large_list: при 10^8 ключей
+промежуточные массивы построения не помещаются в память.
+
+В main запросов меньше MERGE_MIN_RATIO * size, поэтому и отсортированные
+запросы идут через searchsorted. Слияние _merge_bound проверяет отдельный
+прогон merge_main: MERGE_MIN_RATIO * MERGE_MIN_SIZE отсортированных
+запросов к MERGE_MIN_SIZE ключам против того же searchsorted.
+"""
+
+import random
+import time
+
+import numpy as np
+
+from main import (
+    MERGE_MIN_RATIO,
+    MERGE_MIN_SIZE,
+    as_sorted_array,
+    lower_bound,
+    search,
+    search_many,
+)
+from sorted_index import SortedIndex
+
+SIZES = (1_000_000, 100_000_000)
+INDEX_SIZE = SIZES[0]
+QUERIES = 200_000
+SCALAR_QUERIES = 20_000
+REPEAT = 3
+
+
+def _best(func) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def _queries(size: int, count: int) -> list[int]:
+    rng = random.Random(0)
+    return [rng.randrange(-size, size) + 1 for _ in range(count)]
+
+
+def main() -> None:
+    print(f"{'size':>12} {'method':<22} {'lookups/sec':>14}")
+    for size in SIZES:
+        search_list = range(1, size + 1)
+        array = as_sorted_array(np.arange(1, size + 1))
+        queries = _queries(size, QUERIES)
+        query_array = np.asarray(queries)
+        sorted_queries = np.sort(query_array)
+
+        scalar = queries[:SCALAR_QUERIES]
+        results = {
+            "search (scalar)": SCALAR_QUERIES
+            / _best(
+                lambda search_list=search_list, scalar=scalar: [
+                    search(number, search_list) for number in scalar
+                ]
+            ),
+            "search_many (list)": QUERIES
+            / _best(lambda queries=queries, array=array: search_many(queries, array)),
+            "search_many (array)": QUERIES
+            / _best(
+                lambda query_array=query_array, array=array: search_many(
+                    query_array, array
+                )
+            ),
+            "search_many (sorted)": QUERIES
+            / _best(
+                lambda sorted_queries=sorted_queries, array=array: search_many(
+                    sorted_queries, array
+                )
+            ),
+            "lower_bound (array)": QUERIES
+            / _best(
+                lambda query_array=query_array, array=array: lower_bound(
+                    query_array, array
+                )
+            ),
+        }
+        for method, rate in results.items():
+            print(f"{size:>12} {method:<22} {rate:>14,.0f}")
+
+
+def index_main() -> None:
+    """Попадания и промахи: ключи — чётные числа, промахи — нечётные."""
+    search_list = list(range(0, 2 * INDEX_SIZE, 2))
+    array = as_sorted_array(search_list)
+    index = SortedIndex(search_list)
+    rng = random.Random(0)
+    workloads = {
+        "hits": [2 * rng.randrange(INDEX_SIZE) for _ in range(QUERIES)],
+        "misses": [2 * rng.randrange(INDEX_SIZE) + 1 for _ in range(QUERIES)],
+    }
+
+    print(f"\n{'workload':<8} {'method':<26} {'lookups/sec':>14}")
+    for workload, queries in workloads.items():
+        query_array = np.asarray(queries)
+        scalar = queries[:SCALAR_QUERIES]
+        results = {
+            "search (scalar)": SCALAR_QUERIES
+            / _best(
+                lambda scalar=scalar: [search(number, search_list) for number in scalar]
+            ),
+            "number in SortedIndex": QUERIES
+            / _best(lambda queries=queries: [number in index for number in queries]),
+            "search_many (array)": QUERIES
+            / _best(lambda query_array=query_array: search_many(query_array, array)),
+            "SortedIndex.contains_many": QUERIES
+            / _best(lambda query_array=query_array: index.contains_many(query_array)),
+        }
+        for method, rate in results.items():
+            print(f"{workload:<8} {method:<26} {rate:>14,.0f}")
+
+
+def merge_main() -> None:
+    """Отсортированные запросы, которых достаточно много для слияния."""
+    array = as_sorted_array(np.arange(0, 2 * MERGE_MIN_SIZE, 2))
+    count = MERGE_MIN_RATIO * MERGE_MIN_SIZE
+    rng = np.random.default_rng(0)
+    queries = np.sort(rng.integers(-1, 2 * MERGE_MIN_SIZE + 1, count))
+
+    print(f"\n{'keys':>12} {'method':<22} {'lookups/sec':>14}")
+    results = {
+        "searchsorted": count
+        / _best(lambda: np.searchsorted(array, queries, side="left")),
+        "lower_bound (merge)": count / _best(lambda: lower_bound(queries, array)),
+    }
+    for method, rate in results.items():
+        print(f"{MERGE_MIN_SIZE:>12} {method:<22} {rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
+    index_main()
+    merge_main()
@@ -1,4 +1,14 @@
 import unittest
+from typing import Sequence, Union
+
+import numpy as np
+
+# Слияние вместо searchsorted выгоднее, когда отсортированных запросов
+# намного больше, чем элементов, а сам массив не помещается в кеш
+MERGE_MIN_RATIO = 8
+MERGE_MIN_SIZE = 100_000
+
+ArrayLike = Union[Sequence[int], np.ndarray]
 
 
 def search(number: int, search_list: list[int]) -> bool:
@@ -14,7 +24,99 @@ def search(number: int, search_list: list[int]) -> bool:
     return False
 
 
+def as_sorted_array(search_list: ArrayLike) -> np.ndarray:
+    """
+    Массив numpy из отсортированного списка для пакетных функций ниже.
+
+    Пакетные функции принимают и обычный список, но копируют его при каждом
+    вызове; при многократных запросах к одному списку копию стоит сделать
+    один раз.
+    """
+    return np.asarray(search_list)
+
+
+def lower_bound(numbers: ArrayLike, search_list: ArrayLike) -> np.ndarray:
+    """Для каждого числа — индекс первого элемента, не меньшего его."""
+    return _bound(numbers, search_list, "left")
+
+
+def upper_bound(numbers: ArrayLike, search_list: ArrayLike) -> np.ndarray:
+    """Для каждого числа — индекс первого элемента, большего его."""
+    return _bound(numbers, search_list, "right")
+
+
+def search_many(numbers: ArrayLike, search_list: ArrayLike) -> np.ndarray:
+    """Булева маска: есть ли каждое из numbers в search_list, как у search."""
+    return find_positions(numbers, search_list) >= 0
+
+
+def find_positions(numbers: ArrayLike, search_list: ArrayLike) -> np.ndarray:
+    """Индекс первого вхождения каждого числа или -1, если его нет."""
+    array = as_sorted_array(search_list)
+    queries = np.asarray(numbers)
+    positions = lower_bound(queries, array)
+    inside = positions < len(array)
+    found = np.zeros(len(queries), dtype=bool)
+    found[inside] = array[positions[inside]] == queries[inside]
+    return np.where(found, positions, -1)
+
+
+def count_equal(numbers: ArrayLike, search_list: ArrayLike) -> np.ndarray:
+    """Сколько раз каждое число встречается в search_list."""
+    array = as_sorted_array(search_list)
+    return upper_bound(numbers, array) - lower_bound(numbers, array)
+
+
+def count_between(
+    lows: ArrayLike, highs: ArrayLike, search_list: ArrayLike
+) -> np.ndarray:
+    """Сколько элементов попадает в каждый отрезок [low, high]."""
+    array = as_sorted_array(search_list)
+    counts = upper_bound(highs, array) - lower_bound(lows, array)
+    return np.maximum(counts, 0)
+
+
+def _bound(numbers: ArrayLike, search_list: ArrayLike, side: str) -> np.ndarray:
+    """
+    Векторный бинарный поиск, а для длинных отсортированных запросов — слияние.
+
+    searchsorted тратит O(log n) на запрос; если запросы отсортированы и их
+    много больше, чем элементов, линейное слияние двух отсортированных
+    последовательностей обходит массив один раз.
+    """
+    array = as_sorted_array(search_list)
+    queries = np.asarray(numbers)
+    if (
+        len(array) >= MERGE_MIN_SIZE
+        and len(queries) >= MERGE_MIN_RATIO * len(array)
+        and bool(np.all(queries[1:] >= queries[:-1]))
+    ):
+        return _merge_bound(queries, array, side)
+    return np.searchsorted(array, queries, side=side)
+
+
+def _merge_bound(queries: np.ndarray, array: np.ndarray, side: str) -> np.ndarray:
+    """
+    Границы для отсортированных queries через устойчивую сортировку слиянием.
+
+    Склеенные отсортированные части сортировка объединяет за один проход.
+    При равенстве устойчивость ставит запрос перед элементами массива для
+    side="left" и после них для side="right", а запросы между собой
+    сохраняют порядок. Поэтому место k-го запроса в результате минус k —
+    число элементов массива перед ним.
+    """
+    if side == "left":
+        order = np.argsort(np.concatenate([queries, array]), kind="stable")
+        query_places = np.flatnonzero(order < len(queries))
+    else:
+        order = np.argsort(np.concatenate([array, queries]), kind="stable")
+        query_places = np.flatnonzero(order >= len(array))
+    return query_places - np.arange(len(queries))
+
+
 class TestSearchInSortedList(unittest.TestCase):
+    search = staticmethod(search)
+
     def setUp(self):
         self.sorted_list = [1, 2, 3, 45, 356, 569, 600, 705, 923]
         self.large_list = list(range(1, 1000001))
@@ -33,14 +135,14 @@ class TestSearchInSortedList(unittest.TestCase):
 
         for number, expected in test_cases:
             with self.subTest(number=number, expected=expected):
-                self.assertEqual(search(number, self.sorted_list), expected)
+                self.assertEqual(self.search(number, self.sorted_list), expected)
 
     def test_element_does_not_exist(self):
         test_cases = [0, 4, 700, 1000, -5, 924, 355]
 
         for number in test_cases:
             with self.subTest(number=number):
-                self.assertFalse(search(number, self.sorted_list))
+                self.assertFalse(self.search(number, self.sorted_list))
 
     def test_edge_cases(self):
         test_cases = [
@@ -55,7 +157,7 @@ class TestSearchInSortedList(unittest.TestCase):
 
         for lst, number, expected in test_cases:
             with self.subTest(lst=lst[:5], number=number, expected=expected):
-                self.assertEqual(search(number, lst), expected)
+                self.assertEqual(self.search(number, lst), expected)
 
     def test_large_list(self):
         test_cases = [
@@ -69,7 +171,7 @@ class TestSearchInSortedList(unittest.TestCase):
 
         for number, expected in test_cases:
             with self.subTest(number=number, expected=expected):
-                self.assertEqual(search(number, self.large_list), expected)
+                self.assertEqual(self.search(number, self.large_list), expected)
 
     def test_first_last_elements(self):
         test_lists = [
@@ -82,9 +184,52 @@ class TestSearchInSortedList(unittest.TestCase):
 
         for lst in test_lists:
             with self.subTest(lst=lst[:5]):
-                self.assertTrue(search(lst[0], lst))
-                self.assertTrue(search(lst[-1], lst))
-                self.assertFalse(search(lst[-1] + 1, lst))
+                self.assertTrue(self.search(lst[0], lst))
+                self.assertTrue(self.search(lst[-1], lst))
+                self.assertFalse(self.search(lst[-1] + 1, lst))
+
+
+class TestBatchSearch(unittest.TestCase):
+    def setUp(self):
+        self.sorted_list = [1, 2, 3, 45, 356, 569, 600, 705, 923]
+        self.duplicate_list = [1, 2, 2, 2, 3, 4, 4, 5]
+        self.queries = [-5, 0, 1, 2, 4, 45, 355, 356, 700, 923, 924]
+
+    def test_mask_matches_search(self):
+        for lst in (self.sorted_list, self.duplicate_list, [42], []):
+            with self.subTest(lst=lst[:5]):
+                expected = [search(number, lst) for number in self.queries]
+                self.assertEqual(search_many(self.queries, lst).tolist(), expected)
+                array = as_sorted_array(lst)
+                self.assertEqual(search_many(self.queries, array).tolist(), expected)
+
+    def test_positions(self):
+        positions = find_positions([2, 4, 6, 1], self.duplicate_list)
+        self.assertEqual(positions.tolist(), [1, 5, -1, 0])
+
+    def test_bounds_and_counts(self):
+        queries = [0, 2, 4, 6]
+        self.assertEqual(
+            lower_bound(queries, self.duplicate_list).tolist(), [0, 1, 5, 8]
+        )
+        self.assertEqual(
+            upper_bound(queries, self.duplicate_list).tolist(), [0, 4, 7, 8]
+        )
+        self.assertEqual(
+            count_equal(queries, self.duplicate_list).tolist(), [0, 3, 2, 0]
+        )
+        self.assertEqual(
+            count_between([2, 0, 5], [4, 10, 1], self.duplicate_list).tolist(),
+            [6, 8, 0],
+        )
+
+    def test_sorted_queries_merge(self):
+        array = np.arange(0, 2 * MERGE_MIN_SIZE, 2)
+        queries = np.arange(-1, 2 * MERGE_MIN_SIZE + 1).repeat(4)
+        for side in ("left", "right"):
+            with self.subTest(side=side):
+                expected = np.searchsorted(array, queries, side=side)
+                self.assertTrue(np.array_equal(_bound(queries, array, side), expected))
 
 
 if __name__ == "__main__":
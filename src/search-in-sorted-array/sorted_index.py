@@ -0,0 +1,186 @@
+from bisect import bisect_left
+from typing import Union
+
+import numpy as np
+
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 4
+_WORD_BITS = 64
+_BIT_SHIFTS = tuple(8 + 6 * j for j in range(BLOOM_HASHES))
+# биты двух соседних хешей по 12 битам смешанного значения: скалярная
+# проверка берёт маску двумя обращениями к таблице вместо цикла по хешам
+_PAIR_MASKS = tuple(1 << (bits & 63) | 1 << (bits >> 6) for bits in range(1 << 12))
+_MIX = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+_HASH_MODULUS = (1 << 61) - 1
+_INT64_LIMIT = 2.0**63
+
+
+class SortedIndex:
+    """
+    Неизменяемый индекс по отсортированному списку для проверки вхождения.
+
+    Ключи хранятся в массиве int64 в порядке Эйтзингера: дерево поиска
+    уложено по уровням, как двоичная куча, поэтому первые шаги поиска
+    всегда читают одни и те же несколько строк кеша, а не прыгают по всему
+    массиву. Перед деревом стоит блочный фильтр Блума: ключ задаёт одно
+    64-битное слово и BLOOM_HASHES битов в нём, так что почти все
+    отсутствующие числа отбрасываются одной проверкой маски.
+
+    По дереву спускается contains_many, сразу для всего массива чисел.
+    Для одного числа спуск в цикле Python медленнее bisect на C, поэтому
+    number in index ищет bisect-ом по отсортированной копии ключей: индекс
+    занимает 16 байт на ключ вместо 8, зато попадания не медленнее search.
+
+    number in index совпадает с search(number, search_list), в том числе
+    для дубликатов. Ключи должны быть целыми и помещаться в int64, иначе
+    ValueError.
+    """
+
+    def __init__(self, search_list):
+        keys = _int64_keys(search_list)
+        self._size = len(keys)
+        self._keys_view = memoryview(keys)
+        self._levels = self._size.bit_length()
+        # ячейка 0 не используется: у узла k потомки 2k и 2k + 1
+        self._tree = np.empty(self._size + 1, dtype=np.int64)
+        self._tree[1:] = keys[_eytzinger_ranks(self._size)]
+
+        self._words = max(1, -(-self._size * BLOOM_BITS_PER_KEY // _WORD_BITS))
+        self._bloom = np.zeros(self._words, dtype=np.uint64)
+        mixed = _mix_array(keys)
+        np.bitwise_or.at(self._bloom, self._word_indexes(mixed), _bit_masks(mixed))
+        self._bloom_view = memoryview(self._bloom)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, number: Union[int, float]) -> bool:
+        mixed = (hash(number) & _MASK64) * _MIX & _MASK64
+        mask = _PAIR_MASKS[mixed >> 8 & 4095] | _PAIR_MASKS[mixed >> 20 & 4095]
+        word = self._bloom_view[(mixed >> 32) * self._words >> 32]
+        if word & mask != mask:
+            return False
+
+        keys = self._keys_view
+        position = bisect_left(keys, number)
+        return position < self._size and keys[position] == number
+
+    def contains_many(self, numbers) -> np.ndarray:
+        """
+        Булева маска вхождения для массива чисел.
+
+        Числа, прошедшие фильтр, спускаются по дереву все сразу, по уровню
+        за шаг. Если ключи целиком помещаются в кеш процессора, searchsorted
+        из search_many может оказаться быстрее на пакетах из одних попаданий:
+        тогда выигрыш индекса остаётся только на промахах.
+        """
+        queries = np.asarray(numbers)
+        if queries.dtype.kind == "f":
+            # дробные числа ключами быть не могут, а int64 их бы округлил
+            integral = _is_int64(queries)
+            found = np.zeros(len(queries), dtype=bool)
+            found[integral] = self.contains_many(queries[integral].astype(np.int64))
+            return found
+        queries = queries.astype(np.int64)
+        mixed = _mix_array(queries)
+        masks = _bit_masks(mixed)
+        passed = np.flatnonzero(self._bloom[self._word_indexes(mixed)] & masks == masks)
+
+        found = np.zeros(len(queries), dtype=bool)
+        found[passed] = self._tree_contains(queries[passed])
+        return found
+
+    def _tree_contains(self, queries: np.ndarray) -> np.ndarray:
+        tree, size = self._tree, self._size
+        nodes = np.ones(len(queries), dtype=np.int64)
+        # все уровни, кроме последнего, полные: проверка границ не нужна
+        for _ in range(self._levels - 1):
+            nodes <<= 1
+            nodes += tree.take(nodes >> 1) < queries
+        # отсутствующий узел последнего уровня считаем меньшим запроса:
+        # подъём ниже тогда приводит туда же, где остановился бы спуск
+        outside = nodes > size
+        step = tree.take(np.minimum(nodes, size)) < queries
+        nodes <<= 1
+        nodes += step | outside
+        # подняться к последнему узлу, где поиск ушёл влево: это первый
+        # ключ, не меньший запроса; frexp(2^t) = (0.5, t + 1)
+        trailing = ~nodes & (nodes + 1)
+        nodes >>= np.frexp(trailing.astype(np.float64))[1]
+        return (nodes != 0) & (tree.take(nodes) == queries)
+
+    def _word_indexes(self, mixed: np.ndarray) -> np.ndarray:
+        return ((mixed >> np.uint64(32)) * np.uint64(self._words)) >> np.uint64(32)
+
+
+def _int64_keys(search_list) -> np.ndarray:
+    """
+    Ключи в int64 без потери значений.
+
+    Приведение через dtype=np.int64 молча отбрасывает дробную часть, и
+    тогда 1 нашлось бы в SortedIndex([1.5, 2.5]), а слишком большие числа
+    переполняются. Поэтому такие ключи отклоняются.
+    """
+    values = np.asarray(search_list)
+    if values.dtype.kind == "f" and _is_int64(values).all():
+        return values.astype(np.int64)
+    if values.dtype.kind in "biu" and (
+        values.dtype.kind != "u" or not values.size or values.max() < _INT64_LIMIT
+    ):
+        return values.astype(np.int64)
+    if values.dtype.kind == "O":
+        try:
+            keys = values.astype(np.int64)
+        except (OverflowError, TypeError, ValueError):
+            pass
+        else:
+            if keys.tolist() == values.tolist():
+                return keys
+    raise ValueError("SortedIndex keys must be integers that fit in int64")
+
+
+def _is_int64(values: np.ndarray) -> np.ndarray:
+    """Маска чисел с плавающей точкой, которые точно равны какому-то int64."""
+    with np.errstate(invalid="ignore"):
+        return (
+            (values == np.floor(values))
+            & (values >= -_INT64_LIMIT)
+            & (values < _INT64_LIMIT)
+        )
+
+
+def _eytzinger_ranks(size: int) -> np.ndarray:
+    """
+    Номер в отсортированном порядке для каждого узла 1..size кучи.
+
+    Для полного дерева из levels уровней узел на глубине depth с позицией
+    position в уровне имеет in-order номер (2 * position + 1) *
+    2^(levels - 1 - depth) - 1. Последний уровень заполнен слева лишь до
+    filled узлов, поэтому из номера вычитаются отсутствующие листья левее.
+    """
+    if size == 0:
+        return np.empty(0, dtype=np.int64)
+    levels = size.bit_length()
+    nodes = np.arange(1, size + 1, dtype=np.int64)
+    depths = np.frexp(nodes.astype(np.float64))[1] - 1
+    positions = nodes - (1 << depths)
+    ranks = (2 * positions + 1) * (1 << (levels - 1 - depths)) - 1
+    filled = size - ((1 << (levels - 1)) - 1)
+    return ranks - np.maximum((ranks + 1) // 2 - filled, 0)
+
+
+def _mix_array(values: np.ndarray) -> np.ndarray:
+    """Векторный аналог (hash(value) & _MASK64) * _MIX & _MASK64 для int64."""
+    residues = np.abs(values) % _HASH_MODULUS
+    hashes = np.where(values < 0, -residues, residues)
+    hashes[hashes == -1] = -2
+    with np.errstate(over="ignore"):
+        return hashes.view(np.uint64) * np.uint64(_MIX)
+
+
+def _bit_masks(mixed: np.ndarray) -> np.ndarray:
+    masks = np.zeros(len(mixed), dtype=np.uint64)
+    for shift in _BIT_SHIFTS:
+        masks |= np.uint64(1) << ((mixed >> np.uint64(shift)) & np.uint64(63))
+    return masks
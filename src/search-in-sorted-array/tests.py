@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+
+import main
+from sorted_index import SortedIndex
+
+
+class TestSortedIndex(main.TestSearchInSortedList):
+    """Те же случаи, что у search, но через SortedIndex."""
+
+    def setUp(self):
+        super().setUp()
+        self.indexes = {}
+
+    def search(self, number: int, search_list: list[int]) -> bool:
+        # индекс строится один раз на список, как при реальном использовании
+        key = id(search_list)
+        if key not in self.indexes:
+            self.indexes[key] = (search_list, SortedIndex(search_list))
+        return number in self.indexes[key][1]
+
+    def test_contains_many_matches_search(self):
+        queries = np.arange(-3, 12)
+        for lst in (self.sorted_list, self.duplicate_list, self.empty_list):
+            with self.subTest(lst=lst[:5]):
+                expected = [main.search(int(number), lst) for number in queries]
+                result = SortedIndex(lst).contains_many(queries)
+                self.assertEqual(result.tolist(), expected)
+
+    def test_incomplete_last_level(self):
+        # при size = 2^k - 1 дерево полное, иначе последний уровень неполон
+        for size in (1, 2, 3, 6, 7, 8, 9, 31, 32, 33, 100):
+            keys = list(range(0, 2 * size, 2))
+            queries = np.arange(-2, 2 * size + 2)
+            expected = [main.search(int(number), keys) for number in queries]
+            index = SortedIndex(keys)
+            with self.subTest(size=size):
+                self.assertEqual(index.contains_many(queries).tolist(), expected)
+                self.assertEqual([int(n) in index for n in queries], expected)
+
+    def test_non_integer_numbers(self):
+        index = SortedIndex(self.sorted_list)
+        self.assertIn(45.0, index)
+        self.assertNotIn(45.5, index)
+        self.assertNotIn(2**70, index)
+        self.assertEqual(
+            index.contains_many([45.0, 45.5, float("nan"), 2.0**70]).tolist(),
+            [True, False, False, False],
+        )
+
+    def test_rejects_keys_outside_int64(self):
+        self.assertIn(2, SortedIndex([1.0, 2.0]))
+        for keys in ([1.5, 2.5], [1, 2**63], [-(2**64), 1], [float("inf")]):
+            with self.subTest(keys=keys), self.assertRaises(ValueError):
+                SortedIndex(keys)
+
+
+if __name__ == "__main__":
+    unittest.main()